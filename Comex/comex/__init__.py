@@ -5,10 +5,29 @@
 __author__ = "Eric Pieuchot"
 __date__ = "4 Nov 2015"
 
-# Function package interface
-from comex.function.tickers import get_qdl_ticker, get_bbg_ticker
-from comex.function.expiries import get_front_month, get_expiry_date
+from importlib import import_module
 
-# Start trapping errors
-import comex.utility.error as __ERR__
-__ERR__.start_logging()
+# Function package interface, modules imported on first access
+__INTERFACE__ = {"get_qdl_ticker":"comex.function.tickers",
+                 "get_bbg_ticker":"comex.function.tickers",
+                 "get_qdl_tickers":"comex.function.tickers",
+                 "get_bbg_tickers":"comex.function.tickers",
+                 "get_front_month":"comex.function.expiries",
+                 "get_expiry_date":"comex.function.expiries",
+                 "get_expiry_dates":"comex.function.expiries",
+                 "get_front_months":"comex.function.expiries",
+                 "start_logging":"comex.utility.error"}
+
+__all__ = sorted(__INTERFACE__)
+
+def __getattr__(name):
+    if name not in __INTERFACE__:
+        raise AttributeError("module 'comex' has no attribute '%s'" % name)
+    _value = getattr(import_module(__INTERFACE__[name]), name)
+    globals()[name] = _value
+    return _value
+
+def __dir__():
+    return sorted(set(globals()) | set(__INTERFACE__))
+
+# Error trapping is opt-in, call comex.start_logging() from scripts
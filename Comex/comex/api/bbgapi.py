@@ -6,12 +6,323 @@ Manipulate Bloomberg Python API
 __author__  = "Eric Pieuchot"
 __date__    = "18 March 2015"
 
-from datetime import datetime, timedelta, date
-from collections import defaultdict
+from datetime import datetime, timedelta, date, timezone
+from collections import defaultdict, deque
+from contextlib import contextmanager
+import comex.api.bbgcache as __CACHE__
+import comex.utility.lazy as __LAZY__
+__PD__ = __LAZY__.lazy_import("pandas")
+__NP__ = __LAZY__.lazy_import("numpy")
+import threading
 import logging
-import blpapi
+import time
+# None when not installed, offline use through comex.api.bbgstub
+blpapi = __LAZY__.lazy_import("blpapi", optional=True)
 
-__all__ = ['Connection']
+__all__ = ['Connection', 'ConnectionPool', 'get_pool', 'ColumnBuffer',
+           'TickReader', 'HistoryReader', 'BarReader', 'aggregate_ticks', 'to_nanos',
+           'EVENT_TYPES', 'TICK_COLUMNS', 'BAR_COLUMNS']
+
+#------------------------------------------------------------------------------
+# Columnar storage for streamed rows
+#------------------------------------------------------------------------------
+
+BDH_TICKER_BATCH = 50
+BDH_YEAR_CHUNK = 5
+BDH_IN_FLIGHT = 4
+POOL_SIZE = 4
+POOL_RETRIES = 5
+POOL_BACKOFF = 0.5
+SESSION_DOWN = ["SessionTerminated", "SessionConnectionDown",
+                "SessionStartupFailure"]
+EVENT_TYPES = ["TRADE", "BID", "ASK", "BID_BEST", "ASK_BEST", "MID_PRICE",
+               "AT_TRADE", "BEST_BID", "BEST_ASK"]
+EVENT_CODES = {_type:_code for _code, _type in enumerate(EVENT_TYPES)}
+TICK_COLUMNS = [("time", "i8"), ("value", "f8"), ("size", "f8"), ("type", "i1")]
+BAR_COLUMNS = [("time", "i8"), ("open", "f8"), ("high", "f8"), ("low", "f8"),
+               ("close", "f8"), ("volume", "f8"), ("numEvents", "i8"),
+               ("value", "f8")]
+EPOCH = datetime(1970, 1, 1)
+EPOCH_UTC = datetime(1970, 1, 1, tzinfo=timezone.utc)
+MICROSECOND = timedelta(microseconds=1)
+
+def to_nanos(times):
+    """Convert datetime list into int64 nanoseconds since epoch (UTC)"""
+    if len(times) == 0:
+        return __NP__.empty(0, dtype="i8")
+    _epoch = EPOCH if times[0].tzinfo is None else EPOCH_UTC
+    # Ticks share time stamps, each distinct stamp converted once
+    _nanos = {_time:(_time - _epoch) // MICROSECOND * 1000
+              for _time in dict.fromkeys(times)}
+    return __NP__.fromiter(map(_nanos.__getitem__, times), dtype="i8",
+                           count=len(times))
+
+class ColumnBuffer(object):
+    """Growable NumPy columns, capacity doubles when full"""
+    
+    def __init__(self, dtypes, capacity=4096):
+        self.names = [_name for _name, _dtype in dtypes]
+        self.size, self._capacity = 0, capacity
+        self._columns = [__NP__.empty(capacity, dtype=_dtype)
+                         for _name, _dtype in dtypes]
+    
+    def reserve(self, count):
+        """Grow columns to hold count more rows"""
+        _needed = self.size + count
+        if _needed > self._capacity:
+            self._capacity = max(_needed, 2 * self._capacity)
+            for i, _column in enumerate(self._columns):
+                _grown = __NP__.empty(self._capacity, dtype=_column.dtype)
+                _grown[:self.size] = _column[:self.size]
+                self._columns[i] = _grown
+    
+    def append(self, *values):
+        """Append one row, values in column order"""
+        if self.size == self._capacity:
+            self.reserve(1)
+        for _column, _value in zip(self._columns, values):
+            _column[self.size] = _value
+        self.size += 1
+    
+    def extend(self, *columns):
+        """Append equal length sequences, one per column in column order"""
+        _count = len(columns[0])
+        self.reserve(_count)
+        for _column, _values in zip(self._columns, columns):
+            _column[self.size:self.size + _count] = _values
+        self.size += _count
+    
+    def column(self, name):
+        """Return filled part of column name"""
+        return self._columns[self.names.index(name)][:self.size]
+
+def __split_dates__(startDate, endDate, yearChunk):
+    """Split yyyymmdd date range into chunks of yearChunk years"""
+    try:
+        _start = datetime.strptime(startDate, "%Y%m%d").date()
+        _end = datetime.strptime(endDate, "%Y%m%d").date()
+    except (TypeError, ValueError):
+        # Relative dates such as "20150101 -1CY" sent as a single range
+        return [(startDate, endDate)]
+    if yearChunk is None or yearChunk < 1:
+        return [(startDate, endDate)]
+    _chunks = []
+    while _start <= _end:
+        try:
+            _next = _start.replace(year=_start.year + yearChunk)
+        except ValueError:
+            _next = _start.replace(year=_start.year + yearChunk, day=28)
+        _last = min(_end, _next - timedelta(days=1))
+        _chunks.append((_start.strftime("%Y%m%d"), _last.strftime("%Y%m%d")))
+        _start = _next
+    return _chunks
+
+def aggregate_ticks(times, values, sizes):
+    """
+    Description
+    -----------
+    Size weighted average value and total size per time stamp
+    
+    Parameters
+    ----------
+        times (datetime64 array): tick time stamps
+        
+        values/sizes (float array): tick values and sizes
+    
+    Notes
+    -----
+    Same rules as Connection.bdit: zero size ticks are dropped and value is
+    only divided by size when aggregated size is above 1
+    """
+    _traded = sizes > 0
+    _index, _group = __NP__.unique(times[_traded], return_inverse=True)
+    _size = __NP__.bincount(_group, weights=sizes[_traded],
+                            minlength=len(_index))
+    _value = __NP__.bincount(_group, weights=sizes[_traded] * values[_traded],
+                             minlength=len(_index))
+    _value = __NP__.where(_size > 1, _value / __NP__.where(_size > 1, _size, 1),
+                          _value)
+    return __PD__.DataFrame({"value":_value, "size":_size},
+                            index=__PD__.DatetimeIndex(_index, name="time"))
+
+#------------------------------------------------------------------------------
+# Response readers shared by blocking and asyncio connections
+#------------------------------------------------------------------------------
+
+def __error_text__(element):
+    """Message of an ErrorInfo element"""
+    if element.hasElement("message"):
+        return element.getElementAsString("message")
+    return str(element.name())
+
+def __reason__(msg):
+    """Description of a RequestFailure message"""
+    try:
+        return msg.getElement("reason").getElementAsString("description")
+    except Exception:
+        return str(msg.messageType())
+
+def __response_errors__(msg):
+    """
+    Logged responseError, securityError and fieldExceptions of a message
+    """
+    _errors = []
+    if msg.hasElement("responseError"):
+        _errors.append(__error_text__(msg.getElement("responseError")))
+    if msg.hasElement("securityData"):
+        _securitydata = msg.getElement("securityData")
+        _security = (_securitydata.getElementAsString("security")
+                     if _securitydata.hasElement("security") else "")
+        if _securitydata.hasElement("securityError"):
+            _errors.append("%s %s" % (_security, __error_text__(
+                                    _securitydata.getElement("securityError"))))
+        if _securitydata.hasElement("fieldExceptions"):
+            _exceptions = _securitydata.getElement("fieldExceptions")
+            for i in range(_exceptions.numValues()):
+                _exception = _exceptions.getValueAsElement(i)
+                _errors.append("%s %s %s" % (
+                            _security, _exception.getElementAsString("fieldId"),
+                            __error_text__(_exception.getElement("errorInfo"))))
+    for _error in _errors:
+        logging.error("Error on %s %s", msg.messageType(), _error)
+    return _errors
+
+class TickReader(object):
+    """Parse IntradayTickResponse messages into preallocated columns"""
+    
+    def __init__(self, names, aggregate = True):
+        self.aggregate = aggregate
+        self._buffer = ColumnBuffer(TICK_COLUMNS)
+        self._tick, self._time = names["tickData"], names["time"]
+        self._value, self._size = names["value"], names["size"]
+        self._type = names["type"]
+        self.errors = []
+    
+    def on_message(self, msg):
+        self.errors.extend(__response_errors__(msg))
+        if not msg.hasElement(self._tick):
+            return
+        _time, _value, _size, _type = self._time, self._value, self._size, self._type
+        _tickdataarray = msg.getElement(self._tick).getElement(self._tick)
+        _ticks = [_tickdataarray.getValueAsElement(i)
+                  for i in range(_tickdataarray.numValues())]
+        # Raw values first, time column converted once per message
+        _times = [_tickdata.getElementAsDatetime(_time) for _tickdata in _ticks]
+        _values = [_tickdata.getElementAsFloat(_value) for _tickdata in _ticks]
+        _sizes = [_tickdata.getElementAsFloat(_size) for _tickdata in _ticks]
+        # Event types only kept in raw tick tables
+        if self.aggregate:
+            _types = -1
+        else:
+            _codes = EVENT_CODES
+            _types = [_codes.get(_tickdata.getElementAsString(_type), -1)
+                      for _tickdata in _ticks]
+        # One slice assignment per column and message
+        self._buffer.extend(to_nanos(_times), _values, _sizes, _types)
+    
+    def result(self):
+        """Return aggregated or raw tick DataFrame"""
+        _buffer = self._buffer
+        _times = _buffer.column("time").view("datetime64[ns]")
+        _values, _sizes = _buffer.column("value"), _buffer.column("size")
+        if self.aggregate:
+            return aggregate_ticks(_times, _values, _sizes)
+        return __PD__.DataFrame({"value":_values, "size":_sizes,
+                                 "type":_buffer.column("type")},
+                                index=__PD__.DatetimeIndex(_times, name="time"))
+
+class HistoryReader(object):
+    """Parse HistoricalDataResponse into a wide (ticker, field) DataFrame"""
+    
+    def __init__(self, bbgTickers, bbgFields):
+        self.bbgTickers, self.bbgFields = list(bbgTickers), list(bbgFields)
+        self._tickers = {_ticker:i for i, _ticker in enumerate(self.bbgTickers)}
+        self._fields = {_field.upper():j for j, _field in enumerate(self.bbgFields)}
+        self._buffer = ColumnBuffer([("day", "i8"), ("column", "i8"), ("value", "f8")])
+        self.errors = []
+    
+    def on_message(self, msg):
+        self.errors.extend(__response_errors__(msg))
+        if not msg.hasElement("securityData"):
+            return
+        _width, _fields = len(self.bbgFields), self._fields
+        _offset = EPOCH.toordinal()
+        _securitydata = msg.getElement("securityData")
+        if not _securitydata.hasElement("fieldData"):
+            return
+        _ticker = self._tickers[_securitydata.getElementAsString("security")]
+        _fielddataarray = _securitydata.getElement("fieldData")
+        _days, _columns, _values = [], [], []
+        for i in range(_fielddataarray.numValues()):
+            _fielddata = _fielddataarray.getValueAsElement(i)
+            _day = _fielddata.getElement(0).getValueAsDatetime().toordinal()
+            # Fields missing on a date are not sent, match on names
+            for j in range(1, _fielddata.numElements()):
+                _element = _fielddata.getElement(j)
+                _column = _fields.get(str(_element.name()).upper())
+                if _column is not None:
+                    _days.append(_day - _offset)
+                    _columns.append(_ticker * _width + _column)
+                    _values.append(_element.getValueAsFloat())
+        self._buffer.extend(_days, _columns, _values)
+    
+    def result(self):
+        """Scatter long rows into preallocated wide table"""
+        _buffer = self._buffer
+        _days, _columns = _buffer.column("day"), _buffer.column("column")
+        _index = __NP__.unique(_days)
+        _table = __NP__.full((len(_index), len(self.bbgTickers) * len(self.bbgFields)),
+                             __NP__.nan)
+        _table[__NP__.searchsorted(_index, _days), _columns] = _buffer.column("value")
+        return __PD__.DataFrame(
+                    _table,
+                    index=__PD__.DatetimeIndex(_index.astype("datetime64[D]"),
+                                               name="date"),
+                    columns=__PD__.MultiIndex.from_product(
+                                    [self.bbgTickers, self.bbgFields],
+                                    names=["ticker", "field"]))
+
+class BarReader(object):
+    """Parse IntradayBarResponse, low/high/volume dict or all bar columns"""
+    
+    def __init__(self, columnar = False):
+        self.columnar = columnar
+        self._response = defaultdict(dict)
+        self._fields = ["low", "high", "volume"]
+        self._buffer = ColumnBuffer(BAR_COLUMNS)
+        self.errors = []
+    
+    def on_message(self, msg):
+        self.errors.extend(__response_errors__(msg))
+        if not msg.hasElement("barData"):
+            return
+        _bardata = msg.getElement("barData")
+        _bartickdataarray = _bardata.getElement("barTickData")
+        _bars = [_bartickdataarray.getValueAsElement(i)
+                 for i in range(_bartickdataarray.numValues())]
+        _times = [_bartickdata.getElementAsDatetime("time") for _bartickdata in _bars]
+        if self.columnar:
+            # One slice assignment per column and message
+            self._buffer.extend(to_nanos(_times), *[
+                    [_bartickdata.getElement(_field).getValue()
+                     for _bartickdata in _bars]
+                    for _field, _dtype in BAR_COLUMNS[1:]])
+            return
+        for _field in self._fields:
+            _column = self._response[(_field)]
+            for _time, _bartickdata in zip(_times, _bars):
+                _column[_time] = _bartickdata.getElement(_field).getValue()
+    
+    def result(self):
+        """Return legacy dict or DataFrame indexed by bar start time"""
+        if not self.columnar:
+            return self._response
+        _buffer = self._buffer
+        return __PD__.DataFrame(
+                    {_name:_buffer.column(_name) for _name, _dtype in BAR_COLUMNS[1:]},
+                    index=__PD__.DatetimeIndex(
+                                _buffer.column("time").view("datetime64[ns]"),
+                                name="time"))
 
 #------------------------------------------------------------------------------
 # Bbg //blp/refdata service connection
@@ -19,17 +330,83 @@ __all__ = ['Connection']
  
 class Connection(object):
     
-    def __init__(self, host = "localhost", port = 8194):
+    def __init__(self, host = "localhost", port = 8194, api = None, cache = None):
         """
         Starting bloomberg API session
+        
+        Notes
+        -----
+        api defaults to blpapi, comex.api.bbgstub.StubApi runs offline
+        
+        cache is a comex.api.bbgcache.ResponseCache, True for the shared one
+        
+        errors lists the error messages of the last request, results with
+        errors are never cached
         """
+        self._api = blpapi if api is None else api
+        self._cache = __CACHE__.get_cache() if cache is True else cache or None
         # Fill SessionOptions
-        _options = blpapi.SessionOptions()
+        _options = self._api.SessionOptions()
         _options.setServerHost(host)
         _options.setServerPort(port)
         # Create a Session
-        self._session = blpapi.Session(_options)
+        self._session = self._api.Session(_options)
+        self._alive = False
+        self.errors = []
+        # Element names resolved once per connection
+        self._names = {_name:self._api.Name(_name)
+                       for _name in ["tickData", "time", "value", "size", "type"]}
+    
+    def is_alive(self):
+        """
+        Session started and no termination status received since
+        """
+        return self._alive and hasattr(self, "_service")
+    
+    def validate(self):
+        """
+        Drain queued session events without blocking, True if still alive
+        """
+        if not self.is_alive():
+            return False
+        try:
+            _event = self._session.tryNextEvent()
+            while _event is not None:
+                self._check_status(_event)
+                _event = self._session.tryNextEvent()
+        except:
+            logging.error("Error on session events", exc_info=True)
+            self._alive = False
+        return self.is_alive()
+    
+    def _check_status(self, event):
+        """
+        Flag connection down on session status events
+        """
+        if event.eventType() == self._api.Event.SESSION_STATUS:
+            for _msg in event:
+                if str(_msg.messageType()) in SESSION_DOWN:
+                    logging.error("Session down %s", _msg.messageType())
+                    self._alive = False
         
+    def _cache_get(self, operation, **params):
+        """
+        Return (key, cached result), key is None without cache
+        """
+        if self._cache is None:
+            return None, None
+        _key = __CACHE__.request_key(operation, **params)
+        return _key, self._cache.get(_key)
+    
+    def _cache_put(self, key, result, endTime, errors = ()):
+        """
+        Store a complete non empty result without errors, settled if
+        endTime before today
+        """
+        if key is not None and self._alive and len(result) > 0 and not errors:
+            self._cache.put(key, result, __CACHE__.is_settled(endTime))
+        return result
+    
     def start_service(self, service = "//blp/refdata"):
         """
         Initialize Bloomberg refData service
@@ -43,6 +420,7 @@ class Connection(object):
                 # Obtain previously opened service
                 self._service = self._session.getService(service)
                 self._session.nextEvent()
+                self._alive = True
                 return True
             else:
                 logging.error("Error on service %s", self._service.name,
@@ -56,6 +434,7 @@ class Connection(object):
         """
         Stop Bloomberg refData service
         """
+        self._alive = False
         if self._session.stop():
             del self._service
             return True
@@ -72,7 +451,9 @@ class Connection(object):
             self, bbgTickers = ["CL1 Comdty"], bbgFields = ["Px_Last"],
             startDate = "%s -1CY" % date.today().strftime("%Y%m%d"), 
             endDate = date.today().strftime("%Y%m%d"), 
-            periodSelection = "DAILY", periodFill = "ACTIVE_DAYS_ONLY"):
+            periodSelection = "DAILY", periodFill = "ACTIVE_DAYS_ONLY",
+            columnar = False, tickerBatch = BDH_TICKER_BATCH,
+            yearChunk = BDH_YEAR_CHUNK, maxInFlight = BDH_IN_FLIGHT):
         """
         Description
         -----------
@@ -88,51 +469,146 @@ class Connection(object):
         
             periodFill (string): options ALL_CALENDAR_DAYS, ACTIVE_DAYS_ONLY...
         
+            columnar (boolean): return wide DataFrame, (ticker, field) columns
+        
+            tickerBatch (integer): maximum tickers per request
+        
+            yearChunk (integer): maximum years per request, yyyymmdd dates only
+        
+            maxInFlight (integer): maximum requests sent at the same time
+        
         Examples
         --------
             functionReturn (defaultdict): from Bloomberg response object::
             
                 >>> comex.pytool.pybbg.bdh()
                 { (string, string) { datetime.date : float, ...} : ...}
+            
+            functionReturn (DataFrame): with columnar=True::
+            
+                >>> comex.pytool.pybbg.bdh(columnar=True)
+                DataFrame(columns=[(ticker, field)], index=date)
         """
-        # Create an "HistoricalDataRequest" request
-        _request = self._service.createRequest("HistoricalDataRequest")    
-        _request.set("nonTradingDayFillOption", periodFill)
-        _request.set("periodicitySelection", periodSelection)
-        _request.set("startDate", startDate)
-        _request.set("endDate", endDate)
-        for _ticker in bbgTickers:
-            _request.append("securities",_ticker)
-        for _field in bbgFields:
-            _request.append("fields",_field)
-        # Send the request
-        self._session.sendRequest(_request)
-        logging.info("Sending request %s", _request.toString(), exc_info=True)
+        self.errors = []
+        _key, _cached = self._cache_get(
+                            "HistoricalDataRequest", securities=list(bbgTickers),
+                            fields=list(bbgFields), startDate=startDate,
+                            endDate=endDate, periodicitySelection=periodSelection,
+                            nonTradingDayFillOption=periodFill, columnar=columnar)
+        if _cached is not None:
+            return _cached
+        _requests = self._create_bdh_requests(bbgTickers, bbgFields,
+                                              startDate, endDate,
+                                              periodSelection, periodFill,
+                                              tickerBatch, yearChunk)
+        if columnar:
+            _reader = HistoryReader(bbgTickers, bbgFields)
+            self._send_requests(_requests, lambda _index, _msg:
+                                _reader.on_message(_msg), maxInFlight)
+            self.errors.extend(_reader.errors)
+            return self._cache_put(_key, _reader.result(), endDate, self.errors)
         _response = defaultdict(dict)
+        def _on_message(_index, _msg):
+            #HistoricalDataResponse only for a single security
+            self.errors.extend(__response_errors__(_msg))
+            if not _msg.hasElement("securityData"):
+                return
+            _securitydata = _msg.getElement("securityData")
+            if not _securitydata.hasElement("fieldData"):
+                return
+            _ticker = _securitydata.getElementAsString("security")
+            _fielddataarray = _securitydata.getElement("fieldData")
+            for i in range(_fielddataarray.numValues()):
+                _fielddata = _fielddataarray.getValueAsElement(i)
+                for j in range(1,_fielddata.numElements()):
+                    _date = _fielddata.getElement(0).getValueAsDatetime()
+                    _value = _fielddata.getElement(j).getValueAsFloat()
+                    _response[(_ticker, bbgFields[j-1])][_date] = _value
+        self._send_requests(_requests, _on_message, maxInFlight)
+        return self._cache_put(_key, _response, endDate, self.errors)
+    
+    def _create_bdh_requests(self, bbgTickers, bbgFields, startDate, endDate,
+                             periodSelection, periodFill, tickerBatch, yearChunk):
+        """
+        Create "HistoricalDataRequest" requests per ticker batch and dates
+        """
+        _requests = []
+        _batch = max(1, tickerBatch)
+        for k in range(0, len(bbgTickers), _batch):
+            for _start, _end in __split_dates__(startDate, endDate, yearChunk):
+                _request = self._service.createRequest("HistoricalDataRequest")    
+                _request.set("nonTradingDayFillOption", periodFill)
+                _request.set("periodicitySelection", periodSelection)
+                _request.set("startDate", _start)
+                _request.set("endDate", _end)
+                for _ticker in bbgTickers[k:k + _batch]:
+                    _request.append("securities",_ticker)
+                for _field in bbgFields:
+                    _request.append("fields",_field)
+                _requests.append(_request)
+        return _requests
+    
+    def _send_requests(self, requests, onMessage, maxInFlight=1):
+        """
+        Keep up to maxInFlight requests on the session, route each message
+        to onMessage(request index, message) through its CorrelationId
+        
+        Notes
+        -----
+        A RequestFailure status ends its request, the failure is added to
+        errors and the next request is sent.
+        """
+        _pending = list(range(len(requests)))
+        _pending.reverse()
+        _inflight = {}
+        def _send():
+            while _pending and len(_inflight) < max(1, maxInFlight):
+                _index = _pending.pop()
+                _cid = self._session.sendRequest(
+                                    requests[_index],
+                                    correlationId=self._api.CorrelationId(_index))
+                _inflight[_index] = _cid
+                logging.info("Sending request %s", requests[_index].toString(),
+                             exc_info=True)
+        _send()
         # Process received events
-        while(True):
+        while(_inflight):
             try:
                 _event = self._session.nextEvent(500)
+                self._check_status(_event)
+                if not self._alive:
+                    break
+                _done = set()
+                _status = _event.eventType() == self._api.Event.REQUEST_STATUS
                 for _msg in _event:
-                    #HistoricalDataResponse only for a single security
-                    _securitydata = _msg.getElement("securityData")
-                    _ticker = _securitydata.getElementAsString("security")
-                    _fielddataarray = _securitydata.getElement("fieldData")
-                    for i in range(_fielddataarray.numValues()):
-                        _fielddata = _fielddataarray.getValueAsElement(i)
-                        for j in range(1,_fielddata.numElements()):
-                            _date = _fielddata.getElement(0).getValueAsDatetime()
-                            _value = _fielddata.getElement(j).getValueAsFloat()
-                            _response[(_ticker, bbgFields[j-1])][_date] = _value
-                if _event.eventType() == blpapi.Event.RESPONSE:
-                    # Response completely received, so we could exit
+                    _cids = _msg.correlationIds()
+                    if not _cids:
+                        continue
+                    _index = _cids[0].value()
+                    if _status:
+                        # RequestFailure ends a request without RESPONSE
+                        if str(_msg.messageType()) == "RequestFailure":
+                            _error = "Request failure %s" % __reason__(_msg)
+                            logging.error(_error)
+                            self.errors.append(_error)
+                            _done.add(_index)
+                        continue
+                    if _event.eventType() == self._api.Event.RESPONSE:
+                        _done.add(_index)
+                    try:
+                        onMessage(_index, _msg)
+                    except:
+                        logging.error("Error on message %s", _msg.messageType(),
+                                      exc_info=True)
+                for _index in _done:
+                    # Response completely received, send next request
                     logging.info("Request fully received", exc_info=True)
-                    break
+                    _inflight.pop(_index, None)
+                _send()
             except:
                 logging.error("Error on response %s", _event.REQUEST_STATUS,
                               exc_info=True)
-        return _response
-
+    
 #------------------------------------------------------------------------------
 # Bbg IntradayTickRequest
 #------------------------------------------------------------------------------
@@ -140,7 +616,8 @@ class Connection(object):
     def bdit(
             self, bbgTicker = "CL1 Comdty", eventTypes = ["TRADE", "AT_TRADE"],
             startTime = (datetime.now().replace(microsecond=0)-timedelta(minutes=16)).isoformat(),
-            endTime = (datetime.now().replace(microsecond=0)-timedelta(minutes=15)).isoformat()):
+            endTime = (datetime.now().replace(microsecond=0)-timedelta(minutes=15)).isoformat(),
+            columnar = False, aggregate = True):
         """
         Description
         -----------
@@ -154,20 +631,38 @@ class Connection(object):
         
             eventTypes (string array): options TRADE, AT_TRADE, BID, ASK...
         
+            columnar (boolean): parse ticks into NumPy columns, return DataFrame
+        
+            aggregate (boolean): columnar only, average value per time stamp
+        
         Examples
         --------
             functionReturn (defaultdict): from Bloomberg response object::
             
                 >>> comex.pytool.pybbg.bdit()
                 { (string) { datetime.datetime : float, ...} : ...}
+            
+            functionReturn (DataFrame): with columnar=True::
+            
+                >>> comex.pytool.pybbg.bdit(columnar=True)
+                DataFrame(columns=["value", "size"], index=time)
         """
-        # Create an "IntradayTickRequest" request
-        _request = self._service.createRequest("IntradayTickRequest")          
-        _request.set("security", bbgTicker)
-        _request.set("startDateTime", startTime)
-        _request.set("endDateTime", endTime)
-        for _eventtype in eventTypes:
-            _request.append("eventTypes",_eventtype)        
+        self.errors = []
+        _key, _cached = self._cache_get(
+                            "IntradayTickRequest", security=bbgTicker,
+                            eventTypes=list(eventTypes), startDateTime=startTime,
+                            endDateTime=endTime, columnar=columnar,
+                            aggregate=aggregate if columnar else True)
+        if _cached is not None:
+            return _cached
+        _request = self._create_bdit_request(bbgTicker, eventTypes,
+                                             startTime, endTime)
+        if columnar:
+            _reader = TickReader(self._names, aggregate)
+            self._send_requests([_request], lambda _index, _msg:
+                                _reader.on_message(_msg))
+            self.errors.extend(_reader.errors)
+            return self._cache_put(_key, _reader.result(), endTime, self.errors)
         # Send the request       
         self._session.sendRequest(_request)
         logging.info("Sending request %s", _request.toString(), exc_info=True)
@@ -177,7 +672,23 @@ class Connection(object):
         while(True):
             try:
                 _event = self._session.nextEvent(500)
+                self._check_status(_event)
+                if not self._alive:
+                    break
+                if _event.eventType() == self._api.Event.REQUEST_STATUS:
+                    _failures = ["Request failure %s" % __reason__(_msg)
+                                 for _msg in _event
+                                 if str(_msg.messageType()) == "RequestFailure"]
+                    for _error in _failures:
+                        logging.error(_error)
+                    self.errors.extend(_failures)
+                    if _failures:
+                        break
+                    continue
                 for _msg in _event:
+                    self.errors.extend(__response_errors__(_msg))
+                    if not _msg.hasElement("tickData"):
+                        continue
                     _securitydata = _msg.getElement("tickData")
                     _tickdataarray = _securitydata.getElement("tickData")
                     for i in range(_tickdataarray.numValues()):
@@ -198,7 +709,7 @@ class Connection(object):
                                         _response[(_fields[j])][_time] = _size*_value
                                     else:
                                         _response[(_fields[j])][_time] = _value
-                if _event.eventType() == blpapi.Event.RESPONSE:
+                if _event.eventType() == self._api.Event.RESPONSE:
                     # Response completly received, so we could exit
                     logging.info("Request fully received", exc_info=True)
                     # Retrieve average "value" per time stamp
@@ -209,7 +720,19 @@ class Connection(object):
             except:
                 logging.error("Error on response %s", _event.REQUEST_STATUS,
                               exc_info=True)
-        return _response
+        return self._cache_put(_key, _response, endTime, self.errors)
+    
+    def _create_bdit_request(self, bbgTicker, eventTypes, startTime, endTime):
+        """
+        Create an "IntradayTickRequest" request
+        """
+        _request = self._service.createRequest("IntradayTickRequest")          
+        _request.set("security", bbgTicker)
+        _request.set("startDateTime", startTime)
+        _request.set("endDateTime", endTime)
+        for _eventtype in eventTypes:
+            _request.append("eventTypes",_eventtype)        
+        return _request
 
 #------------------------------------------------------------------------------
 # Bbg IntradayBarRequest
@@ -218,7 +741,8 @@ class Connection(object):
     def bdib(
             self, bbgTicker = "CL1 Comdty", eventType = "TRADE",eventInterval = 1,
             startTime = (datetime.now().replace(microsecond=0)-timedelta(minutes=16)).isoformat(),
-            endTime = (datetime.now().replace(microsecond=0)-timedelta(minutes=15)).isoformat()):
+            endTime = (datetime.now().replace(microsecond=0)-timedelta(minutes=15)).isoformat(),
+            columnar = False):
         """
         Description
         -----------
@@ -232,46 +756,179 @@ class Connection(object):
         
             eventType (string): options TRADE, AT_TRADE, BID, ASK...
         
+            columnar (boolean): return every bar field as DataFrame
+        
         Examples
         --------
             functionReturn (defaultdict): from Bloomberg response object::
             
                 >>> comex.pytool.pybbg.bdib()
                 { (string) { datetime.datetime : float, ...} : ...}
+            
+            functionReturn (DataFrame): with columnar=True::
+            
+                >>> comex.pytool.pybbg.bdib(columnar=True)
+                DataFrame(columns=["open", "high", "low", "close", "volume",
+                                   "numEvents", "value"], index=time)
+        """
+        self.errors = []
+        _key, _cached = self._cache_get(
+                            "IntradayBarRequest", security=bbgTicker,
+                            eventType=eventType, interval=eventInterval,
+                            startDateTime=startTime, endDateTime=endTime,
+                            columnar=columnar)
+        if _cached is not None:
+            return _cached
+        _request = self._create_bdib_request(bbgTicker, eventType, eventInterval,
+                                             startTime, endTime)
+        _reader = BarReader(columnar)
+        self._send_requests([_request], lambda _index, _msg:
+                            _reader.on_message(_msg))
+        self.errors.extend(_reader.errors)
+        return self._cache_put(_key, _reader.result(), endTime, self.errors)
+    
+    def _create_bdib_request(self, bbgTicker, eventType, eventInterval,
+                             startTime, endTime):
+        """
+        Create an "IntradayBarRequest" request
         """
-        # Create an "IntradayBarRequest" request
         _request = self._service.createRequest("IntradayBarRequest")
         _request.set("security", bbgTicker)
         _request.set("eventType", eventType)
         _request.set("interval", eventInterval)
         _request.set("startDateTime", startTime)
         _request.set("endDateTime", endTime)
-        # Send the request       
-        self._session.sendRequest(_request)
-        logging.info("Sending request %s", _request.toString(), exc_info=True)
-        _response = defaultdict(dict)
-        _fields = ["low", "high", "volume"]
-        # Process received events
-        while(True):
+        return _request
+
+#------------------------------------------------------------------------------
+# Pool of started connections shared across callers
+#------------------------------------------------------------------------------
+
+class ConnectionPool(object):
+    """
+    Thread-safe pool of warm Connection objects
+    
+    Notes
+    -----
+    Connections are started lazily up to size and handed out through the
+    connection() context manager. Connections are validated on checkout
+    and return, unhealthy ones are stopped and replaced, with exponential
+    backoff between failed starts.
+    """
+    
+    def __init__(self, host = "localhost", port = 8194,
+                 service = "//blp/refdata", size = POOL_SIZE,
+                 retries = POOL_RETRIES, backoff = POOL_BACKOFF, api = None,
+                 cache = None):
+        self.host, self.port, self.service = host, port, service
+        self.api, self.cache = api, cache
+        self.size, self.retries, self.backoff = size, retries, backoff
+        self._idle = deque()
+        self._count = 0
+        self._condition = threading.Condition()
+    
+    def _connect(self):
+        """
+        Start a new connection, retry with exponential backoff
+        """
+        _delay = self.backoff
+        for _attempt in range(max(1, self.retries)):
             try:
-                _event = self._session.nextEvent(500)
-                for _msg in _event:
-                    _bardata = _msg.getElement("barData")
-                    _bartickdataarray = _bardata.getElement("barTickData")
-                    for i in range(_bartickdataarray.numValues()):
-                        _bartickdata = _bartickdataarray.getValueAsElement(i)
-                        for j in range(len(_fields)):
-                            _time = _bartickdata.getElementAsDatetime("time")
-                            _value = _bartickdata.getElement(_fields[j]).getValue()
-                            _response[(_fields[j])][_time] = _value
-                if _event.eventType() == blpapi.Event.RESPONSE:
-                    # Response completly received, so we could exit
-                    logging.info("Request fully received", exc_info=True)
-                    break
+                _connection = Connection(self.host, self.port, self.api,
+                                         self.cache)
+                if _connection.start_service(self.service):
+                    return _connection
             except:
-                logging.error("Error in processing response %s",
-                              _event.REQUEST_STATUS, exc_info=True)
-        return _response
+                logging.error("Error on connection %s:%s", self.host,
+                              self.port, exc_info=True)
+            # No wait after the last attempt
+            if _attempt + 1 < max(1, self.retries):
+                logging.warning("Retry connection in %ss", _delay)
+                time.sleep(_delay)
+                _delay *= 2
+        logging.critical("Failed connection %s:%s", self.host, self.port)
+        return None
+    
+    def acquire(self, timeout = None):
+        """
+        Borrow a healthy connection, None if none could be started
+        """
+        with self._condition:
+            while(True):
+                while self._idle:
+                    _connection = self._idle.pop()
+                    if _connection.validate():
+                        return _connection
+                    # Drop dead connection and free its slot
+                    self._count -= 1
+                    self._discard(_connection)
+                if self._count < self.size:
+                    self._count += 1
+                    break
+                if not self._condition.wait(timeout):
+                    logging.error("Timeout on pool %s:%s", self.host, self.port)
+                    return None
+        _connection = self._connect()
+        if _connection is None:
+            with self._condition:
+                self._count -= 1
+                self._condition.notify()
+        return _connection
+    
+    def release(self, connection):
+        """
+        Return a borrowed connection to the pool
+        """
+        with self._condition:
+            if connection.validate():
+                self._idle.append(connection)
+            else:
+                self._count -= 1
+                self._discard(connection)
+            self._condition.notify()
+    
+    @contextmanager
+    def connection(self, timeout = None):
+        """
+        Borrow a connection for the with block, yield None on failure
+        """
+        _connection = self.acquire(timeout)
+        try:
+            yield _connection
+        finally:
+            if _connection is not None:
+                self.release(_connection)
+    
+    def close(self):
+        """
+        Stop idle connections
+        """
+        with self._condition:
+            while self._idle:
+                self._count -= 1
+                self._discard(self._idle.pop())
+    
+    @staticmethod
+    def _discard(connection):
+        try:
+            if hasattr(connection, "_service"):
+                connection.stop_service()
+        except:
+            logging.warning("Error on stopping connection", exc_info=True)
+
+__POOLS__ = {}
+__POOLS_LOCK__ = threading.Lock()
+
+def get_pool(host = "localhost", port = 8194, service = "//blp/refdata",
+             api = None):
+    """
+    Shared ConnectionPool per host, port, service and api
+    """
+    with __POOLS_LOCK__:
+        _key = (host, port, service, id(api))
+        if _key not in __POOLS__:
+            __POOLS__[_key] = ConnectionPool(host, port, service, api=api)
+        return __POOLS__[_key]
 
 #------------------------------------------------------------------------------
 # Unit Testing
@@ -292,5 +949,8 @@ if __name__ == "__main__":
     print(_table)
     del _data
     del _table
+    _table = _connection.bdit(columnar=True)
+    print(_table)
+    del _table
     _connection.stop_service()
     
\ No newline at end of file
@@ -0,0 +1,304 @@
+# -*- coding: utf-8 -*-
+
+"""Bloomberg Asyncio Module
+Concurrent Bloomberg requests over a single session with asyncio
+"""
+__author__  = "Eric Pieuchot"
+__date__    = "18 Oct 2026"
+
+from datetime import datetime, timedelta, date
+import comex.api.bbgapi as __API__
+import itertools
+import threading
+import asyncio
+import logging
+
+__all__ = ['AsyncConnection']
+
+ASYNC_IN_FLIGHT = 8
+PUMP_TIMEOUT = 200
+
+#------------------------------------------------------------------------------
+# Pending request group resolved on the event loop
+#------------------------------------------------------------------------------
+
+def _release(future):
+    if not future.done():
+        future.set_result(None)
+
+class _Pending(object):
+    """Reader and future shared by the requests of one call"""
+
+    def __init__(self, loop, future, reader, count):
+        self.loop, self.future, self.reader = loop, future, reader
+        self.count = count
+
+    def set_result(self):
+        if not self.future.done():
+            self.future.set_result(self.reader.result())
+
+    def set_exception(self, error):
+        if not self.future.done():
+            self.future.set_exception(error)
+
+#------------------------------------------------------------------------------
+# Asyncio front end to //blp/refdata
+#------------------------------------------------------------------------------
+
+class AsyncConnection(object):
+    """
+    Asyncio Bloomberg connection sharing one session across coroutines
+
+    Notes
+    -----
+    A background thread owns nextEvent and routes each message to its
+    request through the CorrelationId. Responses are parsed on that thread
+    and delivered to awaiting coroutines with call_soon_threadsafe. The
+    wrapped Connection must not be used for blocking requests meanwhile.
+    """
+
+    def __init__(self, connection = None, maxInFlight = ASYNC_IN_FLIGHT,
+                 api = None, cache = None):
+        if connection is None:
+            connection = __API__.Connection(api=api, cache=cache)
+            if not connection.start_service():
+                logging.critical("Error on blpapi session", exc_info=True)
+        self._connection = connection
+        self._session = connection._session
+        self._api = connection._api
+        self.maxInFlight = maxInFlight
+        self._ids = itertools.count(1)
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._semaphores = {}
+        self._running = True
+        self._thread = threading.Thread(target=self._pump, name="bbgasync",
+                                        daemon=True)
+        self._thread.start()
+
+    def _pump(self):
+        """Route session events to pending requests"""
+        while self._running:
+            try:
+                _event = self._session.nextEvent(PUMP_TIMEOUT)
+                self._connection._check_status(_event)
+                _final = _event.eventType() == self._api.Event.RESPONSE
+                _status = _event.eventType() == self._api.Event.REQUEST_STATUS
+                for _msg in _event:
+                    for _cid in _msg.correlationIds():
+                        with self._lock:
+                            _entry = self._pending.get(_cid.value())
+                        if _entry is None:
+                            continue
+                        if _status:
+                            # RequestFailure ends a request without RESPONSE
+                            if str(_msg.messageType()) == "RequestFailure":
+                                self._fail(_entry[0], RuntimeError(
+                                    "Request failure %s" % __API__.__reason__(_msg)))
+                            continue
+                        try:
+                            _entry[0].reader.on_message(_msg)
+                        except Exception as _error:
+                            logging.error("Error on message %s",
+                                          _msg.messageType(), exc_info=True)
+                            self._fail(_entry[0], _error)
+                            continue
+                        if _final:
+                            self._complete(_cid.value())
+                if not self._connection.is_alive():
+                    self._fail_all(ConnectionError("Bloomberg session down"))
+            except:
+                logging.error("Error on event pump", exc_info=True)
+
+    def _complete(self, cid):
+        """Release request slot, resolve call once all its requests are in"""
+        with self._lock:
+            _entry = self._pending.pop(cid, None)
+            if _entry is None:
+                return
+            _pending, _slot = _entry
+            _pending.count -= 1
+            _last = _pending.count == 0
+        try:
+            _pending.loop.call_soon_threadsafe(_release, _slot)
+            if _last:
+                _pending.loop.call_soon_threadsafe(_pending.set_result)
+        except RuntimeError:
+            logging.warning("Event loop closed before response", exc_info=True)
+
+    def _fail(self, pending, error):
+        """Drop every request of a call and raise error in its coroutine"""
+        with self._lock:
+            for _key in [_key for _key, _entry in self._pending.items()
+                         if _entry[0] is pending]:
+                del self._pending[_key]
+        try:
+            pending.loop.call_soon_threadsafe(pending.set_exception, error)
+        except RuntimeError:
+            logging.warning("Event loop closed before error", exc_info=True)
+
+    def _fail_all(self, error):
+        with self._lock:
+            _pendings = set(_entry[0] for _entry in self._pending.values())
+        for _pending in _pendings:
+            self._fail(_pending, error)
+
+    def _get_semaphore(self):
+        """Concurrency limit per running event loop"""
+        _loop = asyncio.get_running_loop()
+        if _loop not in self._semaphores:
+            self._semaphores[_loop] = asyncio.Semaphore(max(1, self.maxInFlight))
+        return self._semaphores[_loop]
+
+    async def _request(self, requests, reader):
+        """Send requests sharing reader, await the combined result"""
+        if len(requests) == 0:
+            return reader.result()
+        _loop = asyncio.get_running_loop()
+        _pending = _Pending(_loop, _loop.create_future(), reader, len(requests))
+        _semaphore = self._get_semaphore()
+        _ids = []
+        async def _send(_request):
+            # Hold a concurrency slot until this request completes
+            async with _semaphore:
+                _slot = _loop.create_future()
+                _id = next(self._ids)
+                with self._lock:
+                    self._pending[_id] = (_pending, _slot)
+                _ids.append(_id)
+                self._session.sendRequest(_request,
+                                          correlationId=self._api.CorrelationId(_id))
+                logging.info("Sending request %s", _request.toString())
+                await _slot
+        _senders = [asyncio.ensure_future(_send(_request))
+                    for _request in requests]
+        try:
+            return await _pending.future
+        finally:
+            for _sender in _senders:
+                _sender.cancel()
+            with self._lock:
+                for _id in _ids:
+                    self._pending.pop(_id, None)
+
+    async def bdh(
+            self, bbgTickers = ["CL1 Comdty"], bbgFields = ["Px_Last"],
+            startDate = "%s -1CY" % date.today().strftime("%Y%m%d"),
+            endDate = date.today().strftime("%Y%m%d"),
+            periodSelection = "DAILY", periodFill = "ACTIVE_DAYS_ONLY",
+            tickerBatch = __API__.BDH_TICKER_BATCH,
+            yearChunk = __API__.BDH_YEAR_CHUNK):
+        """
+        Description
+        -----------
+        Awaitable Connection.bdh, columnar output
+
+        Examples
+        --------
+            functionReturn (DataFrame)::
+
+                >>> await comex.api.bbgasync.AsyncConnection().bdh()
+                DataFrame(columns=[(ticker, field)], index=date)
+        """
+        _key, _cached = self._connection._cache_get(
+                            "HistoricalDataRequest", securities=list(bbgTickers),
+                            fields=list(bbgFields), startDate=startDate,
+                            endDate=endDate, periodicitySelection=periodSelection,
+                            nonTradingDayFillOption=periodFill, columnar=True)
+        if _cached is not None:
+            return _cached
+        _requests = self._connection._create_bdh_requests(
+                                    bbgTickers, bbgFields, startDate, endDate,
+                                    periodSelection, periodFill,
+                                    tickerBatch, yearChunk)
+        _reader = __API__.HistoryReader(bbgTickers, bbgFields)
+        _result = await self._request(_requests, _reader)
+        return self._connection._cache_put(_key, _result, endDate, _reader.errors)
+
+    async def bdit(
+            self, bbgTicker = "CL1 Comdty", eventTypes = ["TRADE", "AT_TRADE"],
+            startTime = None, endTime = None, aggregate = True):
+        """
+        Description
+        -----------
+        Awaitable Connection.bdit, columnar output
+
+        Examples
+        --------
+            functionReturn (DataFrame)::
+
+                >>> await comex.api.bbgasync.AsyncConnection().bdit()
+                DataFrame(columns=["value", "size"], index=time)
+        """
+        _now = datetime.now().replace(microsecond=0)
+        if startTime is None: startTime = (_now - timedelta(minutes=16)).isoformat()
+        if endTime is None: endTime = (_now - timedelta(minutes=15)).isoformat()
+        _key, _cached = self._connection._cache_get(
+                            "IntradayTickRequest", security=bbgTicker,
+                            eventTypes=list(eventTypes), startDateTime=startTime,
+                            endDateTime=endTime, columnar=True,
+                            aggregate=aggregate)
+        if _cached is not None:
+            return _cached
+        _request = self._connection._create_bdit_request(bbgTicker, eventTypes,
+                                                         startTime, endTime)
+        _reader = __API__.TickReader(self._connection._names, aggregate)
+        _result = await self._request([_request], _reader)
+        return self._connection._cache_put(_key, _result, endTime, _reader.errors)
+
+    async def bdib(
+            self, bbgTicker = "CL1 Comdty", eventType = "TRADE", eventInterval = 1,
+            startTime = None, endTime = None, columnar = False):
+        """
+        Description
+        -----------
+        Awaitable Connection.bdib, dict or columnar output
+
+        Examples
+        --------
+            functionReturn (defaultdict)::
+
+                >>> await comex.api.bbgasync.AsyncConnection().bdib()
+                { (string) { datetime.datetime : float, ...} : ...}
+        """
+        _now = datetime.now().replace(microsecond=0)
+        if startTime is None: startTime = (_now - timedelta(minutes=16)).isoformat()
+        if endTime is None: endTime = (_now - timedelta(minutes=15)).isoformat()
+        _key, _cached = self._connection._cache_get(
+                            "IntradayBarRequest", security=bbgTicker,
+                            eventType=eventType, interval=eventInterval,
+                            startDateTime=startTime, endDateTime=endTime,
+                            columnar=columnar)
+        if _cached is not None:
+            return _cached
+        _request = self._connection._create_bdib_request(
+                                    bbgTicker, eventType, eventInterval,
+                                    startTime, endTime)
+        _reader = __API__.BarReader(columnar)
+        _result = await self._request([_request], _reader)
+        return self._connection._cache_put(_key, _result, endTime, _reader.errors)
+
+    def close(self, stopService = True):
+        """Stop event pump and optionally the wrapped connection"""
+        self._running = False
+        self._thread.join()
+        self._fail_all(ConnectionError("Connection closed"))
+        if stopService:
+            return self._connection.stop_service()
+        return True
+
+#------------------------------------------------------------------------------
+# Unit Testing
+#------------------------------------------------------------------------------
+
+if __name__ == "__main__":
+    async def _main():
+        _connection = AsyncConnection()
+        _tickers = ["CL1 Comdty", "CO1 Comdty", "HO1 Comdty"]
+        _tables = await asyncio.gather(*[_connection.bdit(_ticker)
+                                         for _ticker in _tickers])
+        for _ticker, _table in zip(_tickers, _tables):
+            print(_ticker)
+            print(_table)
+        _connection.close()
+    asyncio.run(_main())
@@ -0,0 +1,349 @@
+# -*- coding: utf-8 -*-
+
+"""Bloomberg Cache Module
+On-disk cache of Bloomberg responses in NumPy columnar files
+"""
+__author__  = "Eric Pieuchot"
+__date__    = "18 Oct 2026"
+
+from datetime import datetime, timedelta, date, timezone
+from collections import OrderedDict, defaultdict
+import comex.static as __DEF__
+import comex.utility.config as __CFG__
+import comex.utility.lazy as __LAZY__
+__PD__ = __LAZY__.lazy_import("pandas")
+__NP__ = __LAZY__.lazy_import("numpy")
+import threading
+import tempfile
+import hashlib
+import logging
+import json
+import time
+import os
+
+__all__ = ['ResponseCache', 'get_cache', 'request_key', 'is_settled']
+
+CACHE_SUFFIX = ".npz"
+EPOCH = datetime(1970, 1, 1)
+EPOCH_UTC = datetime(1970, 1, 1, tzinfo=timezone.utc)
+MICROSECOND = timedelta(microseconds=1)
+
+#------------------------------------------------------------------------------
+# Request keys and expiry rules
+#------------------------------------------------------------------------------
+
+def request_key(operation, **params):
+    """
+    Description
+    -----------
+    Content key of a request: sha1 of request type and sorted parameters
+
+    Examples
+    --------
+        functionReturn (string)::
+
+            >>> comex.api.bbgcache.request_key("HistoricalDataRequest",
+                                                securities=["CL1 Comdty"])
+            "5f0c..."
+    """
+    _text = json.dumps([operation, params], sort_keys=True, default=str)
+    return hashlib.sha1(_text.encode("utf-8")).hexdigest()
+
+def is_settled(endTime):
+    """
+    Description
+    -----------
+    True if a range ending at endTime is final, ie ends before today
+
+    Notes
+    -----
+    Accepts yyyymmdd dates and ISOformat datetimes. Relative dates such as
+    "20150101 -1CY" are never settled.
+    """
+    _text = str(endTime).strip()
+    try:
+        if len(_text) == 8:
+            _end = datetime.strptime(_text, "%Y%m%d").date()
+        else:
+            _end = datetime.strptime(_text[:19], "%Y-%m-%dT%H:%M:%S").date()
+    except ValueError:
+        return False
+    return _end < date.today()
+
+#------------------------------------------------------------------------------
+# Columnar serialization of Connection results
+#------------------------------------------------------------------------------
+
+def __to_label__(label):
+    return list(label) if isinstance(label, tuple) else label
+
+def __from_label__(label):
+    return tuple(label) if isinstance(label, list) else label
+
+def __to_zone__(tz):
+    """Time zone as IANA name or fixed UTC offset in minutes, None if naive"""
+    if tz is None:
+        return None
+    _name = getattr(tz, "zone", None) or getattr(tz, "key", None)
+    if _name is not None:
+        return str(_name)
+    _offset = tz.utcoffset(None)
+    if _offset is not None:
+        return _offset // timedelta(minutes=1)
+    return str(tz)
+
+def __from_zone__(zone):
+    """tzinfo of a zone saved by __to_zone__"""
+    if isinstance(zone, int):
+        return timezone(timedelta(minutes=zone))
+    return __PD__.Timestamp(0, tz=zone).tzinfo
+
+def __to_micros__(times):
+    """Microseconds since epoch, UTC instants for aware times"""
+    if not times or times[0].tzinfo is None:
+        return [(_time - EPOCH) // MICROSECOND for _time in times]
+    return [(_time - EPOCH_UTC) // MICROSECOND for _time in times]
+
+def __encode__(result):
+    """Return (meta, arrays) for a DataFrame or a dict of {time: value}"""
+    _arrays = {}
+    if isinstance(result, __PD__.DataFrame):
+        _meta = {"kind":"frame",
+                 "columns":[__to_label__(_label) for _label in result.columns],
+                 "names":list(result.columns.names),
+                 "index":result.index.name,
+                 "tz":__to_zone__(getattr(result.index, "tz", None))}
+        _arrays["index"] = result.index.values
+        for j in range(result.shape[1]):
+            _arrays["c%s" % j] = result.iloc[:, j].values
+        return _meta, _arrays
+    _keys, _kinds, _zones = [], [], []
+    for j, (_key, _series) in enumerate(result.items()):
+        _times = list(_series.keys())
+        _dated = bool(_times) and not isinstance(_times[0], datetime)
+        _keys.append(__to_label__(_key))
+        _kinds.append("date" if _dated else "datetime")
+        _zones.append(__to_zone__(_times[0].tzinfo)
+                      if _times and not _dated else None)
+        _arrays["t%s" % j] = __NP__.array(
+                                [_time.toordinal() for _time in _times] if _dated
+                                else __to_micros__(_times), dtype="i8")
+        _arrays["v%s" % j] = __NP__.array(list(_series.values()))
+    return {"kind":"dict", "keys":_keys, "times":_kinds, "zones":_zones}, _arrays
+
+def __decode__(meta, arrays):
+    """Rebuild the result encoded by __encode__"""
+    if meta["kind"] == "frame":
+        _columns = [__from_label__(_label) for _label in meta["columns"]]
+        if len(meta["names"]) > 1:
+            _columns = __PD__.MultiIndex.from_tuples(_columns, names=meta["names"])
+        else:
+            _columns = __PD__.Index(_columns, name=meta["names"][0])
+        _index = __PD__.Index(arrays["index"], name=meta["index"])
+        if meta.get("tz") is not None:
+            # Index values are UTC instants
+            _index = _index.tz_localize("UTC").tz_convert(__from_zone__(meta["tz"]))
+        _table = __PD__.DataFrame(
+                        {j:arrays["c%s" % j] for j in range(len(_columns))},
+                        index=_index)
+        _table.columns = _columns
+        return _table
+    _result = defaultdict(dict)
+    _zones = meta.get("zones", [None] * len(meta["keys"]))
+    for j, (_key, _kind, _zone) in enumerate(zip(meta["keys"], meta["times"],
+                                                 _zones)):
+        _times = arrays["t%s" % j].tolist()
+        if _kind == "date":
+            _times = [date.fromordinal(_time) for _time in _times]
+        elif _zone is None:
+            _times = [EPOCH + timedelta(microseconds=_time) for _time in _times]
+        else:
+            _tz = __from_zone__(_zone)
+            _times = [(EPOCH_UTC + timedelta(microseconds=_time)).astimezone(_tz)
+                      for _time in _times]
+        _result[__from_label__(_key)] = dict(zip(_times, arrays["v%s" % j].tolist()))
+    return _result
+
+#------------------------------------------------------------------------------
+# Size bounded LRU cache on disk
+#------------------------------------------------------------------------------
+
+class ResponseCache(object):
+    """
+    Bloomberg responses stored as one uncompressed .npz file per request key
+
+    Parameters
+    ----------
+        folder (string): cache directory, created if missing
+
+        maxSize (integer): maximum total size in bytes before LRU eviction
+
+        ttl (float): seconds to live of results reaching today
+
+    Notes
+    -----
+    Results of ranges ending before today never expire. File modification
+    times record last access, so LRU order survives restarts.
+    """
+
+    def __init__(self, folder = __DEF__.CACHE_FOLDER,
+                 maxSize = __DEF__.CACHE_SIZE, ttl = __DEF__.CACHE_TTL):
+        self.folder, self.maxSize, self.ttl = folder, maxSize, ttl
+        self._lock = threading.Lock()
+        self._entries = None
+        self.hits, self.misses, self.evictions = 0, 0, 0
+
+    def _path(self, key):
+        return os.path.join(self.folder, key + CACHE_SUFFIX)
+
+    def _get_entries(self):
+        """Scan folder once, entries ordered from least recently used"""
+        if self._entries is None:
+            try:
+                os.makedirs(self.folder, exist_ok=True)
+                _files = [(_entry.stat().st_mtime, _entry.name[:-len(CACHE_SUFFIX)],
+                           _entry.stat().st_size)
+                          for _entry in os.scandir(self.folder)
+                          if _entry.name.endswith(CACHE_SUFFIX)]
+            except OSError:
+                logging.error("Failing %s", self.folder, exc_info=True)
+                _files = []
+            self._entries = OrderedDict((_key, _size)
+                                        for _mtime, _key, _size in sorted(_files))
+        return self._entries
+
+    def _remove(self, key):
+        self._get_entries().pop(key, None)
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def get(self, key):
+        """Return cached result for key, None if missing or expired"""
+        with self._lock:
+            _entries = self._get_entries()
+            if key not in _entries:
+                self.misses += 1
+                return None
+            try:
+                with __NP__.load(self._path(key), allow_pickle=False) as _file:
+                    _meta = json.loads(str(_file["meta"]))
+                    if _meta["expires"] is not None and _meta["expires"] < time.time():
+                        _arrays = None
+                    else:
+                        _arrays = {_name:_file[_name] for _name in _file.files}
+            except (OSError, ValueError, KeyError):
+                logging.warning("Corrupt cache entry %s", key, exc_info=True)
+                _arrays = None
+            if _arrays is None:
+                self._remove(key)
+                self.misses += 1
+                return None
+            # Mark as most recently used
+            _entries.move_to_end(key)
+            try:
+                os.utime(self._path(key))
+            except OSError:
+                pass
+            self.hits += 1
+        return __decode__(_meta, _arrays)
+
+    def put(self, key, result, settled = False):
+        """Store result under key, expiring after ttl unless settled"""
+        try:
+            _meta, _arrays = __encode__(result)
+        except (TypeError, ValueError, AttributeError):
+            logging.error("Cannot cache %s", type(result), exc_info=True)
+            return False
+        _meta["expires"] = None if settled else time.time() + self.ttl
+        _arrays["meta"] = __NP__.array(json.dumps(_meta, default=str))
+        with self._lock:
+            _entries = self._get_entries()
+            _temp = None
+            try:
+                # Write aside then rename, readers never see partial files
+                _handle, _temp = tempfile.mkstemp(suffix=CACHE_SUFFIX,
+                                                  dir=self.folder)
+                with os.fdopen(_handle, "wb") as _file:
+                    __NP__.savez(_file, **_arrays)
+                os.replace(_temp, self._path(key))
+                _temp = None
+                _size = os.path.getsize(self._path(key))
+            except (OSError, ValueError):
+                logging.error("Failing %s", self.folder, exc_info=True)
+                return False
+            finally:
+                # Failed writes leave no temp file behind
+                if _temp is not None:
+                    try:
+                        os.remove(_temp)
+                    except OSError:
+                        pass
+            _entries.pop(key, None)
+            _entries[key] = _size
+            self._evict()
+        return True
+
+    def _evict(self):
+        """Drop least recently used entries above maxSize"""
+        _entries = self._get_entries()
+        _total = sum(_entries.values())
+        while _total > self.maxSize and len(_entries) > 1:
+            _key, _size = next(iter(_entries.items()))
+            self._remove(_key)
+            _total -= _size
+            self.evictions += 1
+
+    def clear(self):
+        """Delete every cached response and reset counters"""
+        with self._lock:
+            for _key in list(self._get_entries().keys()):
+                self._remove(_key)
+            self.hits, self.misses, self.evictions = 0, 0, 0
+
+    def stats(self):
+        """Return hit/miss counters and disk usage"""
+        with self._lock:
+            _entries = self._get_entries()
+            return {"hits":self.hits, "misses":self.misses,
+                    "evictions":self.evictions, "entries":len(_entries),
+                    "size":sum(_entries.values())}
+
+__CACHE__ = []
+__CACHE_LOCK__ = threading.Lock()
+
+def get_cache():
+    """Return shared ResponseCache configured from config.ini"""
+    with __CACHE_LOCK__:
+        if not __CACHE__:
+            _folder, _size, _ttl = (__DEF__.CACHE_FOLDER, __DEF__.CACHE_SIZE,
+                                    __DEF__.CACHE_TTL)
+            _config = __CFG__.Config()
+            if _config.add_section(__DEF__.CONFIG_SECTION_SETTING):
+                try:
+                    _folder = _config.get("cache_folder", _folder)
+                    _size = int(_config.get("cache_size", _size))
+                    _ttl = float(_config.get("cache_ttl", _ttl))
+                except ValueError:
+                    logging.warning("Cache settings %s", _config, exc_info=True)
+            __CACHE__.append(ResponseCache(_folder, _size, _ttl))
+        return __CACHE__[0]
+
+#------------------------------------------------------------------------------
+# Unit Testing
+#------------------------------------------------------------------------------
+
+if __name__ == "__main__":
+    _cache = ResponseCache(tempfile.mkdtemp())
+    _key = request_key("HistoricalDataRequest", securities=["CL1 Comdty"],
+                       fields=["PX_LAST"], startDate="20150101",
+                       endDate="20151231")
+    _table = __PD__.DataFrame({("CL1 Comdty", "PX_LAST"):[37.04, 36.76]},
+                              index=__PD__.DatetimeIndex(["2015-12-30",
+                                                          "2015-12-31"],
+                                                         name="date"))
+    _table.columns.names = ["ticker", "field"]
+    print((_cache.put(_key, _table, is_settled("20151231"))))
+    print((_cache.get(_key)))
+    print((_cache.stats()))
@@ -0,0 +1,595 @@
+# -*- coding: utf-8 -*-
+
+"""Bloomberg Store Module
+Local memory-mapped stores of Bloomberg data, filled incrementally
+"""
+__author__  = "Eric Pieuchot"
+__date__    = "18 Oct 2026"
+
+from datetime import datetime, timedelta, date
+import comex.static as __DEF__
+import comex.utility.config as __CFG__
+import comex.api.bbgapi as __API__
+import comex.function.calendars as __CAL__
+import comex.function.assets as __COM__
+import comex.function.tickers as __TIC__
+import comex.utility.lazy as __LAZY__
+__PD__ = __LAZY__.lazy_import("pandas")
+__NP__ = __LAZY__.lazy_import("numpy")
+import threading
+import tempfile
+import logging
+import json
+import os
+import re
+
+__all__ = ['HistoryStore', 'TickArchive', 'get_store_folder']
+
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+def get_store_folder():
+    """Return store root folder from config.ini"""
+    _config = __CFG__.Config()
+    if _config.add_section(__DEF__.CONFIG_SECTION_SETTING):
+        return _config.get("store_folder", __DEF__.STORE_FOLDER)
+    return __DEF__.STORE_FOLDER
+
+def __to_day__(value):
+    """Days since epoch of a yyyymmdd string, date or datetime"""
+    if isinstance(value, str):
+        value = datetime.strptime(value.strip()[:8], "%Y%m%d")
+    if isinstance(value, datetime):
+        value = value.date()
+    return value.toordinal() - EPOCH_ORDINAL
+
+def __to_text__(day):
+    """yyyymmdd string of days since epoch"""
+    return date.fromordinal(int(day) + EPOCH_ORDINAL).strftime("%Y%m%d")
+
+def __get_calendar__(bbgTicker):
+    """Asset calendar of ticker, weekdays only if asset unknown"""
+    _calendar = None
+    _name = __TIC__.get_asset_name(bbgTicker)
+    _assets = __COM__.get_assets() if _name is not None else None
+    if _assets is not None and _name in _assets:
+        _calendar = _assets[_name].get_calendar()
+    if _calendar is None:
+        _calendar = __CAL__.Calendar(bbgTicker)
+    return _calendar
+
+def __safe_name__(name):
+    return re.sub(r"[^\w.-]", "_", str(name).strip())
+
+def __write_column__(fileName, values):
+    """Replace a raw column file, readers never see partial files"""
+    _handle, _temp = tempfile.mkstemp(dir=os.path.dirname(fileName))
+    with os.fdopen(_handle, "wb") as _file:
+        _file.write(__NP__.ascontiguousarray(values).tobytes())
+    os.replace(_temp, fileName)
+
+def __write_json__(fileName, value):
+    """Replace a small JSON file, readers never see partial files"""
+    _handle, _temp = tempfile.mkstemp(dir=os.path.dirname(fileName))
+    with os.fdopen(_handle, "w") as _file:
+        json.dump(value, _file)
+    os.replace(_temp, fileName)
+
+def __read_json__(fileName, default):
+    try:
+        with open(fileName, "r") as _file:
+            return json.load(_file)
+    except (IOError, ValueError):
+        return default
+
+def __read_column__(fileName, dtype, rows = None):
+    """Memory map first rows of a raw column file, empty array if missing"""
+    if not os.path.exists(fileName) or os.path.getsize(fileName) == 0:
+        return __NP__.empty(0, dtype=dtype)
+    return __NP__.memmap(fileName, dtype=dtype, mode="r")[:rows]
+
+#------------------------------------------------------------------------------
+# Daily history store per (ticker, field)
+#------------------------------------------------------------------------------
+
+class _History(object):
+    """
+    Day and value columns of one (ticker, field) with covered intervals
+
+    Notes
+    -----
+    The row count is written after both columns, rows past it are left
+    over from an interrupted append and cut on open. Columns shorter than
+    the row count mean an interrupted merge, the series is then dropped
+    and fetched again.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.cover = [tuple(_pair) for _pair in __read_json__(path + ".cover", [])]
+        self.rows = __read_json__(path + ".rows", None)
+        _sizes = [os.path.getsize(path + _suffix)
+                  if os.path.exists(path + _suffix) else 0
+                  for _suffix in (".day", ".value")]
+        if self.rows is None:
+            self.rows = min(_sizes) // 8
+        if min(_sizes) // 8 < self.rows:
+            logging.warning("Incomplete columns %s, series dropped", path)
+            self.rows, self.cover = 0, []
+            __write_json__(path + ".cover", self.cover)
+        for _suffix, _size in zip((".day", ".value"), _sizes):
+            if _size > self.rows * 8:
+                os.truncate(path + _suffix, self.rows * 8)
+        __write_json__(path + ".rows", self.rows)
+        self.days = __read_column__(path + ".day", "i8", self.rows)
+        self.values = __read_column__(path + ".value", "f8", self.rows)
+
+    def covered(self, days):
+        """Boolean mask of days inside fetched intervals"""
+        _mask = __NP__.zeros(len(days), dtype=bool)
+        for _start, _end in self.cover:
+            _mask |= (days >= _start) & (days <= _end)
+        return _mask
+
+    def add_cover(self, start, end):
+        """Merge [start, end] into sorted disjoint intervals"""
+        _merged = []
+        for _start, _end in sorted(self.cover + [(start, end)]):
+            if _merged and _start <= _merged[-1][1] + 1:
+                _merged[-1] = (_merged[-1][0], max(_merged[-1][1], _end))
+            else:
+                _merged.append((_start, _end))
+        self.cover = _merged
+        __write_json__(self.path + ".cover", self.cover)
+
+    def add_rows(self, days, values):
+        """Append rows after last day, merge otherwise, new values win"""
+        if len(days) == 0:
+            return
+        if len(self.days) == 0 or days[0] > self.days[-1]:
+            # Plain append to the raw column files
+            for _suffix, _column in [(".day", days), (".value", values)]:
+                with open(self.path + _suffix, "ab") as _file:
+                    _file.write(__NP__.ascontiguousarray(_column).tobytes())
+            self.rows += len(days)
+        else:
+            _days = __NP__.concatenate([days, self.days])
+            _values = __NP__.concatenate([values, self.values])
+            _days, _first = __NP__.unique(_days, return_index=True)
+            # Release maps before replacing the files
+            self.days, self.values = None, None
+            __write_column__(self.path + ".value", _values[_first])
+            __write_column__(self.path + ".day", _days)
+            self.rows = len(_days)
+        # Rows only committed once both columns are written
+        __write_json__(self.path + ".rows", self.rows)
+        self.days = __read_column__(self.path + ".day", "i8", self.rows)
+        self.values = __read_column__(self.path + ".value", "f8", self.rows)
+
+    def slice(self, start, end):
+        """Memory mapped day and value views within [start, end]"""
+        _first = __NP__.searchsorted(self.days, start, side="left")
+        _last = __NP__.searchsorted(self.days, end, side="right")
+        return self.days[_first:_last], self.values[_first:_last]
+
+class HistoryStore(object):
+    """
+    Daily Bloomberg history kept per (ticker, field) on disk
+
+    Parameters
+    ----------
+        folder (string): store root, one sub folder per ticker
+
+        connection (Connection): started connection, shared pool if None
+
+    Notes
+    -----
+    Each series is a raw int64 day column and a float64 value column read
+    through numpy.memmap, plus the list of intervals already fetched. Only
+    business days of the asset calendar outside those intervals are
+    requested, so days without data are not asked for twice. Intervals
+    are only marked as fetched for series that came back with values, and
+    today is never marked since its value is not final. The store covers
+    DAILY ACTIVE_DAYS_ONLY requests.
+    """
+
+    def __init__(self, folder = None, connection = None):
+        self.folder = get_store_folder() if folder is None else folder
+        self.connection = connection
+        self._lock = threading.RLock()
+        self._series = {}
+        self._calendars = {}
+        self.requests = 0
+
+    def _get_series(self, bbgTicker, bbgField):
+        _key = (bbgTicker, bbgField.upper())
+        if _key not in self._series:
+            _folder = os.path.join(self.folder, __safe_name__(bbgTicker))
+            os.makedirs(_folder, exist_ok=True)
+            self._series[_key] = _History(os.path.join(_folder,
+                                                       __safe_name__(_key[1])))
+        return self._series[_key]
+
+    def _get_calendar(self, bbgTicker):
+        if bbgTicker not in self._calendars:
+            self._calendars[bbgTicker] = __get_calendar__(bbgTicker)
+        return self._calendars[bbgTicker]
+
+    def missing(self, bbgTicker, bbgField, startDate, endDate):
+        """
+        Description
+        -----------
+        Business day intervals of [startDate, endDate] not fetched yet
+
+        Examples
+        --------
+            functionReturn (list)::
+
+                >>> HistoryStore().missing("CL1 Comdty", "PX_LAST",
+                                           "20150101", "20151231")
+                [("20151201", "20151231")]
+        """
+        _start = __to_day__(startDate)
+        _end = min(__to_day__(endDate), __to_day__(date.today()))
+        if _end < _start:
+            return []
+        with self._lock:
+            _series = self._get_series(bbgTicker, bbgField)
+            _days = __NP__.arange(_start, _end + 1)
+            _days = _days[self._get_calendar(bbgTicker).is_busday_array(
+                                            _days.astype("datetime64[D]"))]
+            _missing = ~_series.covered(_days)
+        if not _missing.any():
+            return []
+        # Runs of consecutive missing business days
+        _edges = __NP__.diff(__NP__.concatenate([[0], _missing.astype("i1"), [0]]))
+        _firsts = __NP__.flatnonzero(_edges == 1)
+        _lasts = __NP__.flatnonzero(_edges == -1) - 1
+        return [(__to_text__(_days[i]), __to_text__(_days[j]))
+                for i, j in zip(_firsts, _lasts)]
+
+    def update(self, bbgTickers, bbgFields, startDate, endDate):
+        """
+        Description
+        -----------
+        Fetch missing intervals through Connection.bdh and store them
+
+        Notes
+        -----
+        Series sharing the same gaps are fetched in the same requests.
+        Returns the number of bdh calls sent, None if no connection.
+        """
+        _groups = {}
+        for _ticker in bbgTickers:
+            for _field in bbgFields:
+                _gaps = tuple(self.missing(_ticker, _field, startDate, endDate))
+                if _gaps:
+                    _tickers, _fields = _groups.setdefault(_gaps, ([], []))
+                    if _ticker not in _tickers: _tickers.append(_ticker)
+                    if _field.upper() not in _fields: _fields.append(_field.upper())
+        if not _groups:
+            return 0
+        if self.connection is not None:
+            return self._fetch(self.connection, _groups)
+        with __API__.get_pool().connection() as _connection:
+            if _connection is None:
+                logging.error("No connection to update %s", self.folder)
+                return None
+            return self._fetch(_connection, _groups)
+
+    def _fetch(self, connection, groups):
+        _count, _today = 0, __to_day__(date.today())
+        for _gaps, (_tickers, _fields) in list(groups.items()):
+            for _start, _end in _gaps:
+                _table = connection.bdh(_tickers, _fields, _start, _end,
+                                        columnar=True)
+                _count += 1
+                if not connection.is_alive():
+                    logging.error("Session down, stop update at %s", _start)
+                    self.requests += _count
+                    return _count
+                if _table is None:
+                    logging.error("No response %s %s", _tickers, _start)
+                    continue
+                _days = (_table.index.values.astype("datetime64[D]")
+                         .astype("i8"))
+                with self._lock:
+                    for _ticker in _tickers:
+                        for _field in _fields:
+                            _values = _table[(_ticker, _field)].values
+                            _valid = ~__NP__.isnan(_values)
+                            if not _valid.any():
+                                # Error or empty response, asked again later
+                                logging.warning("No data %s %s from %s",
+                                                _ticker, _field, _start)
+                                continue
+                            _series = self._get_series(_ticker, _field)
+                            _series.add_rows(_days[_valid], _values[_valid])
+                            _last = min(__to_day__(_end), _today - 1)
+                            if _last >= __to_day__(_start):
+                                _series.add_cover(__to_day__(_start), _last)
+        self.requests += _count
+        return _count
+
+    def get(self, bbgTickers = ["CL1 Comdty"], bbgFields = ["PX_LAST"],
+            startDate = None, endDate = None, update = True):
+        """
+        Description
+        -----------
+        Stored history as Connection.bdh(columnar=True), gaps fetched first
+
+        Parameters
+        ----------
+            bbgTickers/bbgFields (string array): bloomberg tickers and fields
+
+            startDate/endDate (date): ISOformat yyyymmdd, last year up to
+            today if None
+
+            update (boolean): fetch missing intervals before reading
+
+        Examples
+        --------
+            functionReturn (DataFrame)::
+
+                >>> HistoryStore().get(["CL1 Comdty"], ["PX_LAST"])
+                DataFrame(columns=[(ticker, field)], index=date)
+        """
+        if endDate is None: endDate = date.today().strftime("%Y%m%d")
+        if startDate is None:
+            startDate = (date.today() - timedelta(days=365)).strftime("%Y%m%d")
+        if update:
+            self.update(bbgTickers, bbgFields, startDate, endDate)
+        _start, _end = __to_day__(startDate), __to_day__(endDate)
+        _columns = []
+        with self._lock:
+            for _ticker in bbgTickers:
+                for _field in bbgFields:
+                    _columns.append(self._get_series(_ticker, _field)
+                                    .slice(_start, _end))
+        _index = __NP__.unique(__NP__.concatenate(
+                    [_days for _days, _values in _columns] + [__NP__.empty(0, "i8")]))
+        _table = __NP__.full((len(_index), len(_columns)), __NP__.nan)
+        for j, (_days, _values) in enumerate(_columns):
+            _table[__NP__.searchsorted(_index, _days), j] = _values
+        return __PD__.DataFrame(
+                    _table,
+                    index=__PD__.DatetimeIndex(_index.astype("datetime64[D]"),
+                                               name="date"),
+                    columns=__PD__.MultiIndex.from_product(
+                                    [list(bbgTickers), list(bbgFields)],
+                                    names=["ticker", "field"]))
+
+#------------------------------------------------------------------------------
+# Intraday tick archive per (ticker, day)
+#------------------------------------------------------------------------------
+
+class TickArchive(object):
+    """
+    Raw bdit ticks kept per (ticker, calendar day) on disk
+
+    Parameters
+    ----------
+        folder (string): archive root, one sub folder per ticker
+
+        connection (Connection): started connection, shared pool if None
+
+        eventTypes (string array): event types archived for every day
+
+    Notes
+    -----
+    A day is stored as fixed width columns of __API__.TICK_COLUMNS (int64
+    ns time, float64 value, float64 size, int8 event code), one raw file
+    each, and a small JSON file written last that marks the day complete.
+    Queries memory map the time column, locate the requested slice with a
+    binary search and only read that slice of the other columns. Only
+    business days of the asset calendar are archived or queried. Days not
+    yet over are never archived, queries fetch the requested part only.
+    Days answered with an error are not marked and are fetched again.
+    """
+
+    def __init__(self, folder = None, connection = None,
+                 eventTypes = ["TRADE", "AT_TRADE"]):
+        _root = get_store_folder() if folder is None else folder
+        self.folder = os.path.join(_root, "ticks")
+        self.connection = connection
+        self.eventTypes = list(eventTypes)
+        self._lock = threading.Lock()
+        self._calendars = {}
+        self.requests = 0
+
+    def _path(self, bbgTicker, day):
+        return os.path.join(self.folder, __safe_name__(bbgTicker),
+                            day.strftime("%Y%m%d"))
+
+    def has_day(self, bbgTicker, day):
+        """True if day is archived for ticker"""
+        return os.path.exists(self._path(bbgTicker, day) + ".json")
+
+    def _get_calendar(self, bbgTicker):
+        if bbgTicker not in self._calendars:
+            self._calendars[bbgTicker] = __get_calendar__(bbgTicker)
+        return self._calendars[bbgTicker]
+
+    def _fetch_day(self, connection, bbgTicker, day, start = None, end = None):
+        """Raw ticks of one day, or its [start, end] part, None on failure"""
+        _midnight = datetime.combine(day, datetime.min.time())
+        _start = _midnight if start is None else max(start, _midnight)
+        _end = _midnight + timedelta(days=1)
+        _last = _end if end is None else min(end, _end)
+        _table = connection.bdit(bbgTicker=bbgTicker, eventTypes=self.eventTypes,
+                                 startTime=_start.isoformat(),
+                                 endTime=_last.isoformat(),
+                                 columnar=True, aggregate=False)
+        self.requests += 1
+        if not connection.is_alive():
+            logging.error("Session down on %s %s", bbgTicker, day)
+            return None
+        if connection.errors:
+            logging.error("Error on %s %s, day not archived", bbgTicker, day)
+            return None
+        # Ticks at next midnight belong to next day
+        _times = _table.index.values.view("i8")
+        _keep = ((_times >= __PD__.Timestamp(_start).value)
+                 & (_times <= __PD__.Timestamp(_last).value)
+                 & (_times < __PD__.Timestamp(_end).value))
+        _columns = {"time":_times[_keep]}
+        for _name, _dtype in __API__.TICK_COLUMNS[1:]:
+            _columns[_name] = _table[_name].values[_keep].astype(_dtype)
+        # Sort by time, stable so same stamp ticks keep their order
+        _order = __NP__.argsort(_columns["time"], kind="stable")
+        return {_name:_column[_order] for _name, _column in _columns.items()}
+
+    def _write_day(self, bbgTicker, day, columns):
+        _path = self._path(bbgTicker, day)
+        with self._lock:
+            os.makedirs(os.path.dirname(_path), exist_ok=True)
+            for _name, _dtype in __API__.TICK_COLUMNS:
+                __write_column__("%s.%s" % (_path, _name),
+                                 columns[_name].astype(_dtype))
+            __write_json__(_path + ".json", {"rows":len(columns["time"]),
+                                             "eventTypes":self.eventTypes})
+
+    def _read_day(self, bbgTicker, day, start, end):
+        """Columns of archived day sliced to [start, end] in ns"""
+        _path = self._path(bbgTicker, day)
+        _times = __read_column__(_path + ".time", "i8")
+        _first = __NP__.searchsorted(_times, start, side="left")
+        _last = __NP__.searchsorted(_times, end, side="right")
+        _columns = {"time":__NP__.array(_times[_first:_last])}
+        for _name, _dtype in __API__.TICK_COLUMNS[1:]:
+            _column = __read_column__("%s.%s" % (_path, _name), _dtype)
+            _columns[_name] = __NP__.array(_column[_first:_last])
+        return _columns
+
+    def archive(self, bbgTicker, startDate, endDate, connection = None):
+        """
+        Description
+        -----------
+        Fetch and store every complete day of [startDate, endDate] missing
+
+        Examples
+        --------
+            functionReturn (integer): bdit requests sent::
+
+                >>> TickArchive().archive("CL1 Comdty", "20151201", "20151231")
+                31
+        """
+        _start = __to_day__(startDate)
+        _end = min(__to_day__(endDate), __to_day__(date.today()) - 1)
+        if _end < _start:
+            return 0
+        _days = __NP__.arange(_start, _end + 1).astype("datetime64[D]")
+        _days = _days[self._get_calendar(bbgTicker).is_busday_array(_days)]
+        _days = [_day for _day in _days.tolist()
+                 if not self.has_day(bbgTicker, _day)]
+        if not _days:
+            return 0
+        if connection is None: connection = self.connection
+        if connection is not None:
+            return self._archive(connection, bbgTicker, _days)
+        with __API__.get_pool().connection() as _connection:
+            if _connection is None:
+                logging.error("No connection to archive %s", bbgTicker)
+                return None
+            return self._archive(_connection, bbgTicker, _days)
+
+    def _archive(self, connection, bbgTicker, days):
+        _count = 0
+        for _day in days:
+            _columns = self._fetch_day(connection, bbgTicker, _day)
+            _count += 1
+            if _columns is None:
+                # Failed day left unmarked, asked again later
+                if not connection.is_alive():
+                    break
+                continue
+            self._write_day(bbgTicker, _day, _columns)
+        return _count
+
+    def get(self, bbgTicker = "CL1 Comdty", startTime = None, endTime = None,
+            eventTypes = None, aggregate = False):
+        """
+        Description
+        -----------
+        Ticks of [startTime, endTime] as Connection.bdit(columnar=True)
+
+        Parameters
+        ----------
+            bbgTicker (string): bloomberg ticker
+
+            startTime/endTime (datetime): datetime or ISOformat string, last
+            day up to now if None
+
+            eventTypes (string array): subset of archived types, all if None
+
+            aggregate (boolean): average value per time stamp
+
+        Examples
+        --------
+            functionReturn (DataFrame)::
+
+                >>> TickArchive().get("CL1 Comdty", "2015-12-01T19:00:00",
+                                      "2015-12-01T19:30:00")
+                DataFrame(columns=["value", "size", "type"], index=time)
+        """
+        _now = datetime.now().replace(microsecond=0)
+        if endTime is None: endTime = _now
+        if startTime is None: startTime = _now - timedelta(days=1)
+        _start = __PD__.Timestamp(startTime).to_pydatetime()
+        _end = __PD__.Timestamp(endTime).to_pydatetime()
+        _ns = (__PD__.Timestamp(_start).value, __PD__.Timestamp(_end).value)
+        self.archive(bbgTicker, _start.date(), _end.date())
+        _parts = []
+        _calendar = self._get_calendar(bbgTicker)
+        _day = _start.date()
+        while _day <= _end.date():
+            if self.has_day(bbgTicker, _day):
+                _parts.append(self._read_day(bbgTicker, _day, *_ns))
+            elif _calendar.is_busday(_day):
+                # Current day, or day that failed to archive
+                _parts.append(self._fetch_live(bbgTicker, _day, _start, _end))
+            _day += timedelta(days=1)
+        _columns = {_name:__NP__.concatenate([_part[_name] for _part in _parts]
+                                             + [__NP__.empty(0, _dtype)])
+                    for _name, _dtype in __API__.TICK_COLUMNS}
+        if eventTypes is not None:
+            _codes = [__API__.EVENT_CODES.get(_type, -1) for _type in eventTypes]
+            _keep = __NP__.isin(_columns["type"], _codes)
+            _columns = {_name:_column[_keep] for _name, _column in _columns.items()}
+        _times = _columns["time"].view("datetime64[ns]")
+        if aggregate:
+            return __API__.aggregate_ticks(_times, _columns["value"],
+                                           _columns["size"])
+        return __PD__.DataFrame({"value":_columns["value"],
+                                 "size":_columns["size"],
+                                 "type":_columns["type"]},
+                                index=__PD__.DatetimeIndex(_times, name="time"))
+
+    def _fetch_live(self, bbgTicker, day, start, end):
+        """Ticks of day within [start, end], requested for that window only"""
+        _columns = None
+        if self.connection is not None:
+            _columns = self._fetch_day(self.connection, bbgTicker, day,
+                                       start, end)
+        else:
+            with __API__.get_pool().connection() as _connection:
+                if _connection is not None:
+                    _columns = self._fetch_day(_connection, bbgTicker, day,
+                                               start, end)
+        if _columns is None:
+            return {_name:__NP__.empty(0, _dtype)
+                    for _name, _dtype in __API__.TICK_COLUMNS}
+        return _columns
+
+#------------------------------------------------------------------------------
+# Unit Testing
+#------------------------------------------------------------------------------
+
+if __name__ == "__main__":
+    _store = HistoryStore()
+    _tickers = ["CL1 Comdty", "CO1 Comdty"]
+    print((_store.missing("CL1 Comdty", "PX_LAST", "20150101", "20151231")))
+    print((_store.get(_tickers, ["PX_LAST"], "20150101", "20151231")))
+    print((_store.missing("CL1 Comdty", "PX_LAST", "20150101", "20151231")))
+    _archive = TickArchive()
+    print((_archive.get("CL1 Comdty", "2015-12-01T19:00:00",
+                        "2015-12-01T19:30:00", aggregate=True)))
@@ -0,0 +1,305 @@
+# -*- coding: utf-8 -*-
+
+"""Bloomberg Stream Module
+Real-time //blp/mktdata subscriptions into per-ticker NumPy ring buffers
+"""
+__author__  = "Eric Pieuchot"
+__date__    = "18 Oct 2026"
+
+from datetime import datetime
+import comex.api.bbgapi as __API__
+import comex.utility.lazy as __LAZY__
+__NP__ = __LAZY__.lazy_import("numpy")
+import threading
+import logging
+
+__all__ = ['RingBuffer', 'Stream', 'STREAM_FIELDS']
+
+STREAM_SERVICE = "//blp/mktdata"
+STREAM_FIELDS = ["LAST_PRICE", "SIZE_LAST_TRADE", "BID", "ASK",
+                 "BID_SIZE", "ASK_SIZE"]
+STREAM_CAPACITY = 1 << 16
+PUMP_TIMEOUT = 200
+# (event code, value element, size element) per MKTDATA_EVENT_SUBTYPE
+STREAM_QUOTES = {"BID":(__API__.EVENT_CODES["BID"], "BID", "BID_SIZE"),
+                 "ASK":(__API__.EVENT_CODES["ASK"], "ASK", "ASK_SIZE")}
+STREAM_TRADE = (__API__.EVENT_CODES["TRADE"], "LAST_PRICE", "SIZE_LAST_TRADE")
+
+#------------------------------------------------------------------------------
+# Fixed size columnar ring buffer
+#------------------------------------------------------------------------------
+
+class RingBuffer(object):
+    """
+    Fixed capacity NumPy columns overwritten oldest first
+
+    Notes
+    -----
+    Rows are addressed by a sequence number counting every append since
+    creation, so readers keep their own position and read new rows with
+    segments(). Only the pump thread writes.
+    """
+
+    def __init__(self, dtypes = __API__.TICK_COLUMNS, capacity = STREAM_CAPACITY):
+        self.names = [_name for _name, _dtype in dtypes]
+        self.capacity = capacity
+        self.count = 0
+        self._columns = [__NP__.empty(capacity, dtype=_dtype)
+                         for _name, _dtype in dtypes]
+
+    def append(self, *values):
+        """Append one row, values in column order"""
+        _index = self.count % self.capacity
+        for _column, _value in zip(self._columns, values):
+            _column[_index] = _value
+        self.count += 1
+
+    def extend(self, *columns):
+        """Append equal length sequences, one per column in column order"""
+        _count = len(columns[0])
+        if _count > self.capacity:
+            columns = [_values[-self.capacity:] for _values in columns]
+            self.count += _count - self.capacity
+            _count = self.capacity
+        _first = self.count % self.capacity
+        _split = min(_count, self.capacity - _first)
+        for _column, _values in zip(self._columns, columns):
+            _values = __NP__.asarray(_values)
+            _column[_first:_first + _split] = _values[:_split]
+            _column[:_count - _split] = _values[_split:]
+        self.count += _count
+
+    def segments(self, start, stop = None):
+        """
+        Description
+        -----------
+        Views of rows [start, stop) by sequence number, no copy
+
+        Notes
+        -----
+        Yields at most two dicts of column views when the range wraps
+        around the end of the buffer. Rows already overwritten are skipped.
+        """
+        if stop is None: stop = self.count
+        if start < stop - self.capacity:
+            logging.warning("Ring buffer overrun, %s rows lost",
+                            stop - self.capacity - start)
+            start = stop - self.capacity
+        while start < stop:
+            _first = start % self.capacity
+            _last = min(self.capacity, _first + stop - start)
+            yield {_name:_column[_first:_last]
+                   for _name, _column in zip(self.names, self._columns)}
+            start += _last - _first
+
+    def latest(self, count = None):
+        """Copy of the last count rows in time order"""
+        _start = self.count - min(self.count, self.capacity,
+                                  self.capacity if count is None else count)
+        _parts = list(self.segments(_start))
+        return {_name:__NP__.concatenate([_part[_name] for _part in _parts]
+                                         + [__NP__.empty(0, _column.dtype)])
+                for _name, _column in zip(self.names, self._columns)}
+
+#------------------------------------------------------------------------------
+# //blp/mktdata subscription session
+#------------------------------------------------------------------------------
+
+class Stream(object):
+    """
+    Trades and quotes streamed into one RingBuffer per ticker
+
+    Parameters
+    ----------
+        capacity (integer): rows kept per ticker
+
+        api (module): blpapi or comex.api.bbgstub.StubApi
+
+    Notes
+    -----
+    A background thread owns nextEvent and writes rows (receipt time in
+    ns, value, size, event code) in the TICK_COLUMNS layout. Callbacks run
+    on that thread after each event as callback(ticker, ring, start, stop)
+    and read new rows through ring.segments(start, stop) without copying.
+    ticks() offers the same rows as a blocking generator. Tickers in
+    active are subscribed, unsubscribed ones keep their ring and correlation
+    id so subscribing again resumes appending to the same ring.
+    """
+
+    def __init__(self, host = "localhost", port = 8194,
+                 capacity = STREAM_CAPACITY, api = None):
+        self._connection = __API__.Connection(host, port, api)
+        self._api = self._connection._api
+        self.capacity = capacity
+        self.rings = {}
+        self.active = set()
+        self._tickers, self._ids = {}, {}
+        self._callbacks = []
+        self._condition = threading.Condition()
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        """Start session and event pump"""
+        if not self._connection.start_service(STREAM_SERVICE):
+            logging.critical("Error on %s", STREAM_SERVICE)
+            return False
+        self._session = self._connection._session
+        self._running = True
+        self._thread = threading.Thread(target=self._pump, name="bbgstream",
+                                        daemon=True)
+        self._thread.start()
+        return True
+
+    def subscribe(self, bbgTickers, bbgFields = STREAM_FIELDS):
+        """Subscribe tickers, ring buffers created on first subscription"""
+        _list, _count = self._api.SubscriptionList(), 0
+        for _ticker in bbgTickers:
+            if _ticker in self.active:
+                continue
+            # Resubscription keeps correlation id and appends to same ring
+            if _ticker not in self._ids:
+                _id = len(self._tickers)
+                self._tickers[_id], self._ids[_ticker] = _ticker, _id
+                self.rings[_ticker] = RingBuffer(__API__.TICK_COLUMNS,
+                                                 self.capacity)
+            _list.add(_ticker, ",".join(bbgFields), "",
+                      self._api.CorrelationId(self._ids[_ticker]))
+            self.active.add(_ticker)
+            _count += 1
+        if _count > 0:
+            self._session.subscribe(_list)
+        return True
+
+    def unsubscribe(self, bbgTickers):
+        """Stop updates, ring buffers stay readable"""
+        _list, _count = self._api.SubscriptionList(), 0
+        for _ticker in bbgTickers:
+            if _ticker not in self.active:
+                continue
+            _list.add(_ticker, "", "", self._api.CorrelationId(self._ids[_ticker]))
+            self.active.discard(_ticker)
+            _count += 1
+        if _count > 0:
+            self._session.unsubscribe(_list)
+        return True
+
+    def add_callback(self, callback):
+        """Call callback(ticker, ring, start, stop) on new rows"""
+        self._callbacks.append(callback)
+
+    def remove_callback(self, callback):
+        self._callbacks.remove(callback)
+
+    def _on_message(self, msg, ring):
+        """Append trade or quote rows of one MarketDataEvents message"""
+        _now = __API__.to_nanos([datetime.now()])[0]
+        _type = (msg.getElementAsString("MKTDATA_EVENT_TYPE")
+                 if msg.hasElement("MKTDATA_EVENT_TYPE") else "SUMMARY")
+        if _type == "TRADE":
+            _rules = [STREAM_TRADE]
+        elif _type == "SUMMARY":
+            # Initial paint, every field present
+            _rules = [STREAM_TRADE] + list(STREAM_QUOTES.values())
+        else:
+            _rules = [STREAM_QUOTES.get(
+                        msg.getElementAsString("MKTDATA_EVENT_SUBTYPE"))]
+        for _rule in _rules:
+            if _rule is None:
+                continue
+            _code, _value, _size = _rule
+            if msg.hasElement(_value):
+                ring.append(_now, msg.getElementAsFloat(_value),
+                            msg.getElementAsFloat(_size)
+                            if msg.hasElement(_size) else 0., _code)
+
+    def _pump(self):
+        """Route subscription data to ring buffers"""
+        while self._running:
+            try:
+                _event = self._session.nextEvent(PUMP_TIMEOUT)
+                self._connection._check_status(_event)
+                if _event.eventType() != self._api.Event.SUBSCRIPTION_DATA:
+                    continue
+                _starts = {}
+                for _msg in _event:
+                    for _cid in _msg.correlationIds():
+                        _ticker = self._tickers.get(_cid.value())
+                        if _ticker is None:
+                            continue
+                        _ring = self.rings[_ticker]
+                        _starts.setdefault(_ticker, _ring.count)
+                        self._on_message(_msg, _ring)
+                for _ticker, _start in _starts.items():
+                    _ring = self.rings[_ticker]
+                    for _callback in list(self._callbacks):
+                        try:
+                            _callback(_ticker, _ring, _start, _ring.count)
+                        except:
+                            logging.error("Error on callback %s", _callback,
+                                          exc_info=True)
+                with self._condition:
+                    self._condition.notify_all()
+            except:
+                logging.error("Error on event pump", exc_info=True)
+
+    def ticks(self, bbgTicker, timeout = None):
+        """
+        Description
+        -----------
+        Generator of new rows for bbgTicker, one dict of views per batch
+
+        Examples
+        --------
+            functionReturn (generator)::
+
+                >>> for _rows in Stream().ticks("CL1 Comdty"):
+                        _rows["value"], _rows["size"]
+        """
+        _ring = self.rings[bbgTicker]
+        _position = _ring.count
+        while self._running:
+            with self._condition:
+                if _ring.count == _position:
+                    if not self._condition.wait(timeout) and timeout is not None:
+                        return
+            _stop = _ring.count
+            for _segment in _ring.segments(_position, _stop):
+                yield _segment
+            _position = _stop
+
+    def stop(self):
+        """Stop event pump and session"""
+        self._running = False
+        self.active.clear()
+        if self._thread is not None:
+            self._thread.join()
+        with self._condition:
+            self._condition.notify_all()
+        return self._connection.stop_service()
+
+#------------------------------------------------------------------------------
+# Unit Testing
+#------------------------------------------------------------------------------
+
+if __name__ == "__main__":
+    import comex.tool.settle as __SET__
+    _accumulator = __SET__.VwapAccumulator()
+    _trade = __API__.EVENT_CODES["TRADE"]
+    def _on_ticks(_ticker, _ring, _start, _stop):
+        # Settlement vwap fed straight from the ring buffer views
+        for _rows in _ring.segments(_start, _stop):
+            _trades = _rows["type"] == _trade
+            for _time, _value, _size in zip(_rows["time"][_trades] // 10**9,
+                                            _rows["value"][_trades],
+                                            _rows["size"][_trades]):
+                _accumulator.push(_time, _value, _size)
+    _stream = Stream()
+    if _stream.start():
+        _stream.subscribe(["CL1 Comdty"])
+        _stream.add_callback(_on_ticks)
+        for i, _rows in enumerate(_stream.ticks("CL1 Comdty", timeout=5)):
+            print((len(_rows["time"]), _accumulator.snapshot()))
+            if i == 10:
+                break
+        _stream.stop()
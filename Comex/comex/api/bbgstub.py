@@ -0,0 +1,685 @@
+# -*- coding: utf-8 -*-
+
+"""Bloomberg Stub Module
+Local blpapi stand-in for offline testing, replay and load benchmarks
+"""
+__author__  = "Eric Pieuchot"
+__date__    = "18 Oct 2026"
+
+from datetime import datetime, timedelta, date
+import comex.api.bbgapi as __API__
+import comex.utility.lazy as __LAZY__
+__PD__ = __LAZY__.lazy_import("pandas")
+__NP__ = __LAZY__.lazy_import("numpy")
+import itertools
+import threading
+import logging
+import random
+import queue
+import json
+import time
+import zlib
+import re
+
+__all__ = ['StubApi', 'Element', 'Recorder', 'element_to_dict']
+
+#------------------------------------------------------------------------------
+# blpapi object model subset
+#------------------------------------------------------------------------------
+
+class Name(str):
+    """blpapi.Name stand-in, compares equal to its string"""
+    pass
+
+class CorrelationId(object):
+    """blpapi.CorrelationId stand-in"""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, value = None):
+        self._value = next(CorrelationId._ids) if value is None else value
+
+    def value(self):
+        return self._value
+
+    def __eq__(self, other):
+        return isinstance(other, CorrelationId) and other._value == self._value
+
+    def __hash__(self):
+        return hash(self._value)
+
+class Element(object):
+    """blpapi.Element stand-in holding a value, children or an array"""
+
+    __slots__ = ["_name", "_value", "_children", "_index", "_values"]
+
+    def __init__(self, name, value = None, children = None, values = None):
+        self._name, self._value = name, value
+        self._children, self._values = children, values
+        self._index = None
+        if children is not None:
+            self._index = {_child._name:_child for _child in children}
+
+    def name(self):
+        return Name(self._name)
+
+    def isArray(self):
+        return self._values is not None
+
+    def isComplexType(self):
+        return self._children is not None
+
+    def elements(self):
+        return list(self._children or [])
+
+    def values(self):
+        return list(self._values or [])
+
+    def numElements(self):
+        return len(self._children or [])
+
+    def numValues(self):
+        return len(self._values) if self._values is not None else 1
+
+    def hasElement(self, name):
+        return self._index is not None and str(name) in self._index
+
+    def getElement(self, name):
+        if isinstance(name, int):
+            return self._children[name]
+        return self._index[str(name)]
+
+    def getValue(self, index = 0):
+        return self._value if self._values is None else self._values[index]
+
+    def getValueAsElement(self, index = 0):
+        return self._values[index]
+
+    def getValueAsFloat(self, index = 0):
+        return float(self.getValue(index))
+
+    def getValueAsInteger(self, index = 0):
+        return int(self.getValue(index))
+
+    def getValueAsDatetime(self, index = 0):
+        return self.getValue(index)
+
+    def getValueAsString(self, index = 0):
+        return str(self.getValue(index))
+
+    def getElementValue(self, name):
+        return self.getElement(name).getValue()
+
+    def getElementAsFloat(self, name):
+        return float(self._index[str(name)]._value)
+
+    def getElementAsInteger(self, name):
+        return int(self._index[str(name)]._value)
+
+    def getElementAsDatetime(self, name):
+        return self._index[str(name)]._value
+
+    def getElementAsString(self, name):
+        return str(self._index[str(name)]._value)
+
+    def toString(self):
+        return json.dumps(element_to_dict(self))
+
+class Message(object):
+    """blpapi.Message stand-in"""
+
+    def __init__(self, element, correlationId = None):
+        self._element, self._cid = element, correlationId
+
+    def messageType(self):
+        return self._element.name()
+
+    def correlationIds(self):
+        return [self._cid] if self._cid is not None else []
+
+    def asElement(self):
+        return self._element
+
+    def getElement(self, name):
+        return self._element.getElement(name)
+
+    def hasElement(self, name):
+        return self._element.hasElement(name)
+
+    def getElementAsFloat(self, name):
+        return self._element.getElementAsFloat(name)
+
+    def getElementAsString(self, name):
+        return self._element.getElementAsString(name)
+
+    def getElementAsDatetime(self, name):
+        return self._element.getElementAsDatetime(name)
+
+class Event(object):
+    """blpapi.Event stand-in, same event type codes"""
+
+    ADMIN, SESSION_STATUS, SUBSCRIPTION_STATUS, REQUEST_STATUS = 1, 2, 3, 4
+    RESPONSE, PARTIAL_RESPONSE, SUBSCRIPTION_DATA, SERVICE_STATUS = 5, 6, 8, 9
+    TIMEOUT = 10
+
+    def __init__(self, eventType, messages = ()):
+        self._type, self._messages = eventType, list(messages)
+
+    def eventType(self):
+        return self._type
+
+    def __iter__(self):
+        return iter(self._messages)
+
+class Request(object):
+    """blpapi.Request stand-in recording set/append parameters"""
+
+    def __init__(self, operation):
+        self.operation, self.params = operation, {}
+
+    def set(self, name, value):
+        self.params[name] = value
+
+    def append(self, name, value):
+        self.params.setdefault(name, []).append(value)
+
+    def key(self):
+        """Canonical key used to match recorded responses"""
+        return json.dumps([self.operation, self.params], sort_keys=True,
+                          default=str)
+
+    def toString(self):
+        return "%s = %s" % (self.operation, json.dumps(self.params, default=str))
+
+class Service(object):
+
+    def __init__(self, name):
+        self._name = name
+
+    def name(self):
+        return self._name
+
+    def createRequest(self, operation):
+        return Request(operation)
+
+class SubscriptionList(object):
+    """blpapi.SubscriptionList stand-in"""
+
+    def __init__(self):
+        self.subscriptions = []
+
+    def add(self, topic, fields = None, options = None, correlationId = None):
+        if isinstance(fields, str):
+            fields = fields.split(",")
+        self.subscriptions.append((topic, list(fields or []), correlationId))
+
+class SessionOptions(object):
+
+    def setServerHost(self, host):
+        self.host = host
+
+    def setServerPort(self, port):
+        self.port = port
+
+#------------------------------------------------------------------------------
+# Element tree serialization for recorded sessions
+#------------------------------------------------------------------------------
+
+def __to_json__(value):
+    # Full precision and offset kept, pandas Timestamp for nanoseconds
+    if getattr(value, "nanosecond", 0):
+        return {"$ts":value.isoformat()}
+    if isinstance(value, datetime):
+        return {"$dt":value.isoformat()}
+    if isinstance(value, date):
+        return {"$d":value.isoformat()}
+    return value
+
+def __from_json__(value):
+    if isinstance(value, dict) and "$dt" in value:
+        return datetime.fromisoformat(value["$dt"])
+    if isinstance(value, dict) and "$ts" in value:
+        return __PD__.Timestamp(value["$ts"])
+    if isinstance(value, dict) and "$d" in value:
+        return datetime.strptime(value["$d"], "%Y-%m-%d").date()
+    return value
+
+def element_to_dict(element):
+    """Convert blpapi or stub Element into JSON compatible tree"""
+    _name = str(element.name())
+    if element.isArray():
+        _values = [element.getValueAsElement(i) if _is_complex_array(element)
+                   else element.getValue(i) for i in range(element.numValues())]
+        return {"name":_name,
+                "values":[element_to_dict(_value) if hasattr(_value, "name")
+                          else __to_json__(_value) for _value in _values]}
+    if element.isComplexType():
+        return {"name":_name,
+                "children":[element_to_dict(element.getElement(i))
+                            for i in range(element.numElements())]}
+    return {"name":_name, "value":__to_json__(element.getValue())}
+
+def _is_complex_array(element):
+    try:
+        return element.numValues() > 0 and hasattr(element.getValueAsElement(0), "name")
+    except Exception:
+        return False
+
+def dict_to_element(tree):
+    """Rebuild stub Element from element_to_dict output"""
+    if "values" in tree:
+        return Element(tree["name"], values=[
+                            dict_to_element(_value) if isinstance(_value, dict)
+                            and "name" in _value else __from_json__(_value)
+                            for _value in tree["values"]])
+    if "children" in tree:
+        return Element(tree["name"], children=[dict_to_element(_child)
+                                               for _child in tree["children"]])
+    return Element(tree["name"], __from_json__(tree["value"]))
+
+#------------------------------------------------------------------------------
+# Synthetic response generation
+#------------------------------------------------------------------------------
+
+def __seed__(*keys):
+    return zlib.crc32("|".join(str(_key) for _key in keys).encode())
+
+def __parse_time__(value):
+    return datetime.strptime(str(value)[:19], "%Y-%m-%dT%H:%M:%S")
+
+def __parse_date__(value):
+    """Parse yyyymmdd with optional relative shift such as '-1CY'"""
+    _text = str(value).strip()
+    _date = datetime.strptime(_text[:8], "%Y%m%d").date()
+    _match = re.search(r"([+-]\d+)C([DWMY])", _text[8:])
+    if _match:
+        _count, _unit = int(_match.group(1)), _match.group(2)
+        _days = {"D":1, "W":7, "M":30, "Y":365}[_unit]
+        _date += timedelta(days=_count * _days)
+    return _date
+
+class StubApi(object):
+    """
+    blpapi replacement for Connection(api=StubApi(...))
+
+    Parameters
+    ----------
+        tickRate (float): ticks per second in IntradayTickResponse and
+        //blp/mktdata subscriptions
+
+        chunkSize (integer): ticks, bars or securities per PARTIAL_RESPONSE
+
+        latency (float): seconds between events of a response
+
+        replay (string): recorded session file from Recorder.save
+
+        seed (integer): base seed for deterministic random data
+
+        memoize (boolean): keep generated responses, so that repeated
+        requests measure parsing only
+    """
+
+    Name, CorrelationId, Event = Name, CorrelationId, Event
+    SessionOptions, Element = SessionOptions, Element
+    SubscriptionList = SubscriptionList
+
+    def __init__(self, tickRate = 5., chunkSize = 1000, latency = 0.,
+                 replay = None, seed = 0, memoize = False):
+        self.tickRate, self.chunkSize = tickRate, chunkSize
+        self.latency, self.seed = latency, seed
+        self.memoize, self.generated = memoize, {}
+        self.recorded = {}
+        if replay is not None:
+            self.load(replay)
+
+    def Session(self, options = None):
+        return StubSession(self, options)
+
+    def load(self, fileName):
+        """Load recorded responses keyed by request"""
+        with open(fileName, 'r') as _file:
+            for _record in json.load(_file):
+                self.recorded[_record["request"]] = _record["events"]
+        return True
+
+    def respond(self, request):
+        """Return list of (event type, [Element]) for request"""
+        _key = request.key()
+        if _key in self.recorded:
+            return [(_event["type"], [dict_to_element(_message)
+                                      for _message in _event["messages"]])
+                    for _event in self.recorded[_key]]
+        if _key in self.generated:
+            return self.generated[_key]
+        _events = self._generate(request)
+        if self.memoize:
+            self.generated[_key] = _events
+        return _events
+
+    def _generate(self, request):
+        if request.operation == "HistoricalDataRequest":
+            return self._history(request.params)
+        if request.operation == "IntradayTickRequest":
+            return self._ticks(request.params)
+        if request.operation == "IntradayBarRequest":
+            return self._bars(request.params)
+        logging.error("Unsupported request %s", request.operation)
+        return [(Event.RESPONSE, [Element(
+                    request.operation.replace("Request", "Response"), children=[
+                        Element("responseError", children=[
+                            Element("message",
+                                    "Unsupported %s" % request.operation)])])])]
+
+    def _chunks(self, items, size):
+        _size = max(1, size)
+        _chunks = [items[k:k + _size] for k in range(0, len(items), _size)]
+        return _chunks or [[]]
+
+    def _to_events(self, messages):
+        """Last message in RESPONSE event, others in PARTIAL_RESPONSE"""
+        return [(Event.RESPONSE if k == len(messages) - 1
+                 else Event.PARTIAL_RESPONSE, [_message])
+                for k, _message in enumerate(messages)]
+
+    def _history(self, params):
+        _start = __parse_date__(params["startDate"])
+        _end = __parse_date__(params["endDate"])
+        _fields = params.get("fields", [])
+        _days = [_start + timedelta(days=i) for i in range((_end - _start).days + 1)]
+        if params.get("nonTradingDayFillOption") != "ALL_CALENDAR_DAYS":
+            _days = [_day for _day in _days if _day.weekday() < 5]
+        _messages = []
+        for _security in params.get("securities", []):
+            # Random walk anchored on security and date for stable chunks
+            _rows = []
+            for _day in _days:
+                _random = random.Random(__seed__(self.seed, _security, _day))
+                _price = 50. + (__seed__(_security) % 50) + 10. * _random.random()
+                _children = [Element("date", _day)]
+                for _field in _fields:
+                    if "VOLUME" in _field.upper():
+                        _value = float(_random.randint(1000, 100000))
+                    else:
+                        _value = round(_price + _random.gauss(0, 0.5), 2)
+                    _children.append(Element(_field, _value))
+                _rows.append(Element("fieldData", children=_children))
+            _messages.append(Element("HistoricalDataResponse", children=[
+                                Element("securityData", children=[
+                                    Element("security", _security),
+                                    Element("sequenceNumber", len(_messages)),
+                                    Element("fieldData", values=_rows)])]))
+        return self._to_events(_messages)
+
+    def _ticks(self, params):
+        _security = params["security"]
+        _start = __parse_time__(params["startDateTime"])
+        _end = __parse_time__(params["endDateTime"])
+        _types = params.get("eventTypes", ["TRADE"])
+        _random = __NP__.random.RandomState(__seed__(self.seed, _security,
+                                                    _start, _end))
+        _count = int((_end - _start).total_seconds() * self.tickRate)
+        _seconds = max(1, int((_end - _start).total_seconds()))
+        _offsets = __NP__.sort(_random.randint(0, _seconds, _count)).tolist()
+        _steps = _random.choice([-0.01, 0., 0.01], _count)
+        _prices = __NP__.round(50. + (__seed__(_security) % 50)
+                               + __NP__.cumsum(_steps), 2).tolist()
+        _sizes = _random.choice([0., 1., 1., 2., 5., 10.], _count).tolist()
+        _kinds = _random.randint(0, len(_types), _count).tolist()
+        _times = {}
+        _ticks = []
+        for _offset, _price, _size, _kind in zip(_offsets, _prices, _sizes, _kinds):
+            if _offset not in _times:
+                _times[_offset] = _start + timedelta(seconds=_offset)
+            _ticks.append(Element("tickData", children=[
+                            Element("time", _times[_offset]),
+                            Element("type", _types[_kind]),
+                            Element("value", _price),
+                            Element("size", _size)]))
+        _messages = [Element("IntradayTickResponse", children=[
+                        Element("tickData", children=[
+                            Element("eventDataArray", values=[]),
+                            Element("tickData", values=_chunk)])])
+                     for _chunk in self._chunks(_ticks, self.chunkSize)]
+        return self._to_events(_messages)
+
+    def _bars(self, params):
+        _security = params["security"]
+        _start = __parse_time__(params["startDateTime"])
+        _end = __parse_time__(params["endDateTime"])
+        _interval = timedelta(minutes=max(1, int(params.get("interval", 1))))
+        _random = random.Random(__seed__(self.seed, _security, _start, _end))
+        _price = 50. + (__seed__(_security) % 50)
+        _bars, _time = [], _start
+        while _time < _end:
+            _path = [round(_price + _random.gauss(0, 0.05), 2) for i in range(10)]
+            _volume = _random.randint(10, 1000)
+            _events = _random.randint(1, 50)
+            _bars.append(Element("barTickData", children=[
+                            Element("time", _time),
+                            Element("open", _path[0]),
+                            Element("high", max(_path)),
+                            Element("low", min(_path)),
+                            Element("close", _path[-1]),
+                            Element("volume", _volume),
+                            Element("numEvents", _events),
+                            Element("value", round(_volume * sum(_path) / 10, 2))]))
+            _price, _time = _path[-1], _time + _interval
+        _messages = [Element("IntradayBarResponse", children=[
+                        Element("barData", children=[
+                            Element("eventDataArray", values=[]),
+                            Element("barTickData", values=_chunk)])])
+                     for _chunk in self._chunks(_bars, self.chunkSize)]
+        return self._to_events(_messages)
+
+class StubSession(object):
+    """blpapi.Session stand-in, responses produced on worker threads"""
+
+    def __init__(self, api, options = None):
+        self._api, self._options = api, options
+        self._queue = queue.Queue()
+        self._started = False
+        self._topics = {}
+
+    def _status(self, eventType, messageType):
+        self._queue.put(Event(eventType, [Message(Element(messageType, children=[]))]))
+
+    def start(self):
+        self._started = True
+        self._status(Event.SESSION_STATUS, "SessionStarted")
+        return True
+
+    def stop(self):
+        self._started = False
+        self._topics = {}
+        self._status(Event.SESSION_STATUS, "SessionTerminated")
+        return True
+
+    def openService(self, service):
+        self._status(Event.SERVICE_STATUS, "ServiceOpened")
+        return True
+
+    def getService(self, service):
+        self._status(Event.SERVICE_STATUS, "ServiceOpened")
+        return Service(service)
+
+    def nextEvent(self, timeout = 0):
+        try:
+            if timeout:
+                return self._queue.get(timeout=timeout / 1000.)
+            return self._queue.get()
+        except queue.Empty:
+            return Event(Event.TIMEOUT)
+
+    def tryNextEvent(self):
+        try:
+            return self._queue.get_nowait()
+        except queue.Empty:
+            return None
+
+    def sendRequest(self, request, correlationId = None, **kwargs):
+        _cid = CorrelationId() if correlationId is None else correlationId
+        _events = self._api.respond(request)
+        def _produce():
+            for _type, _elements in _events:
+                if self._api.latency:
+                    time.sleep(self._api.latency)
+                self._queue.put(Event(_type, [Message(_element, _cid)
+                                              for _element in _elements]))
+        if self._api.latency:
+            threading.Thread(target=_produce, daemon=True).start()
+        else:
+            _produce()
+        return _cid
+
+    def subscribe(self, subscriptionList, *args, **kwargs):
+        """Start one MarketDataEvents generator thread per topic"""
+        for _topic, _fields, _cid in subscriptionList.subscriptions:
+            _cid = CorrelationId() if _cid is None else _cid
+            _flag = threading.Event()
+            self._topics[_cid.value()] = _flag
+            self._queue.put(Event(Event.SUBSCRIPTION_STATUS, [Message(
+                        Element("SubscriptionStarted", children=[]), _cid)]))
+            threading.Thread(target=self._market_data,
+                             args=(_topic, _cid, _flag), daemon=True).start()
+
+    def unsubscribe(self, subscriptionList):
+        for _topic, _fields, _cid in subscriptionList.subscriptions:
+            _flag = self._topics.pop(_cid.value(), None) if _cid else None
+            if _flag is not None:
+                _flag.set()
+
+    def _market_data(self, topic, cid, stopped):
+        """Trades and quotes at tickRate, batched per api.latency"""
+        _random = __NP__.random.RandomState(__seed__(self._api.seed, topic))
+        _price = 50. + (__seed__(topic.split("/")[-1]) % 50)
+        _period = max(self._api.latency, 0.01)
+        _rate = self._api.tickRate * _period
+        while not stopped.wait(_period) and self._started:
+            _messages = []
+            for i in range(_random.poisson(_rate)):
+                _price = round(_price + _random.choice([-0.01, 0., 0.01]), 2)
+                if _random.random_sample() < 0.4:
+                    _children = [Element("MKTDATA_EVENT_TYPE", "TRADE"),
+                                 Element("MKTDATA_EVENT_SUBTYPE", "NEW"),
+                                 Element("LAST_PRICE", _price),
+                                 Element("SIZE_LAST_TRADE",
+                                         float(_random.randint(1, 20)))]
+                else:
+                    _side = "BID" if _random.random_sample() < 0.5 else "ASK"
+                    _quote = _price - 0.01 if _side == "BID" else _price + 0.01
+                    _children = [Element("MKTDATA_EVENT_TYPE", "QUOTE"),
+                                 Element("MKTDATA_EVENT_SUBTYPE", _side),
+                                 Element(_side, round(_quote, 2)),
+                                 Element(_side + "_SIZE",
+                                         float(_random.randint(1, 50)))]
+                _messages.append(Message(Element("MarketDataEvents",
+                                                 children=_children), cid))
+            if _messages:
+                self._queue.put(Event(Event.SUBSCRIPTION_DATA, _messages))
+
+#------------------------------------------------------------------------------
+# Recording live sessions for replay
+#------------------------------------------------------------------------------
+
+class Recorder(object):
+    """
+    Wrap a started Connection to record request/response pairs
+
+    Notes
+    -----
+    Requests are matched on replay by operation and parameters, so record
+    with explicit dates rather than relative ones. Times are saved in
+    ISO format with their fractional seconds and UTC offset.
+    """
+
+    def __init__(self, connection):
+        self._connection = connection
+        self._session = connection._session
+        self._requests, self.records = {}, []
+        _session, _recorder = self._session, self
+        _send, _next = _session.sendRequest, _session.nextEvent
+        def sendRequest(request, correlationId = None, **kwargs):
+            _cid = _send(request, correlationId=correlationId, **kwargs)
+            _recorder._requests[_cid.value()] = {"request":_recorder._key(request),
+                                                 "events":[]}
+            return _cid
+        def nextEvent(timeout = 0):
+            _event = _next(timeout)
+            _recorder._capture(_event)
+            return _event
+        self._connection._session = _Proxy(_session, sendRequest, nextEvent)
+
+    def _key(self, request):
+        """Request key from blpapi Request or stub Request"""
+        if hasattr(request, "key"):
+            return request.key()
+        _tree = element_to_dict(request.asElement())
+        _params = {}
+        for _child in _tree.get("children", []):
+            if "values" in _child:
+                _params[_child["name"]] = _child["values"]
+            elif "value" in _child:
+                _params[_child["name"]] = _child["value"]
+        return json.dumps([str(request.asElement().name()), _params], sort_keys=True, default=str)
+
+    def _capture(self, event):
+        _type = event.eventType()
+        if _type not in (Event.RESPONSE, Event.PARTIAL_RESPONSE):
+            return
+        for _message in event:
+            for _cid in _message.correlationIds():
+                _record = self._requests.get(_cid.value())
+                if _record is None:
+                    continue
+                _record["events"].append({
+                        "type":_type,
+                        "messages":[element_to_dict(_message.asElement())]})
+                if _type == Event.RESPONSE:
+                    self.records.append(self._requests.pop(_cid.value()))
+
+    def save(self, fileName):
+        """Write recorded responses to JSON file for StubApi(replay=...)"""
+        with open(fileName, 'w') as _file:
+            json.dump(self.records, _file)
+        return True
+
+class _Proxy(object):
+    """Session proxy overriding sendRequest and nextEvent"""
+
+    def __init__(self, session, sendRequest, nextEvent):
+        self._session = session
+        self.sendRequest, self.nextEvent = sendRequest, nextEvent
+
+    def __getattr__(self, name):
+        return getattr(self._session, name)
+
+#------------------------------------------------------------------------------
+# Unit Testing
+#------------------------------------------------------------------------------
+
+if __name__ == "__main__":
+    # Parser load benchmark, first call generates, second call parses only
+    _api = StubApi(tickRate=200., chunkSize=2000, memoize=True)
+    _connection = __API__.Connection(api=_api)
+    print((_connection.start_service()))
+    _start = datetime(2015, 12, 1, 19, 0)
+    _tickers = ["CL%s Comdty" % i for i in range(1, 21)]
+    _calls = [
+        ("bdit columnar 30min", lambda: _connection.bdit(
+                startTime=_start.isoformat(), columnar=True,
+                endTime=(_start + timedelta(minutes=30)).isoformat())),
+        ("bdit legacy 30min", lambda: _connection.bdit(
+                startTime=_start.isoformat(),
+                endTime=(_start + timedelta(minutes=30)).isoformat())),
+        ("bdh columnar 20x10y", lambda: _connection.bdh(
+                _tickers, ["PX_LAST", "VOLUME"], "20060101", "20151231",
+                columnar=True)),
+        ("bdib 6h", lambda: _connection.bdib(
+                startTime=_start.isoformat(),
+                endTime=(_start + timedelta(hours=6)).isoformat()))]
+    for _label, _call in _calls:
+        _call()
+        _clock = time.time()
+        _call()
+        print(("%s: %.3fs" % (_label, time.time() - _clock)))
+    _connection.stop_service()
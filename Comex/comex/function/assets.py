@@ -10,68 +10,159 @@ __date__ = "29 May 2015"
 # Possibility to switch between C-compiled and python xml parser
 import comex.static as __DEF__
 import comex.utility.config as __CFG__
+import comex.function.calendars as __CAL__
 import xml.etree.ElementTree as __ET__
-import xml.dom.minidom as __DOM__
 
-from pandas.tseries.offsets import CustomBusinessDay
 from datetime import datetime
+from types import MappingProxyType
 
 import logging as __LOG__
-import csv
+import threading
+import marshal
+import sys
 import os
 
-__all__ = ['Assets', 'Asset', 'Commodity', 'Index']
+__all__ = ['Assets', 'Asset', 'Commodity', 'Index',
+           'AssetRegistry', 'get_assets', 'get_snapshot_file',
+           'get_snapshot_folder']
+
+# Bumped when the snapshot record layout changes
+SNAPSHOT_VERSION = 2
+SNAPSHOT_EXTENSION = ".bin"
 
 #-------------------------------------------------------------------------------
 # Asset Class and its Commodity/Index implementation
 #-------------------------------------------------------------------------------
 
+def __to_close__(close):
+    """Datetime on 1900-01-01 from 'HH:MM:SS', same as strptime"""
+    if isinstance(close, datetime):
+        return close
+    _hour, _minute, _second = close.split(":")
+    return datetime(1900, 1, 1, int(_hour), int(_minute), int(_second))
+
+def __to_tree__(element):
+    """Immutable (tag, attributes, children) tree of an XML element"""
+    if element is None:
+        return ()
+    return (element.tag, tuple(sorted(element.attrib.items())),
+            tuple(__to_tree__(_child) for _child in element))
+
+def __from_tree__(parent, tree):
+    """Append (tag, attributes, children) tree under XML parent"""
+    _tag, _attributes, _children = tree
+    _element = __ET__.SubElement(parent, _tag, dict(_attributes))
+    for _child in _children:
+        __from_tree__(_element, _child)
+    return _element
+
 class Asset(object):
-    '''Parent asset class'''
+    '''Parent asset class, immutable once created'''
+
+    __slots__ = ("name", "currency", "ticker", "calendar")
+    # Constructor arguments in order, used by pickle and snapshot
+    _fields = ("name", "currency", "ticker", "calendar")
+    _type = "asset"
 
     def __init__(self, name="", currency="", ticker="", calendar=""):
-        self.name, self.currency = name, currency
-        self.ticker, self.calendar = ticker, calendar
+        _set = object.__setattr__
+        _set(self, "name", name)
+        _set(self, "currency", currency)
+        _set(self, "ticker", ticker)
+        _set(self, "calendar", calendar)
+    
+    def __setattr__(self, name, value):
+        raise AttributeError("%s is immutable" % type(self).__name__)
+    
+    def __delattr__(self, name):
+        raise AttributeError("%s is immutable" % type(self).__name__)
+    
+    def __reduce__(self):
+        return (type(self), tuple(getattr(self, _field) for _field in self._fields))
+    
+    def __repr__(self):
+        return "%s(%r)" % (type(self).__name__, self.name)
+    
+    def _encode(self):
+        """Plain tuple of marshal compatible values for snapshot"""
+        return (self._type, self.name, self.currency, self.ticker, self.calendar)
+    
+    def get_calendar(self):
+        """Return compiled Calendar from calendar registry"""
+        return __CAL__.get_calendar(self.calendar)
     
     def get_custom_date(self):
         """Return Pandas CustomBusinessDay based on .txt"""
         _hol_center = None
-        _config = __CFG__.Config()
-        if _config.add_section(__DEF__.CONFIG_SECTION_CALENDAR):
-            _cal = self.calendar.lower()
-            if _cal in _config:
-                try:
-                    _file = os.path.join(__DEF__.ROOT_DATA, _config[_cal])
-                    with open(_file, 'r') as _txt:
-                        _week_mask = "Mon Tue Wed Thu Fri"
-                        _hol_mask = [_lgn.pop() for _lgn in csv.reader(_txt)]
-                        _hol_center = CustomBusinessDay(holidays=_hol_mask,
-                                                        weekmask=_week_mask)
-                except IOError:
-                    __LOG__.critical("Failing %s", _config[_cal], exc_info=True)
-            else:
-                __LOG__.warning("Missing %s", _cal, exc_info=True)
-        else:
-            __LOG__.error("Reading %s", __DEF__.CONFIG_SECTION_CALENDAR, exc_info=True)
+        _calendar = self.get_calendar()
+        if _calendar is not None:
+            _hol_center = _calendar.get_custom_date()
         # Output get_custom_date
         return _hol_center
 
 class Commodity(Asset):
     "Child commodity class implementing asset"
+
+    __slots__ = ("lot", "factor", "close", "vwap", "cycle", "family", "expiry")
+    _fields = Asset._fields + __slots__
+    _type = "commodity"
+
     def __init__(self, name="", currency="", ticker="", calendar="",
-                 lot=1, factor=1, close="19:30:00", vwap=1, cycle=[],
-                 family=__DEF__.ComType.Unknown):
-        self.lot, self.factor = lot, factor
-        self.close, self.vwap = datetime.strptime(close, "%H:%M:%S"), vwap
-        self.cycle, self.family = cycle, family
+                 lot=1, factor=1, close="19:30:00", vwap=1, cycle=(),
+                 family=__DEF__.ComType.Unknown, expiry=()):
+        _set = object.__setattr__
+        _set(self, "lot", lot)
+        _set(self, "factor", factor)
+        _set(self, "close", __to_close__(close))
+        _set(self, "vwap", vwap)
+        _set(self, "cycle", tuple(cycle))
+        _set(self, "family", family)
+        # Expiry rules as (tag, attributes, children) tree, compiled in expiries
+        _set(self, "expiry", tuple(expiry))
         super(Commodity, self).__init__(name, currency, ticker, calendar)
+    
+    def _encode(self):
+        _close = self.close
+        return Asset._encode(self) + (self.lot, self.factor,
+                                      (_close.hour, _close.minute, _close.second),
+                                      self.vwap,
+                                      tuple(_code.name for _code in self.cycle),
+                                      self.family.name, self.expiry)
+    
+    @classmethod
+    def _decode(cls, values):
+        _codes = __DEF__.FutCode.__members__
+        return cls(*values[:6], close=datetime(1900, 1, 1, *values[6]),
+                   vwap=values[7], cycle=[_codes[_code] for _code in values[8]],
+                   family=__DEF__.ComType.__members__[values[9]],
+                   expiry=values[10])
 
 class Index(Asset):
     "Child index class implementing asset"
+
+    __slots__ = ("divisor", "basket")
+    _fields = Asset._fields + __slots__
+    _type = "index"
+
     def __init__(self, name="", currency="", ticker="", calendar="",
-                 divisor=1, basket={}):
-        self.divisor, self.basket = divisor, basket
+                 divisor=1, basket=None):
+        _set = object.__setattr__
+        _set(self, "divisor", divisor)
+        _set(self, "basket", MappingProxyType(dict(basket or {})))
         super(Index, self).__init__(name, currency, ticker, calendar)
+    
+    def __reduce__(self):
+        return (type(self), (self.name, self.currency, self.ticker, self.calendar,
+                             self.divisor, dict(self.basket)))
+    
+    def _encode(self):
+        return Asset._encode(self) + (self.divisor, dict(self.basket))
+    
+    @classmethod
+    def _decode(cls, values):
+        return cls(*values)
+
+__TYPES__ = {Commodity._type:Commodity, Index._type:Index}
 
 #-------------------------------------------------------------------------------
 # Assets dictionary with serialization methods
@@ -80,7 +171,11 @@ class Index(Asset):
 class Assets(dict):
     """Dictionary of assets - commodity and indices"""
     
-    def __init__(self):
+    def __init__(self, fileName=None):
+        # Skip config.ini lookup when file already resolved
+        if fileName is not None:
+            self._file = fileName
+            return
         # Boolean to check if XML loaded
         _config = __CFG__.Config()
         if _config.add_section(__DEF__.CONFIG_SECTION_SETTING):
@@ -118,6 +213,8 @@ class Assets(dict):
                         _parent = __ET__.SubElement(_element,"cycle")
                         for _item in _asset.cycle:
                             __ET__.SubElement(_parent,"code").text = str(_item.name)
+                        if _asset.expiry:
+                            __from_tree__(_element, _asset.expiry)
                     # Check index implementation
                     elif isinstance(_asset, Index):
                         _element.set("type", "index")
@@ -129,18 +226,16 @@ class Assets(dict):
                             _child.set("weight", str(_item[1]))
             # Write XML file onto drive
             try:
-                # DOM API for pretty formatting
-                _reparsed = __DOM__.parseString(__ET__.tostring(_root))
-                _reparsed.writexml(open(self._file, 'w'),
-                                   indent="  ",
-                                   addindent="  ",
-                                   newl='\n')
+                # In place pretty formatting
+                __ET__.indent(_root, space="  ")
+                __ET__.ElementTree(_root).write(self._file, encoding="utf-8",
+                                                xml_declaration=True)
                 _serialized = True
             except:
                 __LOG__.critical("Error on saving %s", self._file,
                                          exc_info=True)
                 _serialized = False
-        return _serialized                    
+        return _serialized
     
     def xml_to_py(self):
         """Deserialize XML into pyasset"""
@@ -151,29 +246,31 @@ class Assets(dict):
             # Browse through elements in root
             for _element in _root:
                 _type = _element.get("type")
+                _base = {"name":_element.findtext("name"),
+                         "currency":_element.findtext("currency"),
+                         "ticker":_element.findtext("ticker"),
+                         "calendar":_element.findtext("calendar")}
                 # Create commodity child class instance
                 if _type == "commodity":
-                    _asset = Commodity()
-                    _asset.lot = float(_element.findtext("lot"))
-                    _asset.factor = float(_element.findtext("factor"))
-                    _asset.close = datetime.strptime(_element.findtext("close"),"%H:%M:%S")
-                    _asset.vwap = float(_element.findtext("vwap"))
-                    _asset.family = __DEF__.ComType[_element.findtext("family")]                   
-                    _asset.cycle = [
-                                    __DEF__.FutCode[_child.text]
-                                    for _child in _element.find("cycle").iter("code")]
+                    _asset = Commodity(
+                                lot=float(_element.findtext("lot")),
+                                factor=float(_element.findtext("factor")),
+                                close=_element.findtext("close"),
+                                vwap=float(_element.findtext("vwap")),
+                                cycle=[__DEF__.FutCode[_child.text]
+                                       for _child in _element.find("cycle").iter("code")],
+                                family=__DEF__.ComType[_element.findtext("family")],
+                                expiry=__to_tree__(_element.find("expiry")),
+                                **_base)
                 # Create index child class instance
                 elif _type == "index":
-                    _asset = Index()
-                    _asset.divisor = float(_element.findtext("divisor"))
-                    _asset.basket ={
-                                    str(_child.get("contract")):float(_child.get("weight"))
-                                    for _child in _element.find("basket").iter("constituent")}
-                # Add back asset parent class properties
-                _asset.name = _element.findtext("name")
-                _asset.currency = _element.findtext("currency")
-                _asset.ticker = _element.findtext("ticker")
-                _asset.calendar = _element.findtext("calendar")
+                    _asset = Index(
+                                divisor=float(_element.findtext("divisor")),
+                                basket={str(_child.get("contract")):float(_child.get("weight"))
+                                        for _child in _element.find("basket").iter("constituent")},
+                                **_base)
+                else:
+                    continue
                 # Populate pyasset dictionary
                 self[_asset.name] = _asset
                 _deserialized = True
@@ -183,6 +280,174 @@ class Assets(dict):
             _deserialized = False
         return _deserialized
 
+    def py_to_bin(self, stamp=None, fileName=None):
+        """
+        Description
+        -----------
+        Write compiled binary snapshot of pyasset
+
+        Parameters
+        ----------
+            stamp (tuple): asset file (mtime, size) the snapshot is valid for
+
+            fileName (string): snapshot path, get_snapshot_file if None
+
+        Notes
+        -----
+        Records are plain tuples serialized with marshal, together with
+        SNAPSHOT_VERSION, the Python version and stamp. The file is written
+        to a temporary name and renamed so readers never see partial data.
+        """
+        if fileName is None: fileName = get_snapshot_file(self._file)
+        _records = tuple(_asset._encode() for _asset in self.values()
+                         if isinstance(_asset, (Commodity, Index)))
+        _data = marshal.dumps((SNAPSHOT_VERSION, tuple(sys.version_info[:2]),
+                               stamp, _records))
+        _temp = "%s.%s.tmp" % (fileName, os.getpid())
+        try:
+            os.makedirs(os.path.dirname(fileName) or ".", exist_ok=True)
+            with open(_temp, "wb") as _file:
+                _file.write(_data)
+            os.replace(_temp, fileName)
+            return True
+        except OSError:
+            __LOG__.warning("Error on saving %s", fileName, exc_info=True)
+            if os.path.exists(_temp): os.remove(_temp)
+            return False
+    
+    def bin_to_py(self, stamp=None, fileName=None):
+        """
+        Description
+        -----------
+        Load pyasset from binary snapshot
+
+        Notes
+        -----
+        Returns False, leaving pyasset unchanged, when the snapshot is
+        missing, unreadable or written for another stamp, snapshot layout
+        or Python version.
+        """
+        if fileName is None: fileName = get_snapshot_file(self._file)
+        try:
+            with open(fileName, "rb") as _file:
+                _version, _python, _stamp, _records = marshal.loads(_file.read())
+        except FileNotFoundError:
+            return False
+        except (OSError, EOFError, ValueError, TypeError):
+            __LOG__.warning("Error on snapshot %s", fileName, exc_info=True)
+            return False
+        if (_version != SNAPSHOT_VERSION or _python != tuple(sys.version_info[:2])
+                or _stamp != stamp):
+            return False
+        try:
+            _assets = [__TYPES__[_record[0]]._decode(_record[1:])
+                       for _record in _records]
+        except (KeyError, IndexError, TypeError, ValueError):
+            __LOG__.warning("Error on snapshot %s", fileName, exc_info=True)
+            return False
+        for _asset in _assets:
+            self[_asset.name] = _asset
+        return len(_assets) > 0
+
+__SNAPSHOT_FOLDER__ = []
+
+def get_snapshot_folder():
+    """Return snapshot folder from config.ini, user cache by default"""
+    if not __SNAPSHOT_FOLDER__:
+        _folder = __DEF__.SNAPSHOT_FOLDER
+        _config = __CFG__.Config()
+        if _config.add_section(__DEF__.CONFIG_SECTION_SETTING):
+            _folder = _config.get("snapshot_folder", _folder)
+        __SNAPSHOT_FOLDER__.append(_folder)
+    return __SNAPSHOT_FOLDER__[0]
+
+def get_snapshot_file(fileName):
+    """Return binary snapshot path of asset XML file"""
+    _name = os.path.splitext(os.path.basename(fileName))[0]
+    return os.path.join(get_snapshot_folder(), _name + SNAPSHOT_EXTENSION)
+
+#-------------------------------------------------------------------------------
+# Process-wide asset registry
+#-------------------------------------------------------------------------------
+
+class AssetRegistry(object):
+    """
+    Lazily loaded Assets shared across the process
+    
+    Notes
+    -----
+    XML is parsed on first access and again only when the asset file
+    modification time or size changes. Parsed XML is compiled into a
+    binary snapshot stamped with that (mtime, size) in the user cache
+    folder, so later processes skip XML parsing until assets.xml is
+    edited. Returned Assets is shared and its assets are immutable.
+    """
+    
+    def __init__(self, fileName=None):
+        self._lock = threading.Lock()
+        self._file = fileName
+        self._stamp = None
+        self._assets = None
+        self.hits, self.misses = 0, 0
+        self.snapshot = False
+    
+    def _get_stamp(self):
+        """Return (mtime, size) of asset file or None if missing"""
+        try:
+            _stat = os.stat(self._file)
+            return (_stat.st_mtime_ns, _stat.st_size)
+        except OSError:
+            __LOG__.critical("Error on file %s", self._file, exc_info=True)
+            return None
+    
+    def get(self):
+        """Return cached Assets, reloading XML if file changed"""
+        with self._lock:
+            # Resolve asset file once through config.ini
+            if self._file is None:
+                _assets = Assets()
+                if not hasattr(_assets, "_file"):
+                    self.misses += 1
+                    return None
+                self._file = _assets._file
+            _stamp = self._get_stamp()
+            if _stamp is not None and _stamp == self._stamp:
+                self.hits += 1
+                return self._assets
+            # Reload on first access or file change
+            self.misses += 1
+            self._assets, self._stamp = None, None
+            if _stamp is None:
+                return None
+            # Compiled snapshot first, XML only when stale
+            _assets = Assets(self._file)
+            self.snapshot = _assets.bin_to_py(_stamp)
+            if not self.snapshot:
+                _assets = Assets(self._file)
+                if not _assets.xml_to_py():
+                    return None
+                _assets.py_to_bin(_stamp)
+            self._assets, self._stamp = _assets, _stamp
+            return self._assets
+    
+    def clear(self):
+        """Drop cached Assets and counters"""
+        with self._lock:
+            self._stamp, self._assets = None, None
+            self.hits, self.misses = 0, 0
+            self.snapshot = False
+    
+    def stats(self):
+        """Return hit/miss counters"""
+        return {"hits": self.hits, "misses": self.misses,
+                "loaded": self._assets is not None, "snapshot": self.snapshot}
+
+REGISTRY = AssetRegistry()
+
+def get_assets():
+    """Return process-wide Assets from default registry"""
+    return REGISTRY.get()
+
 #-------------------------------------------------------------------------------
 # Unit testing
 #-------------------------------------------------------------------------------
@@ -190,17 +455,17 @@ class Assets(dict):
 if __name__ == "__main__":
     # create commodity class instance
     _commodity = Commodity("WTI_NYMEX", "USD", "CL", "NYM",
-                           1000, 1, "19:30:00", 1)
-    _commodity.cycle = [__DEF__.FutCode.F, __DEF__.FutCode.G,
-                        __DEF__.FutCode.H, __DEF__.FutCode.J,
-                        __DEF__.FutCode.K, __DEF__.FutCode.M,
-                        __DEF__.FutCode.N, __DEF__.FutCode.Q,
-                        __DEF__.FutCode.U, __DEF__.FutCode.V,
-                        __DEF__.FutCode.X, __DEF__.FutCode.Z]
-    _commodity.family = __DEF__.ComType.NRG
+                           1000, 1, "19:30:00", 1,
+                           cycle=[__DEF__.FutCode.F, __DEF__.FutCode.G,
+                                  __DEF__.FutCode.H, __DEF__.FutCode.J,
+                                  __DEF__.FutCode.K, __DEF__.FutCode.M,
+                                  __DEF__.FutCode.N, __DEF__.FutCode.Q,
+                                  __DEF__.FutCode.U, __DEF__.FutCode.V,
+                                  __DEF__.FutCode.X, __DEF__.FutCode.Z],
+                           family=__DEF__.ComType.NRG)
     # Create index class instance
-    _index = Index("SPGSCLP", "USD", "SPGSCLP", "NYC", 1)
-    _index.basket = {"CLN5":0.5, "CLQ5":0.5}
+    _index = Index("SPGSCLP", "USD", "SPGSCLP", "NYC", 1,
+                   basket={"CLN5":0.5, "CLQ5":0.5})
     # Create assets class instance
     _assets = Assets()
     _assets[_commodity.name] = _commodity
@@ -211,4 +476,11 @@ if __name__ == "__main__":
     del _commodity, _index, _assets
     _assets = Assets()
     print((_assets.xml_to_py()))
-    print((list(_assets.keys())))
\ No newline at end of file
+    print((list(_assets.keys())))
+    # Test registry caching
+    print((list(get_assets().keys())))
+    print((get_assets() is get_assets()))
+    print((REGISTRY.stats()))
+    # Test binary snapshot round trip
+    REGISTRY.clear()
+    print((list(get_assets().keys()), REGISTRY.stats()))
\ No newline at end of file
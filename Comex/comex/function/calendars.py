@@ -0,0 +1,326 @@
+# -*- coding: utf-8 -*-
+
+"""Module Calendar
+Compiled holiday calendars with business day ordinal tables
+"""
+
+__author__ = "Eric Pieuchot"
+__date__ = "18 Oct 2026"
+
+import comex.static as __DEF__
+import comex.utility.config as __CFG__
+import comex.utility.lazy as __LAZY__
+__NP__ = __LAZY__.lazy_import("numpy")
+
+from datetime import date
+
+import logging as __LOG__
+import threading
+import csv
+import os
+
+__all__ = ['Calendar', 'CalendarRegistry', 'get_calendar', 'combine_calendars']
+
+#-------------------------------------------------------------------------------
+# Calendar Class compiled from holiday list
+#-------------------------------------------------------------------------------
+
+class Calendar(object):
+    """
+    Business day calendar with precomputed ordinal table
+
+    Notes
+    -----
+    Each day between CALENDAR_START and CALENDAR_END is mapped to the number
+    of business days before it, so shift and is_busday are plain list
+    lookups. Shift follows pandas CustomBusinessDay rules: a non business
+    day counts as the first step when shifting.
+
+    mask is the open/closed bitmask of the same days, combined with & and
+    | into calendars open on both or on either exchange, e.g. ICE & NYM.
+    """
+
+    def __init__(self, code="", holidays=(), weekMask=__DEF__.CALENDAR_WEEKMASK,
+                 startYear=__DEF__.CALENDAR_START, endYear=__DEF__.CALENDAR_END):
+        self.code, self.weekMask = code, weekMask
+        self.startYear, self.endYear = startYear, endYear
+        self.holidays = __NP__.unique(__NP__.array(holidays, dtype="datetime64[D]"))
+        self._first = date(startYear, 1, 1).toordinal()
+        _last = date(endYear, 12, 31).toordinal()
+        self._custom = None
+        self.busdaycal = __NP__.busdaycalendar(weekmask=weekMask,
+                                               holidays=self.holidays)
+        # Business day flags and running counts per calendar day
+        _days = __NP__.arange(self._first, _last + 1) - date(1970, 1, 1).toordinal()
+        _days = _days.astype("datetime64[D]")
+        _open = __NP__.is_busday(_days, busdaycal=self.busdaycal)
+        _open.setflags(write=False)
+        self.mask = _open
+        _rank = __NP__.cumsum(_open) - _open
+        self._open = _open.tolist()
+        self._rank = _rank.tolist()
+        self._busdays = (__NP__.flatnonzero(_open) + self._first).tolist()
+
+    def __repr__(self):
+        return "Calendar(%s)" % self.code
+
+    def __and__(self, other):
+        """Calendar open when both calendars are open"""
+        return combine_calendars([self, other], "&")
+
+    def __or__(self, other):
+        """Calendar open when either calendar is open"""
+        return combine_calendars([self, other], "|")
+
+    def is_busday(self, baseDate):
+        """Return True if baseDate is a business day, array for arrays"""
+        if not isinstance(baseDate, date):
+            return self.is_busday_array(baseDate)
+        _index = baseDate.toordinal() - self._first
+        if 0 <= _index < len(self._open):
+            return self._open[_index]
+        return bool(__NP__.is_busday(baseDate, busdaycal=self.busdaycal))
+
+    def shift(self, baseDate, n):
+        """Return baseDate shifted by n business days"""
+        _index = baseDate.toordinal() - self._first
+        if 0 <= _index < len(self._open):
+            _pos = self._rank[_index] + n
+            # Non business day already counts as one forward step
+            if n > 0 and not self._open[_index]:
+                _pos -= 1
+            if 0 <= _pos < len(self._busdays):
+                return date.fromordinal(self._busdays[_pos])
+        # Outside precomputed table
+        _roll = "forward" if n <= 0 else "backward"
+        _shifted = __NP__.busday_offset(baseDate, n, roll=_roll,
+                                        busdaycal=self.busdaycal)
+        return _shifted.item()
+
+    def is_busday_array(self, baseDates):
+        """Return boolean array flagging business days"""
+        _dates = __NP__.asarray(baseDates, dtype="datetime64[D]")
+        return __NP__.is_busday(_dates, busdaycal=self.busdaycal)
+
+    def shift_array(self, baseDates, n):
+        """Return datetime64[D] array shifted by n business days"""
+        _dates = __NP__.asarray(baseDates, dtype="datetime64[D]")
+        _n = __NP__.asarray(n)
+        # Same roll convention as shift, element by element
+        _forward = self.busday_offset(_dates, __NP__.minimum(_n, 0), "forward")
+        if not (_n > 0).any():
+            return _forward
+        _backward = self.busday_offset(_dates, __NP__.maximum(_n, 0), "backward")
+        return __NP__.where(_n > 0, _backward, _forward)
+
+    def busday_offset(self, baseDates, offsets, roll="forward"):
+        """
+        Description
+        -----------
+        numpy.busday_offset over this calendar, arrays broadcast
+
+        Examples
+        --------
+            functionReturn (datetime64[D] array)::
+
+                >>> get_calendar("ICE&NYM").busday_offset(["2015-12-24"], [1, 2])
+                array(['2015-12-28', '2015-12-29'], dtype='datetime64[D]')
+        """
+        _dates = __NP__.asarray(baseDates, dtype="datetime64[D]")
+        return __NP__.busday_offset(_dates, offsets, roll=roll,
+                                    busdaycal=self.busdaycal)
+
+    def busday_count(self, beginDates, endDates):
+        """Business days in [beginDates, endDates), arrays broadcast"""
+        _begin = __NP__.asarray(beginDates, dtype="datetime64[D]")
+        _end = __NP__.asarray(endDates, dtype="datetime64[D]")
+        return __NP__.busday_count(_begin, _end, busdaycal=self.busdaycal)
+
+    def get_custom_date(self):
+        """Return memoized Pandas CustomBusinessDay"""
+        if self._custom is None:
+            from pandas.tseries.offsets import CustomBusinessDay
+            self._custom = CustomBusinessDay(holidays=self.holidays.tolist(),
+                                             weekmask=self.weekMask)
+        return self._custom
+
+__WEEKDAYS__ = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+
+def combine_calendars(calendars, operator="&"):
+    """
+    Description
+    -----------
+    Merged calendar open on all ('&') or any ('|') of calendars
+
+    Notes
+    -----
+    Bitmasks are combined over the common table range, then turned back
+    into a weekmask plus the holidays closing a weekmask day, so the
+    result is an ordinary numpy.busdaycalendar backed Calendar. Holidays
+    of the calendars outside that range are merged with the same rule.
+
+    Examples
+    --------
+        functionReturn (Calendar)::
+
+            >>> combine_calendars([get_calendar("ICE"), get_calendar("NYM")])
+            Calendar(ICE&NYM)
+    """
+    _reduce = __NP__.logical_and if operator == "&" else __NP__.logical_or
+    _start = max(_calendar.startYear for _calendar in calendars)
+    _end = min(_calendar.endYear for _calendar in calendars)
+    _first = date(_start, 1, 1).toordinal()
+    _count = date(_end, 12, 31).toordinal() - _first + 1
+    _mask = _reduce.reduce([_calendar.mask[_first - _calendar._first:
+                                           _first - _calendar._first + _count]
+                            for _calendar in calendars])
+    _week = _reduce.reduce([_calendar.busdaycal.weekmask
+                            for _calendar in calendars])
+    _weekMask = " ".join(_day for _day, _open in zip(__WEEKDAYS__, _week) if _open)
+    # Weekmask days closed in merged mask become holidays
+    _days = (__NP__.arange(_first, _first + _count)
+             - date(1970, 1, 1).toordinal()).astype("datetime64[D]")
+    _weekday = _week[(_days.astype("i8") + 3) % 7]
+    _holidays = _days[_weekday & ~_mask]
+    # Outside the common range only listed holidays can close a day
+    _others = __NP__.unique(__NP__.concatenate(
+                    [_calendar.holidays for _calendar in calendars]
+                    + [__NP__.empty(0, dtype="datetime64[D]")]))
+    _others = _others[(_others < _days[0]) | (_others > _days[-1])]
+    _others = _others[_week[(_others.astype("i8") + 3) % 7]]
+    _open = _reduce.reduce([__NP__.is_busday(_others, busdaycal=_calendar.busdaycal)
+                            for _calendar in calendars])
+    _holidays = __NP__.concatenate([_holidays, _others[~_open]])
+    _code = operator.join(_calendar.code for _calendar in calendars)
+    return Calendar(_code, _holidays, _weekMask, _start, _end)
+
+#-------------------------------------------------------------------------------
+# Calendar registry keyed by calendar code
+#-------------------------------------------------------------------------------
+
+class CalendarRegistry(object):
+    """
+    Calendars built once per code from [Calendar] section in config.ini
+
+    Notes
+    -----
+    Holiday files are checked for modification time or size changes on
+    each access and recompiled when changed.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._files = None
+        self._calendars = {}
+        self.hits, self.misses = 0, 0
+
+    def _get_files(self):
+        """Map calendar codes to holiday files from config.ini"""
+        if self._files is None:
+            _config = __CFG__.Config()
+            if _config.add_section(__DEF__.CONFIG_SECTION_CALENDAR):
+                self._files = {
+                        _code.upper():os.path.join(__DEF__.ROOT_DATA, _name)
+                        for _code, _name in list(_config.items())}
+            else:
+                __LOG__.error("Reading %s", __DEF__.CONFIG_SECTION_CALENDAR,
+                              exc_info=True)
+                return {}
+        return self._files
+
+    def get(self, code):
+        """
+        Return compiled Calendar for code, None if unknown
+
+        Notes
+        -----
+        Codes joined with '&' (open on all) or '|' (open on any) return
+        merged calendars, '&' binding tighter, e.g. 'ICE&NYM' or 'ICE|NYC'.
+        """
+        _code = str(code).upper().replace(" ", "")
+        for _operator in "|&":
+            if _operator in _code:
+                return self._get_merged(_code, _operator)
+        with self._lock:
+            _files = self._get_files()
+            if _code not in _files:
+                __LOG__.warning("Missing %s", _code)
+                return None
+            _file = _files[_code]
+            try:
+                _stat = os.stat(_file)
+                _stamp = (_stat.st_mtime_ns, _stat.st_size)
+            except OSError:
+                __LOG__.critical("Failing %s", _file, exc_info=True)
+                return None
+            if _code in self._calendars:
+                _calendar, _cached = self._calendars[_code]
+                if _cached == _stamp:
+                    self.hits += 1
+                    return _calendar
+            # Compile on first access or file change
+            self.misses += 1
+            try:
+                with open(_file, 'r') as _txt:
+                    _hol_mask = [_lgn.pop().strip()
+                                 for _lgn in csv.reader(_txt) if _lgn]
+            except IOError:
+                __LOG__.critical("Failing %s", _file, exc_info=True)
+                return None
+            _calendar = Calendar(_code, _hol_mask)
+            self._calendars[_code] = (_calendar, _stamp)
+            return _calendar
+
+    def _get_merged(self, code, operator):
+        """Return merged Calendar, rebuilt when a component changes"""
+        _parts = [self.get(_part) for _part in code.split(operator)]
+        if any(_part is None for _part in _parts):
+            return None
+        with self._lock:
+            if code in self._calendars:
+                _calendar, _cached = self._calendars[code]
+                if all(_part is _old for _part, _old in zip(_parts, _cached)):
+                    self.hits += 1
+                    return _calendar
+            self.misses += 1
+            _calendar = combine_calendars(_parts, operator)
+            _calendar.code = code
+            self._calendars[code] = (_calendar, _parts)
+            return _calendar
+
+    def clear(self):
+        """Drop compiled calendars and counters"""
+        with self._lock:
+            self._files = None
+            self._calendars = {}
+            self.hits, self.misses = 0, 0
+
+    def stats(self):
+        """Return hit/miss counters"""
+        return {"hits": self.hits, "misses": self.misses,
+                "loaded": sorted(self._calendars.keys())}
+
+REGISTRY = CalendarRegistry()
+
+def get_calendar(code):
+    """Return compiled Calendar from default registry"""
+    return REGISTRY.get(code)
+
+#-------------------------------------------------------------------------------
+# Unit testing
+#-------------------------------------------------------------------------------
+
+if __name__ == "__main__":
+    _cal = get_calendar("NYM")
+    print(_cal)
+    print((_cal.is_busday(date(2015, 12, 25))))
+    print((_cal.shift(date(2015, 12, 25), -3)))
+    print((_cal.shift(date(2015, 12, 25), 1)))
+    _cal = get_calendar("NYM")
+    print((REGISTRY.stats()))
+    _cal = get_calendar("ICE&NYM")
+    print((_cal, _cal.holidays[-5:]))
+    print((_cal.busday_offset(["2015-12-24", "2016-01-15"], 1)))
+    print((_cal.busday_count("2015-12-01", ["2016-01-01", "2016-02-01"])))
+    print((get_calendar("ICE|NYM").is_busday(["2015-12-25", "2016-01-18"])))
+    print((REGISTRY.stats()))
@@ -9,12 +9,21 @@ __date__ = "9 June 2015"
 
 import comex.static as __DEF__
 import comex.function.assets as __COM__
+import comex.function.calendars as __CAL__
+import comex.utility.config as __CFG__
 import logging as __LOG__
+import comex.utility.lazy as __LAZY__
+__PD__ = __LAZY__.lazy_import("pandas")
+__NP__ = __LAZY__.lazy_import("numpy")
+import threading
+import bisect
 
-from datetime import date, timedelta
+from datetime import date
 from enum import Enum
 
-__all__ = ['ExpType', 'get_expiry_date', 'get_front_month']
+__all__ = ['ExpType', 'ExpirySchedule', 'ExpiryRules', 'get_expiry_date',
+           'get_expiry_dates', 'get_expiry_schedule', 'get_expiry_rules',
+           'get_expiry_table', 'get_front_month', 'get_front_months']
 
 #-------------------------------------------------------------------------------
 # Generic utility functions
@@ -68,26 +77,34 @@ def get_front_month(assetName, baseDate, expiryType, lag=0):
             date()
     """
     _front = None
-    # Retrieve static from XML serialization
-    _assets = __COM__.Assets()
-    if _assets.xml_to_py():
+    # Retrieve static from shared asset registry
+    _assets = __COM__.get_assets()
+    if _assets is not None:
         if assetName in _assets:
             _asset = _assets[assetName]
             if isinstance(_asset, __COM__.Commodity):
                 if isinstance(baseDate, date):
-                    _cal = _asset.get_custom_date()
-                    baseDate += lag * _cal
+                    _cal = _asset.get_calendar()
+                    baseDate = _cal.shift(baseDate, lag)
                     _roll = date(baseDate.year, baseDate.month, baseDate.day)
                     _front = date(baseDate.year, baseDate.month, 1)
-                    while(True):
-                        _expiry = get_expiry_date(_asset.name, _front, expiryType)
-                        if _expiry < _roll:
-                            if _front.month == 12:
-                                _front = date(_front.year + 1, 1, 1)
+                    # Bisect precomputed schedule when roll date is covered
+                    _schedule = get_expiry_schedule(assetName, expiryType)
+                    _month = None
+                    if _schedule is not None:
+                        _month = _schedule.get_front_month(_roll)
+                    if _month is not None:
+                        _front = _month
+                    else:
+                        while(True):
+                            _expiry = get_expiry_date(_asset.name, _front, expiryType)
+                            if _expiry < _roll:
+                                if _front.month == 12:
+                                    _front = date(_front.year + 1, 1, 1)
+                                else:
+                                    _front = date(_front.year, _front.month + 1, 1)
                             else:
-                                _front = date(_front.year, _front.month + 1, 1)
-                        else:
-                            break
+                                break
                 else:
                     __LOG__.error("Type %s", type(baseDate), exc_info=True)
             else:
@@ -99,6 +116,80 @@ def get_front_month(assetName, baseDate, expiryType, lag=0):
     # Output get_expiry_date
     return _front
 
+def get_front_months(assetName, baseDates, expiryType, lag=0):
+    """
+    Description
+    -----------
+    Get front month contract for every date of a date series
+        
+    Parameters
+    ----------
+        assetName (string): Comex asset name
+        
+        baseDates (DatetimeIndex): pandas DatetimeIndex or datetime64 array
+        
+        expiryType (string): futures 'F', notice 'N', options 'OF'
+        
+        lag (integer): lag roll for expiryType
+        
+    Examples
+    --------
+        functionReturn (Series)::
+            
+            >>> comex.get_front_months("WTI_NYMEX", PD.bdate_range(...), "F")
+            Series(Timestamp(contract month), index=baseDates)
+    """
+    _fronts = None
+    # Retrieve static from shared asset registry
+    _assets = __COM__.get_assets()
+    if _assets is not None:
+        if assetName in _assets:
+            _asset = _assets[assetName]
+            if isinstance(_asset, __COM__.Commodity):
+                try:
+                    _index = __PD__.DatetimeIndex(baseDates)
+                except (TypeError, ValueError):
+                    _index = None
+                    __LOG__.error("Type %s", type(baseDates), exc_info=True)
+                if _index is not None:
+                    _cal = _asset.get_calendar()
+                    _valid = __NP__.asarray(_index.notna())
+                    _dates = _index.values.astype("datetime64[D]")[_valid]
+                    _rolls = _cal.shift_array(_dates, lag)
+                    _months = __front_months__(assetName, _rolls, expiryType)
+                    _values = __NP__.full(len(_index), "NaT", dtype="datetime64[M]")
+                    _values[_valid] = _months
+                    _fronts = __PD__.Series(_values.astype("datetime64[ns]"),
+                                            index=_index, name=assetName)
+            else:
+                __LOG__.error("Instance %s", type(_asset), exc_info=True)
+        else:
+            __LOG__.error("Missing %s", assetName, exc_info=True)
+    else:
+        __LOG__.error("Loading %s", __DEF__.ROOT_PROJECT, exc_info=True)
+    # Output get_front_months
+    return _fronts
+
+def __front_months__(assetName, rollDates, expiryType):
+    """Get front contract months for datetime64[D] roll dates"""
+    _fronts = rollDates.astype("datetime64[M]")
+    _schedule = get_expiry_schedule(assetName, expiryType)
+    _missing = __NP__.ones(len(rollDates), dtype=bool)
+    if _schedule is not None and _schedule.sorted:
+        # Searchsorted over schedule, bounded below by roll month
+        _count = len(_schedule.months)
+        _start = (_fronts - _schedule.months[0]).astype(int)
+        _found = __NP__.searchsorted(_schedule.expiries, rollDates, side="left")
+        _found = __NP__.maximum(_start, _found)
+        _missing = (_start < 0) | (_start >= _count) | (_found >= _count)
+        _found = __NP__.where(_missing, 0, _found)
+        _fronts = __NP__.where(_missing, _fronts, _schedule.months[_found])
+    # Walk month by month outside precomputed schedule
+    for i in __NP__.flatnonzero(_missing):
+        _month = get_front_month(assetName, rollDates[i].item(), expiryType)
+        _fronts[i] = __NP__.datetime64(_month, "M")
+    return _fronts
+
 def get_expiry_date(assetName, contractMonth, expiryType):
     """
     Description
@@ -121,27 +212,20 @@ def get_expiry_date(assetName, contractMonth, expiryType):
             date(2015, 11, 20)
     """
     _expiry = None
-    # Retrieve static from XML serialization
-    _assets = __COM__.Assets()
-    if _assets.xml_to_py():
+    # Retrieve static from shared asset registry
+    _assets = __COM__.get_assets()
+    if _assets is not None:
         if assetName in _assets:
             _asset = _assets[assetName]
             if isinstance(_asset, __COM__.Commodity):
                 if isinstance(contractMonth, date):
-                    _type = ExpType.get(expiryType)
-                    _cal = _asset.get_custom_date()
-                    if assetName == "WTI_NYMEX":
-                        _expiry = __wti_nymex_exp__(_cal, contractMonth, _type)
-                    elif assetName == "WTI_ICE":
-                        _expiry = __wti_ice_exp__(_cal, contractMonth, _type)
-                    elif "BR" in assetName:
-                        _expiry = __br_ice_exp__(_cal, contractMonth, _type)
-                    elif assetName == "HO_NYMEX" or assetName == "RB_NYMEX":
-                        _expiry = __ho_nymex_exp__(_cal, contractMonth, _type)
-                    elif assetName == "NG_NYMEX":
-                        _expiry = __ng_nymex_exp__(_cal, contractMonth, _type)
-                    elif assetName == "GO_ICE":
-                        _expiry = __go_ice_exp__(_cal, contractMonth, _type)
+                    _rules = get_expiry_rules(_asset)
+                    if _rules.rules:
+                        _expiry = _rules.get_expiry(_asset.get_calendar(),
+                                                    contractMonth,
+                                                    ExpType.get(expiryType))
+                    else:
+                        __LOG__.error("No expiry rules for %s", assetName)
                 else:
                     __LOG__.error("Type %s", type(contractMonth), exc_info=True)
             else:
@@ -155,105 +239,425 @@ def get_expiry_date(assetName, contractMonth, expiryType):
         _expiry = date(_expiry.year, _expiry.month, _expiry.day)
     return _expiry
 
+def get_expiry_dates(assetName, contractMonths, expiryType):
+    """
+    Description
+    -----------
+    Get first notice and expiration dates for an array of contract months
+        
+    Parameters
+    ----------
+        assetName (string): Comex asset name
+        
+        contractMonths (array): datetime64[M] array, list of dates or
+        pandas DatetimeIndex/PeriodIndex
+        
+        expiryType (string): futures 'F', notice 'N', options 'OF'
+        
+    Examples
+    --------
+        functionReturn (datetime64[D] array)::
+            
+            >>> comex.get_expiry_dates("WTI_NYMEX", ["2015-12", "2016-01"], "F")
+            array(['2015-11-20', '2015-12-21'], dtype='datetime64[D]')
+    """
+    _expiries = None
+    # Retrieve static from shared asset registry
+    _assets = __COM__.get_assets()
+    if _assets is not None:
+        if assetName in _assets:
+            _asset = _assets[assetName]
+            if isinstance(_asset, __COM__.Commodity):
+                _months = __to_months__(contractMonths)
+                if _months is not None:
+                    _expiries = __expiry_dates__(_asset, _months,
+                                                 ExpType.get(expiryType))
+                else:
+                    __LOG__.error("Type %s", type(contractMonths), exc_info=True)
+            else:
+                __LOG__.error("Instance %s", type(_asset), exc_info=True)
+        else:
+            __LOG__.error("Missing %s", assetName, exc_info=True)
+    else:
+        __LOG__.error("Loading %s", __DEF__.ROOT_PROJECT, exc_info=True)
+    # Output get_expiry_dates
+    return _expiries
+
 #-------------------------------------------------------------------------------
-# Energy futures expiries
+# Precomputed expiry schedules
 #-------------------------------------------------------------------------------
 
-def __wti_nymex_exp__(assetCalendar, contractMonth, expiryType):
-    """Get expiry dates for WTI NYMEX contracts"""
-    _expiry = None
-    # Retrieve futures expiry date
-    if contractMonth.month == 1:
-        _expiry = date(contractMonth.year - 1, 12, 25)
-    else:
-        _expiry = date(contractMonth.year, contractMonth.month - 1, 25)
-    if assetCalendar.onOffset(_expiry):
-        _expiry -= 3 * assetCalendar
-    else:
-        _expiry -= 4 * assetCalendar
-    # Retrieve options expiry date
-    if expiryType == ExpType.OF:
-        _expiry -= 3 * assetCalendar
-    # Output __wti_nymex_exp__
-    return _expiry
+class ExpirySchedule(object):
+    """
+    Sorted expiry dates for every contract month of one asset and ExpType
+    
+    Notes
+    -----
+    Front month is the first contract month on or after the roll date month
+    whose expiry is not before the roll date, found by bisection when the
+    expiries are non-decreasing.
+    """
+    
+    def __init__(self, assetName, expiryType, startYear, endYear):
+        self.assetName, self.expiryType = assetName, ExpType.get(expiryType)
+        self.startYear, self.endYear = startYear, endYear
+        self.months = __NP__.arange("%04d-01" % startYear, "%04d-01" % (endYear + 1),
+                                    dtype="datetime64[M]")
+        self.expiries = get_expiry_dates(assetName, self.months, expiryType)
+        if self.expiries is not None:
+            self._ordinals = (self.expiries.astype(int)
+                              + date(1970, 1, 1).toordinal()).tolist()
+            self.sorted = bool((__NP__.diff(self.expiries.astype(int)) >= 0).all())
+    
+    def get_front_month(self, rollDate):
+        """Return front contract month, None if outside schedule"""
+        if self.expiries is None:
+            return None
+        _start = (rollDate.year - self.startYear) * 12 + rollDate.month - 1
+        if _start < 0 or _start >= len(self._ordinals):
+            return None
+        _roll = rollDate.toordinal()
+        if self.sorted:
+            _index = max(_start, bisect.bisect_left(self._ordinals, _roll))
+        else:
+            _index = _start
+            while _index < len(self._ordinals) and self._ordinals[_index] < _roll:
+                _index += 1
+        if _index == len(self._ordinals):
+            return None
+        return date(self.startYear + _index // 12, _index % 12 + 1, 1)
 
-def __ho_nymex_exp__(assetCalendar, contractMonth, expiryType):
-    """Get expiry dates for HO & RB NYMEX contracts"""
-    _expiry = None
-    # Retrieve futures expiry date
-    _expiry = date(contractMonth.year, contractMonth.month, 1)
-    _expiry -= 1 * assetCalendar
-    # Retrieve options expiry date
-    if expiryType == ExpType.OF:
-        _expiry -= 3 * assetCalendar
-    # Output __ho_nymex_exp__
-    return _expiry
+__SCHEDULES__ = {}
+__SCHEDULE_LOCK__ = threading.Lock()
+__SCHEDULE_RANGE__ = []
 
-def __ng_nymex_exp__(assetCalendar, contractMonth, expiryType):
-    """Get expiry dates for NG NYMEX contracts"""
-    _expiry = None
-    # Retrieve futures expiry date
-    _expiry = date(contractMonth.year, contractMonth.month, 1)
-    _expiry -= 3 * assetCalendar
-    # Retrieve options expiry date
-    if expiryType == ExpType.OF:
-        _expiry -= 1 * assetCalendar
-    # Output __ng_nymex_exp__
-    return _expiry
+def get_schedule_range():
+    """Return default schedule (startYear, endYear) from config.ini"""
+    if not __SCHEDULE_RANGE__:
+        _range = (__DEF__.SCHEDULE_START, __DEF__.SCHEDULE_END)
+        _config = __CFG__.Config()
+        if _config.add_section(__DEF__.CONFIG_SECTION_SETTING):
+            try:
+                _range = (int(_config.get("schedule_start", _range[0])),
+                          int(_config.get("schedule_end", _range[1])))
+            except ValueError:
+                __LOG__.warning("Schedule range %s", _config, exc_info=True)
+        __SCHEDULE_RANGE__.append(_range)
+    return __SCHEDULE_RANGE__[0]
 
-def __wti_ice_exp__(assetCalendar, contractMonth, expiryType):
-    """Get expiry dates for WTI ICE contracts"""
-    _expiry = None
-    # Retrieve options expiry date
-    _expiry = __wti_nymex_exp__(assetCalendar, contractMonth, expiryType)
-    # Retrieve first notice and futures expiry date
-    if expiryType == ExpType.F or expiryType == ExpType.N:
-        _expiry -= 1 * assetCalendar
-    # Output __wti_ice_exp__
-    return _expiry
+def get_expiry_schedule(assetName, expiryType, startYear=None, endYear=None):
+    """
+    Description
+    -----------
+    Get cached ExpirySchedule, rebuilt when asset static or calendar change
+        
+    Parameters
+    ----------
+        assetName (string): Comex asset name
+        
+        expiryType (string): futures 'F', notice 'N', options 'OF'
+        
+        startYear/endYear (integer): schedule range, config.ini by default
+        
+    Examples
+    --------
+        functionReturn (ExpirySchedule)::
+            
+            >>> comex.function.expiries.get_expiry_schedule("WTI_NYMEX", "F")
+            ExpirySchedule()
+    """
+    _default = get_schedule_range()
+    if startYear is None: startYear = _default[0]
+    if endYear is None: endYear = _default[1]
+    _assets = __COM__.get_assets()
+    if _assets is None or assetName not in _assets:
+        return None
+    _asset = _assets[assetName]
+    if not isinstance(_asset, __COM__.Commodity):
+        return None
+    # Stamp cached schedule with static objects it was built from
+    _stamp = (_assets, _asset.get_calendar())
+    _key = (assetName, ExpType.get(expiryType), startYear, endYear)
+    with __SCHEDULE_LOCK__:
+        if _key in __SCHEDULES__:
+            _schedule, _cached = __SCHEDULES__[_key]
+            if _cached[0] is _stamp[0] and _cached[1] is _stamp[1]:
+                return _schedule
+        _schedule = ExpirySchedule(assetName, expiryType, startYear, endYear)
+        __SCHEDULES__[_key] = (_schedule, _stamp)
+    # Output get_expiry_schedule
+    return _schedule
 
-def __br_ice_exp__(assetCalendar, contractMonth, expiryType):
-    """Get expiry dates for BR ICE & NYMEX contracts"""
-    _expiry = None
-    _NEWEXPIRY = date(2016, 3, 1)
-    # Retrieve old futures expiry date
-    if contractMonth < _NEWEXPIRY:
-        _expiry = date(contractMonth.year, contractMonth.month, 1)
-        _expiry -= timedelta(days=15)
-        if assetCalendar.onOffset(_expiry):
-            _expiry -= 1 * assetCalendar
+def __to_months__(contractMonths):
+    """Convert contract months input into datetime64[M] array"""
+    try:
+        # PeriodIndex does not convert directly into datetime64
+        if isinstance(contractMonths, __PD__.Series):
+            contractMonths = __PD__.Index(contractMonths)
+        if hasattr(contractMonths, "to_timestamp"):
+            contractMonths = contractMonths.to_timestamp()
+        if isinstance(contractMonths, date):
+            contractMonths = [contractMonths]
+        return __NP__.asarray(contractMonths).astype("datetime64[M]")
+    except (TypeError, ValueError):
+        return None
+
+#-------------------------------------------------------------------------------
+# Expiry rules compiled from asset static
+#-------------------------------------------------------------------------------
+
+class ExpiryRules(object):
+    """
+    Expiry rules of one commodity compiled into parameter arrays
+    
+    Notes
+    -----
+    Rules come from the <expiry> element of assets.xml:
+    
+        <rule> anchor day of month, contract month offset, calendar days
+        added, then business days shifted, closed instead when the
+        anchored day is not a business day. Optional from/until contract
+        months make a rule date-effective.
+        
+        <holiday> business days shifted when the expiry falls on one of
+        its <avoid> dates, anchored and shifted like rules and restricted
+        to one contract month of the year.
+        
+        <type> business days shifted per ExpType name.
+    
+    get_params turns the rules into one parameter row per contract, so
+    contracts of every asset sharing a calendar evaluate in one pass.
+    get_expiry applies the same rules to a single date through Calendar
+    lookups.
+    """
+    
+    def __init__(self, tree=()):
+        self.rules, self.avoids, self.types = [], [], {}
+        self.adjust = 0
+        _children = tree[2] if tree else ()
+        for _tag, _attributes, _nodes in _children:
+            _attributes = dict(_attributes)
+            if _tag == "rule":
+                _shift = int(_attributes.get("shift", 0))
+                self.rules.append((
+                        __to_ordinal__(_attributes.get("from"), __MONTH_MIN__),
+                        __to_ordinal__(_attributes.get("until"), __MONTH_MAX__),
+                        int(_attributes.get("anchor", 1)),
+                        int(_attributes.get("offset", 0)),
+                        int(_attributes.get("days", 0)),
+                        _shift, int(_attributes.get("closed", _shift))))
+            elif _tag == "holiday":
+                self.adjust = int(_attributes.get("shift", -1))
+                for _node, _avoid, _leaves in _nodes:
+                    _avoid = dict(_avoid)
+                    self.avoids.append((int(_avoid.get("month", 0)),
+                                        int(_avoid.get("anchor", 1)),
+                                        int(_avoid.get("offset", 0)),
+                                        int(_avoid.get("shift", 0))))
+            elif _tag == "type":
+                self.types[ExpType.get(_attributes["name"])] = int(_attributes["shift"])
+            else:
+                __LOG__.warning("Unknown expiry element %s", _tag)
+        self._rules = __NP__.array(self.rules, dtype="i8").reshape(-1, 7)
+        self._avoids = __NP__.array(self.avoids, dtype="i8").reshape(-1, 4)
+    
+    def get_params(self, contractMonths, expiryType, slots=None):
+        """
+        Description
+        -----------
+        Rule parameters per contract month, avoid dates padded to slots
+        
+        Examples
+        --------
+            functionReturn (dict)::
+            
+                >>> ExpiryRules(asset.expiry).get_params(months, ExpType.F)
+                {"valid":array(bool), "anchor":array(int), ...}
+        """
+        _months = contractMonths.astype("datetime64[M]").astype("i8")
+        _index = __NP__.full(len(_months), -1)
+        # First effective rule wins
+        for i, _rule in enumerate(self.rules):
+            _index[(_index < 0) & (_months >= _rule[0]) & (_months <= _rule[1])] = i
+        _valid = _index >= 0
+        _table = self._rules[__NP__.where(_valid, _index, 0)]
+        _params = {"valid":_valid, "anchor":_table[:, 2], "offset":_table[:, 3],
+                   "days":_table[:, 4], "shift":_table[:, 5],
+                   "closed":_table[:, 6]}
+        # Avoid dates, one row per slot
+        if slots is None: slots = len(self.avoids)
+        _avoids = __NP__.zeros((slots, 4), dtype="i8")
+        _avoids[:len(self.avoids)] = self._avoids
+        _month = (_months % 12 + 1)[None, :]
+        _params["avoid"] = ((__NP__.arange(slots) < len(self.avoids))[:, None]
+                            & ((_avoids[:, :1] == 0) | (_avoids[:, :1] == _month)))
+        for j, _name in enumerate(["anchor", "offset", "shift"]):
+            _params["avoid_" + _name] = __NP__.broadcast_to(_avoids[:, j + 1:j + 2],
+                                                            (slots, len(_months)))
+        _params["adjust"] = __NP__.full(len(_months), self.adjust)
+        if not isinstance(expiryType, ExpType):
+            expiryType = ExpType.get(expiryType)
+        _params["type"] = __NP__.full(len(_months), self.types.get(expiryType, 0))
+        return _params
+
+    def get_expiry(self, assetCalendar, contractMonth, expiryType):
+        """Expiry date of one contract month, same rules as get_params"""
+        _month = (contractMonth.year - 1970) * 12 + contractMonth.month - 1
+        for _first, _last, _anchor, _offset, _days, _shift, _closed in self.rules:
+            if _first <= _month <= _last:
+                break
         else:
-            _expiry -= 2 * assetCalendar
-    # Retrieve new futures expiry date
-    else:
-        if contractMonth.month == 1:
-            _expiry = date(contractMonth.year - 1, 12, 1)
+            return None
+        _expiry = __anchor_date__(_month + _offset, _anchor, _days)
+        if assetCalendar.is_busday(_expiry):
+            _expiry = assetCalendar.shift(_expiry, _shift)
         else:
-            _expiry = date(contractMonth.year, contractMonth.month - 1, 1)
-        _expiry -= 1 * assetCalendar
-    # Christmas Day exception
-    if contractMonth.month == 12:
-        _XMASDAY = date(contractMonth.year, 12, 25) - 1 * assetCalendar
-        _NYDAY = date(contractMonth.year - 1, 12, 1) - 1 * assetCalendar
-        if _expiry == _XMASDAY or _expiry == _NYDAY:
-            _expiry -= 1 * assetCalendar
-    # Retrieve options expiry date
-    if expiryType == ExpType.OF:
-        _expiry -= 3 * assetCalendar
-    # Output __br_ice_exp__
-    return _expiry
+            _expiry = assetCalendar.shift(_expiry, _closed)
+        # Holiday exceptions
+        for _avoid, _anchor, _offset, _shift in self.avoids:
+            if _avoid == 0 or _avoid == contractMonth.month:
+                _day = __anchor_date__(_month + _offset, _anchor)
+                if _expiry == assetCalendar.shift(_day, _shift):
+                    _expiry = assetCalendar.shift(_expiry, self.adjust)
+                    break
+        # Shift per ExpType
+        _lag = self.types.get(expiryType, 0)
+        if _lag != 0:
+            _expiry = assetCalendar.shift(_expiry, _lag)
+        return _expiry
 
-def __go_ice_exp__(assetCalendar, contractMonth, expiryType):
-    """Get expiry dates for GO ICE contracts"""
-    _expiry = None
-    # Retrieve futures expiry date
-    _expiry = date(contractMonth.year, contractMonth.month, 14)
-    _expiry -= 2 * assetCalendar
-    # Retrieve options expiry date
-    if expiryType == ExpType.OF:
-        _expiry -= 5 * assetCalendar
-    # Output __go_ice_exp__
-    return _expiry
+def __anchor_date__(month, anchor, days=0):
+    """Anchored date of months since 1970-01"""
+    _day = date(1970 + month // 12, month % 12 + 1, 1).toordinal()
+    return date.fromordinal(_day + anchor - 1 + days)
+
+def __to_ordinal__(contractMonth, default):
+    """Months since 1970-01 of 'YYYY-MM', default if missing"""
+    if contractMonth is None:
+        return default
+    return int(__NP__.datetime64(contractMonth, "M").astype("i8"))
+
+__MONTH_MIN__ = -(1 << 62)
+__MONTH_MAX__ = 1 << 62
+__RULES__ = {}
+__RULES_LOCK__ = threading.Lock()
+
+def get_expiry_rules(asset):
+    """Return ExpiryRules compiled once per distinct asset rule tree"""
+    with __RULES_LOCK__:
+        if asset.expiry not in __RULES__:
+            __RULES__[asset.expiry] = ExpiryRules(asset.expiry)
+        return __RULES__[asset.expiry]
+
+def __anchor__(months, offset, anchor, days=0):
+    """Anchored datetime64[D] of contract months"""
+    _months = (months + offset).astype("datetime64[M]")
+    return _months.astype("datetime64[D]") + (anchor - 1 + days)
+
+def __evaluate__(assetCalendar, contractMonths, params):
+    """Expiry datetime64[D] array from get_params rows sharing a calendar"""
+    _months = contractMonths.astype("datetime64[M]").astype("i8")
+    # Anchored day, shifted in business days
+    _expiry = __anchor__(_months, params["offset"], params["anchor"], params["days"])
+    _lag = __NP__.where(assetCalendar.is_busday_array(_expiry), params["shift"],
+                        params["closed"])
+    _expiry = assetCalendar.shift_array(_expiry, _lag)
+    # Holiday exceptions
+    _active = params["avoid"]
+    if _active.any():
+        _avoid = __anchor__(_months[None, :], params["avoid_offset"],
+                            params["avoid_anchor"])
+        _avoid = assetCalendar.shift_array(_avoid, params["avoid_shift"])
+        _hit = (_active & (_avoid == _expiry[None, :])).any(axis=0)
+        _lag = __NP__.where(_hit, params["adjust"], 0)
+        _expiry = __NP__.where(_lag != 0, assetCalendar.shift_array(_expiry, _lag),
+                               _expiry)
+    # Shift per ExpType
+    _lag = params["type"]
+    if (_lag != 0).any():
+        _expiry = __NP__.where(_lag != 0, assetCalendar.shift_array(_expiry, _lag),
+                               _expiry)
+    return __NP__.where(params["valid"], _expiry, __NP__.datetime64("NaT", "D"))
+
+def __expiry_dates__(asset, contractMonths, expiryType):
+    """Expiry datetime64[D] array of one commodity, None without rules"""
+    _rules = get_expiry_rules(asset)
+    if not _rules.rules:
+        __LOG__.error("No expiry rules for %s", asset.name)
+        return None
+    return __evaluate__(asset.get_calendar(), contractMonths,
+                        _rules.get_params(contractMonths, expiryType))
+
+def get_expiry_table(expiryType, contractMonths=None, assetNames=None):
+    """
+    Description
+    -----------
+    Expiry dates of every listed contract for many commodities at once
+        
+    Parameters
+    ----------
+        expiryType (string): futures 'F', notice 'N', options 'OF'
+        
+        contractMonths (array): datetime64[M] array, config.ini schedule
+        range if None
+        
+        assetNames (string array): commodities, whole registry if None
+        
+    Notes
+    -----
+    Contracts of assets sharing a calendar are evaluated in one pass.
+    Months outside the asset cycle are NaT.
+        
+    Examples
+    --------
+        functionReturn (DataFrame)::
+            
+            >>> comex.function.expiries.get_expiry_table("F")
+            DataFrame(datetime64, index=contract month, columns=asset)
+    """
+    _assets = __COM__.get_assets()
+    if _assets is None:
+        __LOG__.error("Loading %s", __DEF__.ROOT_PROJECT, exc_info=True)
+        return None
+    if contractMonths is None:
+        _start, _end = get_schedule_range()
+        _months = __NP__.arange("%04d-01" % _start, "%04d-01" % (_end + 1),
+                                dtype="datetime64[M]")
+    else:
+        _months = __to_months__(contractMonths)
+    _type = ExpType.get(expiryType)
+    # Listed contracts grouped by calendar
+    _groups, _names = {}, []
+    for _name in (sorted(_assets) if assetNames is None else assetNames):
+        _asset = _assets.get(_name)
+        if not isinstance(_asset, __COM__.Commodity):
+            continue
+        _rules = get_expiry_rules(_asset)
+        if not _rules.rules:
+            __LOG__.warning("No expiry rules for %s", _name)
+            continue
+        _cycle = [_code.value for _code in _asset.cycle]
+        _listed = __NP__.flatnonzero(__NP__.isin(_months.astype("i8") % 12 + 1,
+                                                 _cycle))
+        _groups.setdefault(_asset.calendar, []).append((_name, _rules, _listed))
+        _names.append(_name)
+    _table = __NP__.full((len(_months), len(_names)), "NaT", dtype="datetime64[D]")
+    _columns = {_name:j for j, _name in enumerate(_names)}
+    for _code, _members in _groups.items():
+        _slots = max(len(_rules.avoids) for _name, _rules, _listed in _members)
+        _parts = [_rules.get_params(_months[_listed], _type, _slots)
+                  for _name, _rules, _listed in _members]
+        _params = {_key:__NP__.concatenate([_part[_key] for _part in _parts],
+                                           axis=-1) for _key in _parts[0]}
+        _rows = __NP__.concatenate([_listed for _name, _rules, _listed in _members])
+        _expiry = __evaluate__(__CAL__.get_calendar(_code), _months[_rows], _params)
+        _cols = __NP__.repeat([_columns[_name] for _name, _rules, _listed in _members],
+                              [len(_listed) for _name, _rules, _listed in _members])
+        _table[_rows, _cols] = _expiry
+    return __PD__.DataFrame(_table.astype("datetime64[ns]"),
+                            index=__PD__.DatetimeIndex(_months.astype("datetime64[ns]"),
+                                                       name="month"),
+                            columns=_names)
 
 #-------------------------------------------------------------------------------
 # Unit testing
@@ -271,4 +675,12 @@ if __name__ == "__main__":
     _type ="n"
     _base = date.today()
     _exp = get_front_month(_asset, _base, _type)
-    print(_exp)
\ No newline at end of file
+    print(_exp)
+    _months = __NP__.arange("2015-01", "2017-01", dtype="datetime64[M]")
+    _exp = get_expiry_dates(_asset, _months, "f")
+    print(_exp)
+    _schedule = get_expiry_schedule(_asset, "f")
+    print((_schedule.get_front_month(_base)))
+    _dates = __PD__.bdate_range("2015-01-01", "2015-12-31")
+    print((get_front_months(_asset, _dates, "f", 2).drop_duplicates()))
+    print((get_expiry_table("f", _months)))
\ No newline at end of file
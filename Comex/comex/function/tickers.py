@@ -9,13 +9,21 @@ __date__ = "9 June 2015"
 
 import comex.static as __DEF__
 import comex.function.assets as __COM__
+import comex.function.expiries as __EXP__
 import logging as __LOG__
+import comex.utility.lazy as __LAZY__
+__PD__ = __LAZY__.lazy_import("pandas")
+__NP__ = __LAZY__.lazy_import("numpy")
+import threading
+import re
 
 from datetime import date
 from enum import Enum
 
-__all__ = ['get_futures_code', 'get_contract_month',
-           'get_bbg_ticker', 'OptType']
+__all__ = ['get_futures_code', 'get_contract_month', 'get_curve_months',
+           'get_bbg_ticker', 'get_bbg_tickers', 'get_qdl_tickers', 'OptType',
+           'TickerParser', 'parse_bbg_ticker', 'parse_bbg_tickers',
+           'get_asset_name']
 
 #-------------------------------------------------------------------------------
 # Generic utility functions
@@ -88,9 +96,9 @@ def get_contract_month(futuresCode):
 def get_qdl_ticker(assetName, contractMonth, optionStrike=0, optionType=""):
     """Get Quandl ticker for futures"""
     _qdlticker = None
-    # Retrieve static data from xml serialization
-    _assets = __COM__.Assets()
-    if _assets.xml_to_py():
+    # Retrieve static data from shared asset registry
+    _assets = __COM__.get_assets()
+    if _assets is not None:
         if assetName in _assets:
             _asset = _assets[assetName]
             _ticker = _asset.ticker
@@ -111,7 +119,7 @@ def get_qdl_ticker(assetName, contractMonth, optionStrike=0, optionType=""):
     return _qdlticker
 
 def get_bbg_ticker(assetName, contractMonth, optionStrike=0, optionType="",
-                   bbgKey=False):
+                   bbgKey=False, historical=False):
     """Get Bloomberg ticker for futures, spreads & options"""
     _bbgticker = None
     # Define output type: spread, futures or option
@@ -124,9 +132,9 @@ def get_bbg_ticker(assetName, contractMonth, optionStrike=0, optionType="",
             _isoption = True
         else:
             _isfutures = True
-    # Retrieve static data from xml serialization
-    _assets = __COM__.Assets()
-    if _assets.xml_to_py():
+    # Retrieve static data from shared asset registry
+    _assets = __COM__.get_assets()
+    if _assets is not None:
         if assetName in _assets:
             _asset = _assets[assetName]
             _ticker = _asset.ticker
@@ -148,7 +156,12 @@ def get_bbg_ticker(assetName, contractMonth, optionStrike=0, optionType="",
         # CBOT/KBOT/CME exception
         if _family == __DEF__.ComType.AGS:
             _ticker += " "
-        _futcode = get_futures_code(contractMonth)
+        if historical:
+            _month = __NP__.array([contractMonth], dtype="datetime64[M]")
+            _futcode = (get_futures_code(contractMonth)[0]
+                        + __year_codes__(__NP__.array([assetName]), _month)[0])
+        else:
+            _futcode = get_futures_code(contractMonth)
         _bbgticker = _ticker + _futcode
         # Select ticker syntax if option
         if _isoption:
@@ -171,6 +184,352 @@ def get_bbg_ticker(assetName, contractMonth, optionStrike=0, optionType="",
             _bbgticker += " " + _key
     return _bbgticker
 
+#-------------------------------------------------------------------------------
+# Batch ticker utility functions
+#-------------------------------------------------------------------------------
+
+__MONTH_CODES__ = ["F", "G", "H", "J", "K", "M", "N", "Q", "U", "V", "X", "Z"]
+
+def get_curve_months(assetName, startMonth, numContracts):
+    """Get next numContracts listed months in Commodity cycle"""
+    _months = None
+    _assets = __COM__.get_assets()
+    if _assets is not None and assetName in _assets:
+        _asset = _assets[assetName]
+        if isinstance(_asset, __COM__.Commodity) and len(_asset.cycle) > 0:
+            _start = __NP__.datetime64(startMonth, "M")
+            _cycle = sorted(_code.value for _code in _asset.cycle)
+            _years = (numContracts // len(_cycle)) + 2
+            _all = __NP__.arange(_start, _start + 12 * _years, dtype="datetime64[M]")
+            _listed = __NP__.isin(_all.astype(int) % 12 + 1, _cycle)
+            _months = _all[_listed][:numContracts]
+    else:
+        __LOG__.error("Missing asset %s", assetName, exc_info=True)
+    # Output get_curve_months
+    return _months
+
+def __get_static__(assetNames, bbgSyntax=True):
+    """Get ticker, key and factor arrays for unique asset names"""
+    _names, _inverse = __NP__.unique(assetNames.astype(str), return_inverse=True)
+    _tickers = __NP__.full(len(_names), "", dtype=object)
+    _keys = __NP__.full(len(_names), "", dtype=object)
+    _factors = __NP__.ones(len(_names), dtype=object)
+    _found = __NP__.zeros(len(_names), dtype=bool)
+    # Retrieve static data from shared asset registry
+    _assets = __COM__.get_assets()
+    if _assets is None:
+        __LOG__.error("Error loading %s", __DEF__.ROOT_PROJECT, exc_info=True)
+        _assets = {}
+    for i, _name in enumerate(_names):
+        if _name not in _assets:
+            __LOG__.error("Missing asset %s", _name, exc_info=True)
+            continue
+        _asset = _assets[_name]
+        _tickers[i], _found[i] = _asset.ticker, True
+        if isinstance(_asset, __COM__.Commodity):
+            _keys[i], _factors[i] = 'Comdty', _asset.factor
+            # CBOT/KBOT/CME exception, Bloomberg only
+            if bbgSyntax and _asset.family == __DEF__.ComType.AGS:
+                _tickers[i] += " "
+        elif isinstance(_asset, __COM__.Index):
+            _keys[i] = 'Index'
+    _inverse = _inverse.reshape(assetNames.shape)
+    return (_tickers[_inverse], _keys[_inverse],
+            _factors[_inverse], _found[_inverse])
+
+def __year_codes__(assetNames, contractMonths):
+    """Bloomberg year digits, two digits once the contract has expired"""
+    _years = contractMonths.astype(int) // 12 + 1970
+    _today = __NP__.datetime64(date.today(), "D")
+    # Expired from futures expiry, contract month before current otherwise
+    _expired = contractMonths < _today.astype("datetime64[M]")
+    _assets = __COM__.get_assets()
+    for _name in __NP__.unique(assetNames.astype(str)):
+        if _assets is None or not isinstance(_assets.get(_name), __COM__.Commodity):
+            continue
+        _rows = assetNames == _name
+        _expiries = __EXP__.get_expiry_dates(_name, contractMonths[_rows], "F")
+        if _expiries is not None:
+            _expired[_rows] = __NP__.where(__NP__.isnat(_expiries),
+                                           _expired[_rows], _expiries < _today)
+    return __NP__.where(_expired,
+                        __NP__.char.zfill((_years % 100).astype(str), 2),
+                        (_years % 10).astype(str)).astype(object)
+
+def __to_output__(tickers, found, contractMonths):
+    """Mask missing assets and wrap Series input"""
+    tickers[~found] = None
+    if isinstance(contractMonths, __PD__.Series) and tickers.ndim == 1:
+        return __PD__.Series(tickers, index=contractMonths.index)
+    return tickers
+
+def get_bbg_tickers(assetNames, contractMonths, optionStrikes=0, optionTypes="",
+                    bbgKey=False, historical=False):
+    """
+    Description
+    -----------
+    Get Bloomberg tickers for arrays of futures & options (no spreads)
+        
+    Parameters
+    ----------
+        assetNames (string array): Comex asset names
+        
+        contractMonths (array): datetime64[M] array, list of dates or
+        pandas DatetimeIndex/PeriodIndex
+        
+        optionStrikes (float array): option strikes, 0 for futures
+        
+        optionTypes (string array): 'call', 'put'..., "" for futures
+        
+        bbgKey (boolean): append Bloomberg yellow key
+        
+        historical (boolean): Bloomberg year codes, two digits for expired
+        contracts and one digit for live ones, instead of decade offsets
+        
+    Notes
+    -----
+    Inputs are broadcast against each other, e.g. months[:, None] and
+    strikes[None, :] give a (months, strikes) option grid.
+        
+    Examples
+    --------
+        functionReturn (object array or Series)::
+            
+            >>> comex.get_bbg_tickers("WTI_NYMEX", ["2015-12"], [100], ["c"])
+            array(['CLZ5C 100.0'], dtype=object)
+    """
+    _months = __EXP__.__to_months__(contractMonths)
+    if _months is None:
+        __LOG__.error("Type %s", type(contractMonths), exc_info=True)
+        return None
+    _names, _months, _strikes, _types = __NP__.broadcast_arrays(
+                                    __NP__.asarray(assetNames, dtype=object),
+                                    _months,
+                                    __NP__.asarray(optionStrikes, dtype=object),
+                                    __NP__.asarray(optionTypes, dtype=object))
+    _tickers, _keys, _factors, _found = __get_static__(_names)
+    # Futures code from month letter and modulo decade or Bloomberg year
+    _mod = date.today().year - (date.today().year % 10)
+    _index = _months.astype(int)
+    if historical:
+        _years = __year_codes__(_names, _months)
+    else:
+        _years = (_index // 12 + 1970 - _mod).astype(str).astype(object)
+    _codes = __NP__.take(__MONTH_CODES__, _index % 12).astype(object) + _years
+    _bbgtickers = _tickers + _codes
+    # Select ticker syntax if option
+    _isoption = (_strikes != 0) | (_types != "")
+    if _isoption.any():
+        _optnames = {_type:OptType.get(_type).name for _type in set(_types.flat)}
+        _optcodes = __NP__.vectorize(_optnames.get, otypes=[object])(_types)
+        _optstrikes = __NP__.vectorize(str, otypes=[object])(_strikes * _factors)
+        _bbgtickers = __NP__.where(_isoption,
+                                   _bbgtickers + _optcodes + " " + _optstrikes,
+                                   _bbgtickers)
+    _bbgtickers = __NP__.char.upper(_bbgtickers.astype(str)).astype(object)
+    if bbgKey:
+        _bbgtickers = _bbgtickers + " " + _keys
+    # Output get_bbg_tickers
+    return __to_output__(_bbgtickers, _found, contractMonths)
+
+def get_qdl_tickers(assetNames, contractMonths):
+    """Get Quandl tickers for arrays of futures"""
+    _months = __EXP__.__to_months__(contractMonths)
+    if _months is None:
+        __LOG__.error("Type %s", type(contractMonths), exc_info=True)
+        return None
+    _names, _months = __NP__.broadcast_arrays(
+                                    __NP__.asarray(assetNames, dtype=object),
+                                    _months)
+    _tickers, _keys, _factors, _found = __get_static__(_names, bbgSyntax=False)
+    _index = _months.astype(int)
+    _codes = (__NP__.take(__MONTH_CODES__, _index % 12).astype(object)
+              + (_index // 12 + 1970).astype(str).astype(object))
+    _qdltickers = __NP__.char.upper((_tickers + _codes).astype(str)).astype(object)
+    # Output get_qdl_tickers
+    return __to_output__(_qdltickers, _found, contractMonths)
+
+#-------------------------------------------------------------------------------
+# Reverse ticker utility functions
+#-------------------------------------------------------------------------------
+
+class TickerParser(object):
+    """
+    Bloomberg ticker parser compiled from asset registry
+    
+    Notes
+    -----
+    Ticker roots are matched longest first in a single precompiled regular
+    expression, so 'COZ5' resolves to BR_ICE before any 'C' root. Single
+    digit years resolve within [refYear - 2, refYear + 7]; signed years as
+    produced by get_futures_code are added to the current decade.
+    """
+    
+    def __init__(self, assets):
+        self.roots, self.factors = {}, {}
+        for _asset in list(assets.values()):
+            _root = str(_asset.ticker).upper().strip()
+            self.roots[_root] = _asset.name
+            if isinstance(_asset, __COM__.Commodity):
+                self.factors[_root] = _asset.factor
+            else:
+                self.factors[_root] = 1
+        _roots = sorted(self.roots, key=len, reverse=True)
+        self.pattern = re.compile(
+                    r"^\s*(?P<root>%s) ?(?P<month>[FGHJKMNQUVXZ])"
+                    r"(?P<year>-?\d{1,2})"
+                    r"(?:(?P<type>[CPF]) +(?P<strike>-?[\d.]+))?"
+                    r"(?: +(?P<key>COMDTY|INDEX))?\s*$"
+                    % "|".join(re.escape(_root) for _root in _roots),
+                    re.IGNORECASE)
+        # Generic tickers such as 'CL1 Comdty' or 'C 12 Comdty'
+        self.generic = re.compile(
+                    r"^\s*(?P<root>%s) ?(?P<position>\d{1,2})"
+                    r"(?: +(?P<key>COMDTY|INDEX))?\s*$"
+                    % "|".join(re.escape(_root) for _root in _roots),
+                    re.IGNORECASE)
+    
+    def parse(self, bbgTicker, refYear=None):
+        """Return (assetName, contractMonth, strike, OptType) or None"""
+        if type(bbgTicker) != str:
+            return None
+        _match = self.pattern.match(bbgTicker)
+        if _match is None:
+            return None
+        _root = _match.group("root").upper()
+        _month = __get_months__(__NP__.array([_match.group("month")]),
+                                __NP__.array([_match.group("year")]),
+                                refYear)[0]
+        _type, _strike = OptType.F, 0.
+        if _match.group("type") is not None:
+            _type = OptType.get(_match.group("type"))
+            _strike = float(_match.group("strike")) / self.factors[_root]
+        return (self.roots[_root], _month.astype(object), _strike, _type)
+    
+    def get_asset_name(self, bbgTicker):
+        """Return asset name of a generic or contract ticker, None if unknown"""
+        if type(bbgTicker) != str:
+            return None
+        _match = self.generic.match(bbgTicker) or self.pattern.match(bbgTicker)
+        if _match is None:
+            return None
+        return self.roots[_match.group("root").upper()]
+    
+    def parse_all(self, bbgTickers, refYear=None):
+        """
+        Return DataFrame with asset, month, strike and type columns
+        
+        Notes
+        -----
+        Rows not parsed, including non string values, are NaN (NaT for
+        month) in every column.
+        """
+        _tickers = __PD__.Series(bbgTickers, dtype=object)
+        _strings = _tickers.where(_tickers.map(lambda _x: isinstance(_x, str)), "")
+        # Parse distinct tickers once, position files repeat them
+        _codes, _uniques = __PD__.factorize(_strings)
+        if len(_uniques) < len(_tickers):
+            _parsed = self.parse_all(list(_uniques), refYear)
+            _parsed = _parsed.iloc[_codes]
+            _parsed.index = _tickers.index
+            return _parsed
+        _parts = _strings.astype(str).str.extract(self.pattern)
+        _found = _parts["root"].notna().values
+        _roots = _parts["root"].str.upper()
+        _months = __NP__.full(len(_tickers), "NaT", dtype="datetime64[M]")
+        _months[_found] = __get_months__(_parts["month"].values[_found].astype(str),
+                                         _parts["year"].values[_found].astype(str),
+                                         refYear)
+        _isoption = _parts["type"].notna().values
+        _strikes = __NP__.where(_found, 0., __NP__.nan)
+        _factors = _roots.map(self.factors).values[_isoption].astype(float)
+        _strikes[_isoption] = (_parts["strike"].values[_isoption].astype(float)
+                               / _factors)
+        _types = _parts["type"].str.upper().map(
+                                    {"C":OptType.C, "P":OptType.P, "F":OptType.F})
+        _types = _types.where(_isoption, OptType.F).where(_found, __NP__.nan)
+        # Output parse_all
+        return __PD__.DataFrame({"asset":_roots.map(self.roots).values,
+                                 "month":_months.astype("datetime64[ns]"),
+                                 "strike":_strikes,
+                                 "type":_types.values},
+                                index=_tickers.index)
+
+def __get_months__(monthCodes, yearCodes, refYear=None):
+    """Get datetime64[M] array from month letters and year digits"""
+    if refYear is None: refYear = date.today().year
+    # Month letters are in alphabetical order
+    _months = __NP__.searchsorted(__MONTH_CODES__, __NP__.char.upper(
+                                            monthCodes.astype(str)))
+    _codes = yearCodes.astype(str)
+    _values = _codes.astype(int)
+    _signed = __NP__.char.startswith(_codes, "-")
+    _single = __NP__.char.str_len(_codes) == 1
+    # Single digit within [refYear - 2, refYear + 7]
+    _low = refYear - 2
+    _years = _low + (_values - _low) % 10
+    # Signed single digit relative to current decade
+    _mod = date.today().year - (date.today().year % 10)
+    _years = __NP__.where(_signed, _mod + _values, _years)
+    # Two digits within century closest to refYear
+    _century = refYear - refYear % 100
+    _double = _century + _values
+    _double = __NP__.where(_double > refYear + 50, _double - 100, _double)
+    _years = __NP__.where(_single | _signed, _years, _double)
+    return ((_years - 1970) * 12 + _months).astype("datetime64[M]")
+
+__PARSER__ = []
+__PARSER_LOCK__ = threading.Lock()
+
+def get_ticker_parser():
+    """Get TickerParser cached against asset registry"""
+    _assets = __COM__.get_assets()
+    if _assets is None:
+        __LOG__.error("Error loading %s", __DEF__.ROOT_PROJECT, exc_info=True)
+        return None
+    with __PARSER_LOCK__:
+        if not __PARSER__ or __PARSER__[0][1] is not _assets:
+            __PARSER__[:] = [(TickerParser(_assets), _assets)]
+        return __PARSER__[0][0]
+
+def parse_bbg_ticker(bbgTicker, refYear=None):
+    """
+    Description
+    -----------
+    Get asset, contract month, strike and option type from Bloomberg ticker
+        
+    Parameters
+    ----------
+        bbgTicker (string): e.g. 'CLZ5C 100 Comdty' or 'C Z5'
+        
+        refYear (integer): reference year for single digit years
+        
+    Examples
+    --------
+        functionReturn (tuple)::
+            
+            >>> comex.function.tickers.parse_bbg_ticker("CLZ5C 100 Comdty")
+            ('WTI_NYMEX', date(2025, 12, 1), 100.0, OptType.C)
+    """
+    _parser = get_ticker_parser()
+    if _parser is None:
+        return None
+    return _parser.parse(bbgTicker, refYear)
+
+def get_asset_name(bbgTicker):
+    """Get Comex asset name from generic or contract Bloomberg ticker"""
+    _parser = get_ticker_parser()
+    if _parser is None:
+        return None
+    return _parser.get_asset_name(bbgTicker)
+
+def parse_bbg_tickers(bbgTickers, refYear=None):
+    """Get DataFrame of parse_bbg_ticker fields for a column of tickers"""
+    _parser = get_ticker_parser()
+    if _parser is None:
+        return None
+    return _parser.parse_all(bbgTickers, refYear)
+
 #-------------------------------------------------------------------------------
 # Unit testing
 #-------------------------------------------------------------------------------
@@ -190,4 +549,25 @@ if __name__ == "__main__":
     _strike = 100
     _type = "call"
     _ticker = get_bbg_ticker(_asset, _contract, _strike, _type)
-    print(_ticker)
\ No newline at end of file
+    print(_ticker)
+    _months = get_curve_months(_asset, _contract, 12)
+    print((get_bbg_tickers(_asset, _months, bbgKey=True)))
+    _strikes = __NP__.arange(90, 111, 5)
+    print((get_bbg_tickers(_asset, _months[:2, None], _strikes, "call")))
+    print((parse_bbg_ticker("CLZ5C 100 Comdty")))
+    print((parse_bbg_tickers(["CLZ5C 100 Comdty", "COF6 Comdty", "XYZ"])))
+    print((get_bbg_ticker(_asset, _contract, bbgKey=True, historical=True)))
+    print((get_bbg_tickers(_asset, ["2015-12", "2026-12", "2031-06"],
+                           bbgKey=True, historical=True)))
+    # Batch Quandl tickers match scalar builder, AGS root included
+    _assets = __COM__.get_assets()
+    _assets["CORN_CBOT"] = __COM__.Commodity("CORN_CBOT", "USD", "C", "CBT",
+                                             family=__DEF__.ComType.AGS)
+    _names = __NP__.array(sorted(_assets))
+    _qdltickers = get_qdl_tickers(_names[:, None], _months[None, :])
+    print((all(_qdltickers[i, j] == get_qdl_ticker(_name, _month.astype(object))
+               for i, _name in enumerate(_names)
+               for j, _month in enumerate(_months))))
+    print((get_qdl_tickers("CORN_CBOT", _months[:2]),
+           get_bbg_tickers("CORN_CBOT", _months[:2])))
+    del _assets["CORN_CBOT"]
\ No newline at end of file
@@ -7,13 +7,15 @@ Generic global variables/constants
 __author__ = "Eric Pieuchot"
 __date__ = "8 Jul 2015"
 
-from os.path import dirname, join
+from os.path import dirname, join, expanduser
+from os import environ
 from logging import ERROR, DEBUG
 from enum import Enum
 
 __all__ = ['ComType',
            'FutCode',
            'ROOT_DATA',
+           'ROOT_CACHE',
            'ROOT_PROJECT',
            'LOGGING_FILE',
            'LOGGING_FORMAT',
@@ -21,7 +23,17 @@ __all__ = ['ComType',
            'LOGGING_LEVEL_CONSOLE',
            'CONFIG_FILE',
            'CONFIG_SECTION_SETTING',
-           'CONFIG_SECTION_CALENDAR']
+           'CONFIG_SECTION_CALENDAR',
+           'CALENDAR_WEEKMASK',
+           'CALENDAR_START',
+           'CALENDAR_END',
+           'SCHEDULE_START',
+           'SCHEDULE_END',
+           'CACHE_FOLDER',
+           'CACHE_SIZE',
+           'CACHE_TTL',
+           'STORE_FOLDER',
+           'SNAPSHOT_FOLDER']
 
 #-------------------------------------------------------------------------------
 # Path
@@ -29,6 +41,10 @@ __all__ = ['ComType',
 
 ROOT_PROJECT = dirname(__file__)
 ROOT_DATA = join(ROOT_PROJECT,"data")
+# Files written at run time, package data may be read-only
+ROOT_CACHE = environ.get("COMEX_CACHE") or join(
+                environ.get("LOCALAPPDATA") or environ.get("XDG_CACHE_HOME")
+                or join(expanduser("~"), ".cache"), "comex")
 
 #-------------------------------------------------------------------------------
 # Logging
@@ -47,6 +63,41 @@ CONFIG_FILE = "config.ini"
 CONFIG_SECTION_SETTING = "Setting"
 CONFIG_SECTION_CALENDAR = "Calendar"
 
+#-------------------------------------------------------------------------------
+# Calendar
+#-------------------------------------------------------------------------------
+
+CALENDAR_WEEKMASK = "Mon Tue Wed Thu Fri"
+CALENDAR_START = 1970
+CALENDAR_END = 2100
+
+#-------------------------------------------------------------------------------
+# Expiry schedule
+#-------------------------------------------------------------------------------
+
+SCHEDULE_START = 1990
+SCHEDULE_END = 2050
+
+#-------------------------------------------------------------------------------
+# Bloomberg response cache
+#-------------------------------------------------------------------------------
+
+CACHE_FOLDER = join(ROOT_CACHE, "cache")
+CACHE_SIZE = 1 << 30
+CACHE_TTL = 900
+
+#-------------------------------------------------------------------------------
+# Local Bloomberg data store
+#-------------------------------------------------------------------------------
+
+STORE_FOLDER = join(ROOT_CACHE, "store")
+
+#-------------------------------------------------------------------------------
+# Compiled asset snapshot
+#-------------------------------------------------------------------------------
+
+SNAPSHOT_FOLDER = ROOT_CACHE
+
 #-------------------------------------------------------------------------------
 # Enum
 #-------------------------------------------------------------------------------
@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+
+"""Bars Module
+Vectorized OHLCV bars from tick columns at any interval
+"""
+__author__  = "Eric Pieuchot"
+__date__    = "18 Oct 2026"
+
+import comex.api.bbgapi as __API__
+import pandas as __PD__
+import numpy as __NP__
+import logging
+
+__all__ = ['build_bars', 'BAR_FIELDS']
+
+BAR_FIELDS = [_name for _name, _dtype in __API__.BAR_COLUMNS[1:]] + ["vwap"]
+DAY_NANOS = 86400 * 10**9
+
+#------------------------------------------------------------------------------
+# Segmented reductions over sorted ticks
+#------------------------------------------------------------------------------
+
+def __to_interval__(interval):
+    """Interval in ns from '5s', '1min', seconds or timedelta"""
+    if isinstance(interval, (int, float)):
+        return int(interval * 10**9)
+    return int(__PD__.Timedelta(interval).value)
+
+def __bar_starts__(times, length):
+    """Start in ns of the bar holding each time, bars counted from midnight"""
+    _midnights = times // DAY_NANOS * DAY_NANOS
+    return _midnights + (times - _midnights) // length * length
+
+def __reduce_bars__(starts, times, opens, highs, lows, closes, volumes, events,
+                    values):
+    """Merge rows into segments beginning at starts, rows sorted by time"""
+    _lasts = __NP__.append(starts[1:], len(times)) - 1
+    return (times[starts], opens[starts],
+            __NP__.maximum.reduceat(highs, starts),
+            __NP__.minimum.reduceat(lows, starts),
+            closes[_lasts],
+            __NP__.add.reduceat(volumes, starts),
+            __NP__.add.reduceat(events, starts),
+            __NP__.add.reduceat(values, starts))
+
+def __to_frame__(columns):
+    _table = __PD__.DataFrame(
+                {_name:_column for (_name, _dtype), _column
+                 in zip(__API__.BAR_COLUMNS[1:], columns[1:])},
+                index=__PD__.DatetimeIndex(columns[0].view("datetime64[ns]"),
+                                           name="time"))
+    _volume = _table["volume"].values
+    _table["vwap"] = __NP__.where(_volume > 0, _table["value"].values
+                                  / __NP__.where(_volume > 0, _volume, 1), __NP__.nan)
+    return _table
+
+def build_bars(ticks, intervals = "1min", eventTypes = ["TRADE"]):
+    """
+    Description
+    -----------
+    OHLCV, numEvents, value and vwap bars from raw ticks
+
+    Parameters
+    ----------
+        ticks (DataFrame): bdit(columnar=True, aggregate=False) or
+        TickArchive.get output, value/size/type columns indexed by time
+
+        intervals (string or array): bar length such as '1s', '5min' or
+        seconds, a list returns one DataFrame per interval
+
+        eventTypes (string array): tick types kept, all if None
+
+    Notes
+    -----
+    Bars start on multiples of the interval from each day's midnight, the
+    last bar of a day stops at midnight when the interval does not divide
+    a day, and empty bars are omitted, as in IntradayBarResponse. Ticks are
+    reduced once into the finest interval; coarser intervals that are
+    multiples of it are reduced from those bars.
+
+    Examples
+    --------
+        functionReturn (DataFrame)::
+
+            >>> comex.tool.bars.build_bars(ticks, "1min")
+            DataFrame(columns=BAR_FIELDS, index=time)
+
+        functionReturn (dict): with a list of intervals::
+
+            >>> comex.tool.bars.build_bars(ticks, ["1s", "5s", "1min", "5min"])
+            { (string) DataFrame(columns=BAR_FIELDS, index=time) : ...}
+    """
+    _single = isinstance(intervals, (str, int, float)) or hasattr(intervals, "days")
+    _intervals = [intervals] if _single else list(intervals)
+    _times = ticks.index.values.astype("datetime64[ns]").view("i8")
+    _values = ticks["value"].values.astype("f8")
+    _sizes = ticks["size"].values.astype("f8")
+    if eventTypes is not None and "type" in ticks:
+        _codes = [__API__.EVENT_CODES.get(_type, -1) for _type in eventTypes]
+        _keep = __NP__.isin(ticks["type"].values, _codes)
+        _times, _values, _sizes = _times[_keep], _values[_keep], _sizes[_keep]
+    if len(_times) > 1 and (__NP__.diff(_times) < 0).any():
+        _order = __NP__.argsort(_times, kind="stable")
+        _times, _values, _sizes = _times[_order], _values[_order], _sizes[_order]
+    _lengths = sorted(set(__to_interval__(_interval) for _interval in _intervals))
+    _bars = {}
+    _base = None
+    for _length in _lengths:
+        if _length <= 0:
+            logging.error("Interval %s", _length)
+            continue
+        if _base is not None and _length % _base[0] == 0:
+            # Coarser bars from finer bars
+            _rows = _base[1]
+            _bins = __bar_starts__(_rows[0], _length)
+        else:
+            _rows = (_times, _values, _values, _values, _values, _sizes,
+                     __NP__.ones(len(_times), dtype="i8"), _values * _sizes)
+            _bins = __bar_starts__(_times, _length)
+            _base = None
+        if len(_bins) == 0:
+            _columns = tuple(__NP__.empty(0, _dtype)
+                             for _name, _dtype in __API__.BAR_COLUMNS)
+        else:
+            _starts = __NP__.flatnonzero(__NP__.diff(_bins, prepend=_bins[0] - 1))
+            _columns = __reduce_bars__(_starts, *_rows)
+            _columns = (_bins[_starts],) + _columns[1:]
+        if _base is None:
+            _base = (_length, _columns)
+        _bars[_length] = _columns
+    _result = {_interval:__to_frame__(_bars[__to_interval__(_interval)])
+               for _interval in _intervals if __to_interval__(_interval) in _bars}
+    if _single:
+        return _result.get(intervals)
+    return _result
+
+#------------------------------------------------------------------------------
+# Unit Testing
+#------------------------------------------------------------------------------
+
+if __name__ == "__main__":
+    from datetime import datetime, timedelta
+    _connection = __API__.Connection()
+    if _connection.start_service():
+        _end = datetime.now().replace(microsecond=0) - timedelta(minutes=15)
+        _ticks = _connection.bdit(startTime=(_end - timedelta(hours=1)).isoformat(),
+                                  endTime=_end.isoformat(),
+                                  columnar=True, aggregate=False)
+        for _interval, _table in build_bars(_ticks, ["1s", "5s", "1min",
+                                                     "5min"]).items():
+            print(_interval)
+            print(_table)
+        _connection.stop_service()
@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+
+"""Batch Settlement Module
+Settlement vwap/twap for every commodity of the asset registry
+"""
+__author__  = "Eric Pieuchot"
+__date__    = "18 Oct 2026"
+
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from datetime import datetime, timedelta, date
+import comex.api.bbgapi as __API__
+import comex.function.assets as __COM__
+import comex.function.expiries as __EXP__
+import comex.function.tickers as __TIC__
+import comex.tool.settle as __SET__
+import pandas as __PD__
+import numpy as __NP__
+import logging
+
+__all__ = ['SettlementRunner', 'get_settlement_jobs']
+
+SETTLE_THREADS = 4
+SETTLE_TICK = 0.01
+SETTLE_COLUMNS = ["ticker", "settleTime", "window", "ticks", "volume",
+                  "vwap", "twap"]
+
+#------------------------------------------------------------------------------
+# Settlement jobs from asset registry
+#------------------------------------------------------------------------------
+
+def get_settlement_jobs(settleDate, assetNames = None, expiryType = "F",
+                        bbgTicks = {}):
+    """
+    Description
+    -----------
+    One settlement window per commodity trading on settleDate
+
+    Parameters
+    ----------
+        settleDate (date): settlement day
+
+        assetNames (string array): subset of registry, all commodities if None
+
+        expiryType (string): front month roll, futures 'F', notice 'N'
+
+        bbgTicks (dict): tick size per asset name, SETTLE_TICK otherwise
+
+    Examples
+    --------
+        functionReturn (list)::
+
+            >>> comex.tool.batch.get_settlement_jobs(date(2015, 12, 1))
+            [{"asset":"BR_ICE", "ticker":"COF16 Comdty", ...}, ...]
+    """
+    _assets = __COM__.get_assets()
+    if _assets is None:
+        logging.error("No asset registry")
+        return []
+    _jobs = []
+    for _name in (sorted(_assets) if assetNames is None else assetNames):
+        _asset = _assets.get(_name)
+        if not isinstance(_asset, __COM__.Commodity):
+            continue
+        _calendar = _asset.get_calendar()
+        if _calendar is not None and not _calendar.is_busday(settleDate):
+            logging.info("%s closed on %s", _name, settleDate)
+            continue
+        _month = __EXP__.get_front_month(_name, settleDate, expiryType)
+        if _month is None:
+            logging.warning("No front month %s on %s", _name, settleDate)
+            continue
+        _end = datetime.combine(settleDate, _asset.close.time())
+        _jobs.append({"asset":_name,
+                      "ticker":__TIC__.get_bbg_ticker(_name, _month, bbgKey=True,
+                                                      historical=True),
+                      "settleTime":_end,
+                      "window":_asset.vwap,
+                      "start":_end - timedelta(minutes=_asset.vwap),
+                      "tick":bbgTicks.get(_name, SETTLE_TICK)})
+    return _jobs
+
+def __settle_stats__(times, values, sizes, bbgTick):
+    """Settlement statistics of raw ticks, run in worker processes"""
+    _table = __API__.aggregate_ticks(times.view("datetime64[ns]"), values, sizes)
+    _accumulator = __SET__.VwapAccumulator(bbgTick)
+    _accumulator.push_table(_table)
+    _snapshot = _accumulator.snapshot()
+    return {"ticks":len(times), "volume":_snapshot["volume"],
+            "vwap":_snapshot["vwap"], "twap":_snapshot["twap"]}
+
+#------------------------------------------------------------------------------
+# Batch runner, concurrent fetching and process pool statistics
+#------------------------------------------------------------------------------
+
+class SettlementRunner(object):
+    """
+    Settlement vwap/twap of the whole asset universe for a day
+
+    Parameters
+    ----------
+        pool (ConnectionPool): shared pool if None
+
+        threads (integer): settlement windows fetched at the same time
+
+        processes (integer): statistics worker processes, 0 to run inline
+
+        archive (TickArchive): read ticks from archive instead of bdit
+
+    Notes
+    -----
+    Windows are fetched on a thread pool, each thread borrowing its own
+    connection, and handed to the process pool as soon as they arrive.
+    """
+
+    def __init__(self, pool = None, threads = SETTLE_THREADS, processes = None,
+                 archive = None):
+        self.pool = __API__.get_pool() if pool is None else pool
+        self.threads, self.processes = threads, processes
+        self.archive = archive
+
+    def fetch(self, job):
+        """Raw tick columns (ns times, values, sizes) of a job window"""
+        if self.archive is not None:
+            _table = self.archive.get(job["ticker"], job["start"],
+                                      job["settleTime"])
+        else:
+            with self.pool.connection() as _connection:
+                if _connection is None:
+                    logging.error("No connection for %s", job["ticker"])
+                    return None
+                _table = _connection.bdit(bbgTicker=job["ticker"],
+                                          startTime=job["start"].isoformat(),
+                                          endTime=job["settleTime"].isoformat(),
+                                          columnar=True, aggregate=False)
+        return (_table.index.values.view("i8"), _table["value"].values,
+                _table["size"].values)
+
+    def run(self, settleDate = None, assetNames = None, expiryType = "F",
+            bbgTicks = {}):
+        """
+        Description
+        -----------
+        Consolidated settlement statistics for settleDate
+
+        Examples
+        --------
+            functionReturn (DataFrame)::
+
+                >>> SettlementRunner().run(date(2015, 12, 1))
+                DataFrame(columns=SETTLE_COLUMNS, index=asset)
+        """
+        if settleDate is None: settleDate = date.today()
+        _jobs = get_settlement_jobs(settleDate, assetNames, expiryType, bbgTicks)
+        _rows = {}
+        _executor = None
+        if self.processes != 0:
+            _executor = ProcessPoolExecutor(self.processes)
+        try:
+            with ThreadPoolExecutor(max(1, self.threads)) as _threads:
+                _fetches = {_threads.submit(self.fetch, _job):_job
+                            for _job in _jobs}
+                _stats = []
+                for _fetch in as_completed(_fetches):
+                    _job = _fetches[_fetch]
+                    try:
+                        _columns = _fetch.result()
+                    except:
+                        logging.error("Error on %s", _job["ticker"], exc_info=True)
+                        _columns = None
+                    if _columns is None:
+                        continue
+                    if _executor is None:
+                        _rows[_job["asset"]] = __settle_stats__(*_columns,
+                                                                _job["tick"])
+                    else:
+                        _stats.append((_job, _executor.submit(
+                                        __settle_stats__, *_columns, _job["tick"])))
+                for _job, _stat in _stats:
+                    _rows[_job["asset"]] = _stat.result()
+        finally:
+            if _executor is not None:
+                _executor.shutdown()
+        _table = __PD__.DataFrame(
+                    [dict({"ticker":_job["ticker"],
+                           "settleTime":_job["settleTime"],
+                           "window":_job["window"]},
+                          **_rows.get(_job["asset"], {}))
+                     for _job in _jobs],
+                    index=__PD__.Index([_job["asset"] for _job in _jobs],
+                                       name="asset"),
+                    columns=SETTLE_COLUMNS)
+        return _table
+
+#------------------------------------------------------------------------------
+# Unit Testing
+#------------------------------------------------------------------------------
+
+if __name__ == "__main__":
+    print((SettlementRunner().run(date.today() - timedelta(days=1))))
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+
+"""Import Benchmark Module
+Cold import time of comex modules measured in fresh interpreters
+"""
+__author__  = "Eric Pieuchot"
+__date__    = "18 Oct 2026"
+
+import subprocess
+import statistics
+import logging
+import sys
+import os
+
+__all__ = ['measure_import', 'check_imports', 'IMPORT_TARGET']
+
+IMPORT_TARGET = 0.1
+IMPORT_RUNS = 7
+IMPORT_MODULES = ["comex", "comex.function.tickers", "comex.function.expiries",
+                  "comex.api.bbgapi"]
+HEAVY_MODULES = ["pandas", "numpy", "blpapi", "Quandl"]
+
+# Child script, prints import seconds and heavy modules pulled in
+__CHILD__ = """
+import sys, time
+_start = time.perf_counter()
+import %s
+_elapsed = time.perf_counter() - _start
+print(_elapsed)
+print(",".join(_name for _name in %r if _name in sys.modules))
+"""
+
+#------------------------------------------------------------------------------
+# Fresh interpreter measurements
+#------------------------------------------------------------------------------
+
+def measure_import(moduleName = "comex", runs = IMPORT_RUNS):
+    """
+    Description
+    -----------
+    Median import seconds of moduleName over runs fresh interpreters
+
+    Examples
+    --------
+        functionReturn (tuple)::
+
+            >>> comex.tool.importbench.measure_import("comex")
+            (0.0012, [])
+    """
+    _root = os.path.dirname(os.path.dirname(os.path.dirname(
+                                                os.path.abspath(__file__))))
+    _env = dict(os.environ)
+    _env["PYTHONPATH"] = os.pathsep.join([_root] + [_path for _path in
+                                         [_env.get("PYTHONPATH")] if _path])
+    _times, _loaded = [], []
+    for i in range(runs):
+        _output = subprocess.run([sys.executable, "-c",
+                                  __CHILD__ % (moduleName, HEAVY_MODULES)],
+                                 env=_env, capture_output=True, text=True)
+        if _output.returncode != 0:
+            logging.error("Error on import %s: %s", moduleName, _output.stderr)
+            return None, None
+        _lines = _output.stdout.split("\n")
+        _times.append(float(_lines[0]))
+        _loaded = [_name for _name in _lines[1].split(",") if _name]
+    return statistics.median(_times), _loaded
+
+def check_imports(moduleNames = IMPORT_MODULES, target = IMPORT_TARGET,
+                  runs = IMPORT_RUNS):
+    """
+    Description
+    -----------
+    Import time report, True when every module imports under target
+    seconds without pulling in pandas, numpy, blpapi or Quandl
+
+    Examples
+    --------
+        functionReturn (boolean)::
+
+            >>> comex.tool.importbench.check_imports()
+            comex                          0.0012s
+            ...
+            True
+    """
+    _success = True
+    for _name in moduleNames:
+        _time, _loaded = measure_import(_name, runs)
+        if _time is None:
+            _success = False
+            continue
+        _failed = _time > target or len(_loaded) > 0
+        _success = _success and not _failed
+        print(("%-30s %.4fs %s%s" % (_name, _time,
+                                     "loads %s " % ",".join(_loaded) if _loaded else "",
+                                     "FAILED" if _failed else "")))
+    return _success
+
+#------------------------------------------------------------------------------
+# Unit Testing
+#------------------------------------------------------------------------------
+
+if __name__ == "__main__":
+    sys.exit(0 if check_imports() else 1)
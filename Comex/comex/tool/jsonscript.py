@@ -7,7 +7,8 @@ Automation script to generate Json market data files based asset tickers
 __author__ = "Eric Pieuchot"
 __date__ = "03 Nov 2015"
 
-import Quandl as ___QDL___
+import comex.utility.lazy as __LAZY__
+___QDL___ = __LAZY__.lazy_import("Quandl")
 
 
 
@@ -13,7 +13,134 @@ import numpy as __NP__
 import logging
 import math
 
-__all__ = ['CloseAnalysis']
+__all__ = ['CloseAnalysis', 'VwapAccumulator', 'SettleResult']
+
+#------------------------------------------------------------------------------
+# Running vwap/twap updated tick by tick
+#------------------------------------------------------------------------------
+
+class VwapAccumulator(object):
+    """
+    Running vwap, twap and volume with CloseAnalysis rounding rules
+    
+    Notes
+    -----
+    Ticks sharing a time stamp form one bucket: zero size ticks are
+    dropped, value is size weighted and only divided by size above 1, then
+    rounded down to bbgTick. Each closed bucket adds one term to running
+    sums, in time order, so push and push_table give the same numbers as
+    numpy cumulative sums over CloseAnalysis.table. Ticks are expected in
+    time order, as delivered by bdit and //blp/mktdata.
+    """
+    
+    def __init__(self, bbgTick = 0.01):
+        self.bbgTick = bbgTick
+        self.count, self.sumValue, self.sumSize, self.sumProd = 0, 0., 0., 0.
+        self.time = None
+        self._value, self._size = 0., 0.
+    
+    def _bucket(self):
+        """Rounded value and size of the open bucket"""
+        _value = self._value / self._size if self._size > 1 else self._value
+        return _value - math.fmod(_value, self.bbgTick), self._size
+    
+    def _close(self):
+        if self._size > 0:
+            _value, _size = self._bucket()
+            self.count += 1
+            self.sumValue += _value
+            self.sumSize += _size
+            self.sumProd += _value * _size
+        self._value, self._size = 0., 0.
+    
+    def push(self, time, value, size):
+        """Add one tick, O(1)"""
+        if size <= 0:
+            return
+        if time != self.time:
+            self._close()
+            self.time = time
+        self._value += size * value
+        self._size += size
+    
+    def push_table(self, table, rounded = False, running = False):
+        """
+        Description
+        -----------
+        Add a bdit table at once, vectorized
+        
+        Parameters
+        ----------
+            table (DataFrame): raw ticks with a type column, or value and
+            size per time stamp as CloseAnalysis.table
+            
+            rounded (boolean): values already rounded to bbgTick
+            
+            running (boolean): return running statistics per time stamp
+        
+        Examples
+        --------
+            functionReturn (DataFrame): with running=True::
+            
+                >>> VwapAccumulator().push_table(table, running=True)
+                DataFrame(columns=["vwap", "twap", "volume"], index=time)
+        """
+        if "type" in table:
+            table = __API__.aggregate_ticks(table.index.values,
+                                            table["value"].values,
+                                            table["size"].values)
+        _values = table["value"].values.astype(float)
+        _sizes = table["size"].values.astype(float)
+        if not rounded:
+            _values = _values - __NP__.fmod(_values, self.bbgTick)
+        self._close()
+        # Cumulative sums seeded with current totals, same order as push
+        _cumvalue = __NP__.cumsum(__NP__.concatenate([[self.sumValue], _values]))[1:]
+        _cumsize = __NP__.cumsum(__NP__.concatenate([[self.sumSize], _sizes]))[1:]
+        _cumprod = __NP__.cumsum(__NP__.concatenate([[self.sumProd],
+                                                     _values * _sizes]))[1:]
+        _counter = self.count + __NP__.arange(1, len(_values) + 1)
+        if len(_values):
+            self.count = int(_counter[-1])
+            self.sumValue, self.sumSize = _cumvalue[-1], _cumsize[-1]
+            self.sumProd = _cumprod[-1]
+            self.time = table.index[-1]
+        if running:
+            return __PD__.DataFrame({"vwap":_cumprod / _cumsize,
+                                     "twap":_cumvalue / _counter,
+                                     "volume":_cumsize}, index=table.index)
+    
+    def snapshot(self):
+        """Return running vwap, twap, volume and bucket count"""
+        _count, _sumvalue = self.count, self.sumValue
+        _sumsize, _sumprod = self.sumSize, self.sumProd
+        if self._size > 0:
+            _value, _size = self._bucket()
+            _count += 1
+            _sumvalue += _value
+            _sumsize += _size
+            _sumprod += _value * _size
+        return {"time":self.time,
+                "vwap":_sumprod / _sumsize if _sumsize else __NP__.nan,
+                "twap":_sumvalue / _count if _count else __NP__.nan,
+                "volume":_sumsize, "count":_count}
+
+#------------------------------------------------------------------------------
+# Lightweight settlement result
+#------------------------------------------------------------------------------
+
+class SettleResult(object):
+    """Settlement vwap, twap, volume and optional running statistics"""
+    
+    __slots__ = ["vwap", "twap", "volume", "count", "stat"]
+    
+    def __init__(self, vwap, twap, volume, count, stat = None):
+        self.vwap, self.twap, self.volume = vwap, twap, volume
+        self.count, self.stat = count, stat
+    
+    def __repr__(self):
+        return "SettleResult(vwap=%s, twap=%s, volume=%s)" % (self.vwap, self.twap,
+                                                              self.volume)
 
 #------------------------------------------------------------------------------
 # CloseAnalysis Object with vwap/twap functionality
@@ -22,51 +149,82 @@ __all__ = ['CloseAnalysis']
 class CloseAnalysis(object):
     
         def __init__(self, bbgTicker = "CL1 Comdty", bbgTick = 0.01, settleWindow = 1,
-                     settleTime = datetime.now().replace(microsecond=0)-timedelta(minutes=16)):
-            try:
-                _connection = __API__.Connection()
-                if _connection.start_service():
-                    _start = settleTime - timedelta(minutes=settleWindow)
-                    _data = _connection.bdit(
-                                            bbgTicker = bbgTicker,
-                                            startTime = _start.isoformat(),
-                                            endTime = settleTime.isoformat())
-                    for _time in list(_data[("value")].keys()):
-                        _value = _data[("value")][_time]
-                        _data[("value")][_time] = _value - math.fmod(_value, bbgTick)
-                    if _connection.stop_service():
-                        self.table = __PD__.DataFrame(_data).dropna(how="any")
-            except:
-                logging.critical("Error on API %s", _connection.__str__, exc_info=True)
+                     settleTime = None, pool = None, archive = None):
+            if settleTime is None:
+                # Latest complete minute, evaluated per call
+                settleTime = datetime.now().replace(microsecond=0)-timedelta(minutes=16)
+            self.bbgTick = bbgTick
+            self.table = __PD__.DataFrame(columns=["value", "size"], dtype=float)
+            _start = settleTime - timedelta(minutes=settleWindow)
+            _table = None
+            if archive is not None:
+                # Ticks read back from comex.api.bbgstore.TickArchive
+                _table = archive.get(bbgTicker, _start, settleTime,
+                                     aggregate=True)
+            else:
+                if pool is None: pool = __API__.get_pool()
+                try:
+                    # Borrow a warm connection from the session pool
+                    with pool.connection() as _connection:
+                        if _connection is not None:
+                            _table = _connection.bdit(
+                                                bbgTicker = bbgTicker,
+                                                startTime = _start.isoformat(),
+                                                endTime = settleTime.isoformat(),
+                                                columnar = True)
+                except:
+                    logging.critical("Error on API %s:%s", pool.host, pool.port,
+                                     exc_info=True)
+            if _table is not None:
+                # Average value per time stamp rounded down to bbgTick
+                _table.index.name = None
+                _table["value"] = _table["value"] - __NP__.fmod(_table["value"],
+                                                                bbgTick)
+                self.table = _table.dropna(how="any")
+        
+        def compute(self, runningStat=False):
+            """
+            Description
+            -----------
+            Settlement statistics of table, no printing or plotting
             
-        def get_vwap_and_twap(self, runningStat=False):
-            _size = self.table.as_matrix(columns=["size"])
-            _value = self.table.as_matrix(columns=["value"])
-            _prod = _size * _value
-            self.vwap = _prod.sum() / _size.sum()
-            self.twap = _value.sum() / _value.size
-            print(("vwap: %s" %self.vwap))
-            print(("twap: %s" %self.twap))
-            print(("volume: %s" %_size.sum()))
-            print((self.table))
-            self.table.value.plot(legend=True)
-            self.table.size.plot(secondary_y=True)
+            Examples
+            --------
+                functionReturn (SettleResult)::
+                
+                    >>> CloseAnalysis().compute(runningStat=True)
+                    SettleResult(vwap=..., twap=..., volume=...)
+            """
+            _accumulator = VwapAccumulator(self.bbgTick)
+            _stat = _accumulator.push_table(self.table, rounded=True,
+                                            running=runningStat)
+            _snapshot = _accumulator.snapshot()
+            if _stat is not None:
+                _stat = _stat[["vwap", "twap"]]
+            return SettleResult(_snapshot["vwap"], _snapshot["twap"],
+                                _snapshot["volume"], _snapshot["count"], _stat)
+        
+        def plot(self, result=None):
+            """Plot value, size and running statistics, needs matplotlib"""
+            self.table["value"].plot(legend=True)
+            self.table["size"].plot(secondary_y=True)
+            if result is not None and result.stat is not None:
+                result.stat.plot()
+        
+        def get_vwap_and_twap(self, runningStat=False, verbose=True):
+            _result = self.compute(runningStat)
+            self.vwap, self.twap = _result.vwap, _result.twap
             if runningStat:
-                _cumsize = _size.cumsum(axis=0)
-                _cumvalue = _value.cumsum(axis=0)
-                _counter = __NP__.array([[i] for i in range(1,_value.size + 1)])
-                _twap = _cumvalue / _counter
-                _prod = _value * _size
-                _cumprod = _prod.cumsum(axis=0)
-                _vwap = _cumprod / _cumsize
-                self.stat = __PD__.DataFrame(
-                                        data=__NP__.column_stack((_vwap,_twap)),
-                                        index=self.table.index,
-                                        columns=["vwap","twap"])
-                self.stat.plot()
+                self.stat = _result.stat
+            if verbose:
+                print(("vwap: %s" %self.vwap))
+                print(("twap: %s" %self.twap))
+                print(("volume: %s" %_result.volume))
+                print((self.table))
+                self.plot(_result)
+            return _result
             
 if __name__ == "__main__":
     _analysis = CloseAnalysis()
     _analysis.get_vwap_and_twap(runningStat=True)
     del _analysis
-                
\ No newline at end of file
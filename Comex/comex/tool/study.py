@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+
+"""Study Module
+Settlement window statistics across many trading days
+"""
+__author__  = "Eric Pieuchot"
+__date__    = "18 Oct 2026"
+
+from datetime import datetime, timedelta, date
+import comex.api.bbgapi as __API__
+import comex.function.assets as __COM__
+import comex.function.expiries as __EXP__
+import comex.function.tickers as __TIC__
+import comex.tool.batch as __BAT__
+import pandas as __PD__
+import numpy as __NP__
+from concurrent.futures import ThreadPoolExecutor
+import logging
+
+__all__ = ['SettlementStudy']
+
+#------------------------------------------------------------------------------
+# SettlementStudy Object, one vectorized pass over every window
+#------------------------------------------------------------------------------
+
+class SettlementStudy(object):
+    """
+    Settlement vwap/twap, volume and rounded price paths per trading day
+
+    Parameters
+    ----------
+        assetName (string): Comex commodity name
+
+        startDate/endDate (date): study range, asset calendar business days
+
+        expiryType (string): front month roll, futures 'F', notice 'N'
+
+        bbgTick (float): tick size used to round values down
+
+        bbgTicker (string): fixed ticker, front month contract if None
+
+        pool (ConnectionPool): shared pool if None
+
+        archive (TickArchive): read ticks from archive instead of bdit
+
+        threads (integer): windows fetched at the same time
+
+    Notes
+    -----
+    Windows end at Commodity.close and last Commodity.vwap minutes. Ticks
+    of all windows are concatenated once, bucketed per time stamp with the
+    CloseAnalysis rules, then reduced per day with np.add.reduceat. Running
+    statistics restart at each window.
+
+    Attributes
+    ----------
+        daily (DataFrame): one row per day, index date
+
+        paths (DataFrame): per second rows, index (date, time)
+    """
+
+    def __init__(self, assetName = "WTI_NYMEX", startDate = None, endDate = None,
+                 expiryType = "F", bbgTick = 0.01, bbgTicker = None,
+                 pool = None, archive = None, threads = __BAT__.SETTLE_THREADS):
+        if endDate is None: endDate = date.today() - timedelta(days=1)
+        if startDate is None: startDate = endDate - timedelta(days=30)
+        self.assetName, self.bbgTick = assetName, bbgTick
+        self.daily, self.paths = None, None
+        _assets = __COM__.get_assets()
+        if assetName not in _assets:
+            logging.error("Unknown asset %s", assetName)
+            return
+        _asset = _assets[assetName]
+        if not isinstance(_asset, __COM__.Commodity):
+            logging.error("No settlement window for %s", assetName)
+            return
+        _jobs = self._get_jobs(_asset, startDate, endDate, expiryType, bbgTicker)
+        _runner = __BAT__.SettlementRunner(pool, threads, 0, archive)
+        with ThreadPoolExecutor(max(1, threads)) as _threads:
+            _columns = list(_threads.map(lambda _job: self._fetch(_runner, _job),
+                                         _jobs))
+        self._compute(_jobs, _columns)
+
+    def _fetch(self, runner, job):
+        """Ticks of one window, None on error so the day stays NaN"""
+        try:
+            return runner.fetch(job)
+        except:
+            logging.error("Error on %s %s", job["ticker"], job["date"],
+                          exc_info=True)
+            return None
+
+    def _get_jobs(self, asset, startDate, endDate, expiryType, bbgTicker):
+        """Settlement windows of every business day in range"""
+        _days = __NP__.arange(__NP__.datetime64(startDate, "D"),
+                              __NP__.datetime64(endDate, "D") + 1)
+        _calendar = asset.get_calendar()
+        if _calendar is not None:
+            _days = _days[_calendar.is_busday_array(_days)]
+        if bbgTicker is None:
+            _months = __EXP__.get_front_months(asset.name, __PD__.DatetimeIndex(_days),
+                                               expiryType)
+            _tickers = __TIC__.get_bbg_tickers(asset.name, _months.values,
+                                               bbgKey=True, historical=True)
+        else:
+            _tickers = [bbgTicker] * len(_days)
+        _jobs = []
+        for _day, _ticker in zip(_days.tolist(), _tickers):
+            if _ticker is None:
+                logging.warning("No front month %s on %s", asset.name, _day)
+                continue
+            _end = datetime.combine(_day, asset.close.time())
+            _jobs.append({"asset":asset.name, "ticker":_ticker, "date":_day,
+                          "settleTime":_end, "window":asset.vwap,
+                          "start":_end - timedelta(minutes=asset.vwap),
+                          "tick":self.bbgTick})
+        return _jobs
+
+    def _compute(self, jobs, columns):
+        _parts = [(_job, _part) for _job, _part in zip(jobs, columns)
+                  if _part is not None]
+        _empty = __NP__.empty(0)
+        _times = __NP__.concatenate([_part[0] for _job, _part in _parts]
+                                    + [_empty.astype("i8")])
+        _values = __NP__.concatenate([_part[1] for _job, _part in _parts] + [_empty])
+        _sizes = __NP__.concatenate([_part[2] for _job, _part in _parts] + [_empty])
+        # Windows never overlap, one bucketing pass for all days
+        _table = __API__.aggregate_ticks(_times.view("datetime64[ns]"),
+                                         _values, _sizes)
+        _value = _table["value"].values
+        _value = _value - __NP__.fmod(_value, self.bbgTick)
+        _size = _table["size"].values
+        _bucket = _table.index.values.view("i8")
+        _starts = __NP__.array([__PD__.Timestamp(_job["start"]).value
+                                for _job in jobs], dtype="i8")
+        _day = __NP__.searchsorted(_starts, _bucket, side="right") - 1
+        _first = __NP__.flatnonzero(__NP__.diff(_day, prepend=-1))
+        _segment = _day[_first]
+        _last = __NP__.append(_first[1:], len(_value))[:len(_first)] - 1
+        _count = _last - _first + 1
+        # Per day reductions
+        _volume = __NP__.add.reduceat(_size, _first)
+        _sumvalue = __NP__.add.reduceat(_value, _first)
+        _sumprod = __NP__.add.reduceat(_value * _size, _first)
+        _daily = __PD__.DataFrame(
+                    {"ticker":[_job["ticker"] for _job in jobs],
+                     "start":[_job["start"] for _job in jobs],
+                     "settleTime":[_job["settleTime"] for _job in jobs],
+                     "ticks":__NP__.bincount(
+                                __NP__.searchsorted(_starts, _times, side="right") - 1,
+                                minlength=len(jobs))},
+                    index=__PD__.DatetimeIndex([_job["date"] for _job in jobs],
+                                               name="date"))
+        _stats = __PD__.DataFrame(
+                    {"buckets":_count, "volume":_volume,
+                     "vwap":_sumprod / _volume, "twap":_sumvalue / _count,
+                     "open":_value[_first], "close":_value[_last],
+                     "high":__NP__.maximum.reduceat(_value, _first),
+                     "low":__NP__.minimum.reduceat(_value, _first)},
+                    index=_daily.index[_segment])
+        self.daily = _daily.join(_stats)
+        # Running statistics restarting at each window
+        _offsets = __NP__.repeat(_first, _count)
+        _rank = __NP__.arange(len(_value)) - _offsets + 1
+        def _running(_column):
+            _cum = __NP__.cumsum(_column)
+            _base = __NP__.concatenate([[0.], _cum])[_first]
+            return _cum - __NP__.repeat(_base, _count)
+        _cumsize, _cumprod = _running(_size), _running(_value * _size)
+        self.paths = __PD__.DataFrame(
+                    {"value":_value, "size":_size,
+                     "seconds":(_bucket - _starts[_day]) / 1e9,
+                     "volume":_cumsize, "vwap":_cumprod / _cumsize,
+                     "twap":_running(_value) / _rank},
+                    index=__PD__.MultiIndex.from_arrays(
+                                [_daily.index[_day], _table.index],
+                                names=["date", "time"]))
+
+#------------------------------------------------------------------------------
+# Unit Testing
+#------------------------------------------------------------------------------
+
+if __name__ == "__main__":
+    _study = SettlementStudy("WTI_NYMEX")
+    print((_study.daily))
+    print((_study.paths))
@@ -17,9 +17,18 @@ __all__ = ['start_logging']
 #-------------------------------------------------------------------------------
 
 def start_logging(fileName=__DEF__.LOGGING_FILE):
-    """Initialize logging object and setup console/file handler"""
+    """
+    Initialize logging object and setup console/file handler
+
+    Notes
+    -----
+    Not called on import, scripts opt in with comex.start_logging(). The
+    log file is truncated on the first call only, later calls return False.
+    """
     # Get root logger
     _logger = __LOG__.getLogger()
+    if any(_handler.get_name() == "file_handler" for _handler in _logger.handlers):
+        return False
     # Create formatter
     _formatter = __LOG__.Formatter(fmt=__DEF__.LOGGING_FORMAT,
                                    datefmt="%Y-%m-%d %H:%M:%S")
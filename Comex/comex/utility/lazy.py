@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+
+"""Lazy Module
+Deferred import of heavy third party modules
+"""
+
+__author__ = "Eric Pieuchot"
+__date__ = "18 Oct 2026"
+
+from importlib import import_module
+from importlib.util import find_spec
+import threading
+import types
+import sys
+
+__all__ = ['LazyModule', 'lazy_import', 'is_available', 'is_loaded']
+
+_LOCK = threading.RLock()
+
+#-------------------------------------------------------------------------------
+# LazyModule Class, module imported on first attribute access
+#-------------------------------------------------------------------------------
+
+class LazyModule(types.ModuleType):
+    """
+    Module stand-in importing the real module on first attribute access
+
+    Notes
+    -----
+    Attributes of the real module are copied on load so later lookups are
+    plain dictionary hits. Used as `__PD__ = lazy_import("pandas")` in
+    place of `import pandas as __PD__`.
+    """
+
+    def __init__(self, name):
+        super(LazyModule, self).__init__(name)
+        self.__dict__["_module"] = None
+
+    def _load(self):
+        with _LOCK:
+            if self._module is None:
+                _module = import_module(self.__name__)
+                self.__dict__.update(_module.__dict__)
+                self.__dict__["_module"] = _module
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self):
+        _state = "loaded" if self._module is not None else "not loaded"
+        return "<lazy module '%s' (%s)>" % (self.__name__, _state)
+
+#-------------------------------------------------------------------------------
+# Lazy import utility functions
+#-------------------------------------------------------------------------------
+
+def lazy_import(name, optional=False):
+    """
+    Description
+    -----------
+    Module proxy for name, nothing imported before first use
+
+    Parameters
+    ----------
+        name (string): absolute module name such as 'pandas'
+
+        optional (boolean): return None when module is not installed
+
+    Examples
+    --------
+        functionReturn (LazyModule)::
+
+            >>> __PD__ = comex.utility.lazy.lazy_import("pandas")
+            <lazy module 'pandas' (not loaded)>
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    if optional and not is_available(name):
+        return None
+    return LazyModule(name)
+
+def is_available(name):
+    """Module installed, checked without importing it"""
+    try:
+        return name in sys.modules or find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
+
+def is_loaded(name):
+    """Module already imported"""
+    return name in sys.modules
+
+#-------------------------------------------------------------------------------
+# Unit testing
+#-------------------------------------------------------------------------------
+
+if __name__ == "__main__":
+    # Unit testing
+    __PD__ = lazy_import("pandas")
+    print((__PD__, is_loaded("pandas")))
+    print((__PD__.Timestamp("2015-12-01"), is_loaded("pandas")))
+    print((lazy_import("blpapi", optional=True)))